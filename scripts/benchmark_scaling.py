@@ -0,0 +1,183 @@
+# Multi-core Scaling Benchmark for the Astra API
+# Starts the pre-fork server (src/prefork.py) with 1, 2, 4, ... workers and
+# drives each with the same closed-loop load: client processes, each holding
+# one keep-alive connection, post /predict as fast as answers come back.
+# Reports throughput, speedup and scaling efficiency against one worker,
+# latency percentiles, and server memory (total RSS vs. PSS, which counts
+# pages shared between workers once - the copy-on-write model in action).
+#
+# The clients need CPU too: on a machine with C cores, worker counts close to
+# C compete with the load generator, so expect scaling to flatten there.
+
+import argparse
+import http.client
+import json
+import multiprocessing
+import os
+import random
+import signal
+import subprocess
+import sys
+import time
+
+import numpy as np
+
+REPO_ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, REPO_ROOT)
+from src.simulation import generate_session
+
+SEED = 42
+N_PAYLOADS = 2000
+
+
+def make_payloads(n: int = N_PAYLOADS, seed: int = SEED):
+    random.seed(seed)
+    return [json.dumps(generate_session()[0]).encode() for _ in range(n)]
+
+
+def client(args):
+    """One closed-loop connection: returns (latencies of requests completed in the measured window, errors)."""
+    port, payloads, warmup, duration, offset = args
+    conn = http.client.HTTPConnection('127.0.0.1', port, timeout=10)
+    headers = {'Content-Type': 'application/json'}
+    latencies, errors = [], 0
+    measure_from = time.perf_counter() + warmup
+    end = measure_from + duration
+    i = offset
+    while True:
+        start = time.perf_counter()
+        if start >= end:
+            break
+        try:
+            conn.request('POST', '/predict', payloads[i % len(payloads)], headers)
+            response = conn.getresponse()
+            response.read()
+            ok = response.status == 200
+        except (OSError, http.client.HTTPException):
+            conn.close()
+            conn = http.client.HTTPConnection('127.0.0.1', port, timeout=10)
+            ok = False
+        done = time.perf_counter()
+        if done >= measure_from:
+            if ok:
+                latencies.append(done - start)
+            else:
+                errors += 1
+        i += 1
+    conn.close()
+    return latencies, errors
+
+
+def memory_mb(pid: int) -> tuple:
+    """(RSS, PSS) in MB of `pid` and all its children, from /proc (zeros where unavailable)."""
+    pids = [pid]
+    try:
+        with open(f'/proc/{pid}/task/{pid}/children') as f:
+            pids += [int(p) for p in f.read().split()]
+    except OSError:
+        return 0.0, 0.0
+    rss = pss = 0
+    for p in pids:
+        try:
+            with open(f'/proc/{p}/smaps_rollup') as f:
+                for line in f:
+                    if line.startswith('Rss:'):
+                        rss += int(line.split()[1])
+                    elif line.startswith('Pss:'):
+                        pss += int(line.split()[1])
+        except OSError:
+            continue
+    return rss / 1024, pss / 1024
+
+
+def wait_ready(port: int, workers: int, timeout: float = 60.0):
+    """Waits until the server answers and every worker has loaded its model."""
+    deadline = time.monotonic() + timeout
+    seen = set()
+    while time.monotonic() < deadline and len(seen) < workers:
+        try:
+            conn = http.client.HTTPConnection('127.0.0.1', port, timeout=2)
+            conn.request('GET', '/model/info')
+            response = conn.getresponse()
+            body = response.read()
+            conn.close()
+            if response.status == 200:
+                seen.add(json.loads(body)['startup']['worker'])
+                continue
+        except (OSError, http.client.HTTPException):
+            pass
+        time.sleep(0.2)
+    if len(seen) < workers:
+        raise RuntimeError(f"Only {len(seen)} of {workers} workers became ready on port {port}.")
+
+
+def run(workers: int, clients: int, port: int, warmup: float, duration: float, payloads) -> dict:
+    env = {**os.environ, 'PYTHONPATH': REPO_ROOT, 'ASTRA_WATCHDOG_TRUSTED_IPS': '127.0.0.1',
+           'ASTRA_VERDICT_CACHE_SIZE': '0', 'ASTRA_MODEL_POLL_INTERVAL': '0'}
+    server = subprocess.Popen([sys.executable, '-m', 'src.prefork', '--workers', str(workers), '--port', str(port),
+                               '--log-level', 'warning'], env=env, cwd=os.path.dirname(os.path.abspath(__file__)),
+                              stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        wait_ready(port, workers)
+        with multiprocessing.Pool(clients) as pool:
+            results = pool.map(client, [(port, payloads, warmup, duration, i * 97) for i in range(clients)])
+        rss, pss = memory_mb(server.pid)
+    finally:
+        server.send_signal(signal.SIGTERM)
+        server.wait(timeout=60)
+    latencies = np.concatenate([np.asarray(r[0]) for r in results]) if results else np.array([])
+    return {
+        'workers': workers,
+        'clients': clients,
+        'requests': int(len(latencies)),
+        'errors': int(sum(r[1] for r in results)),
+        'rps': round(len(latencies) / duration, 1),
+        'p50_ms': round(float(np.percentile(latencies, 50)) * 1000, 3) if len(latencies) else None,
+        'p99_ms': round(float(np.percentile(latencies, 99)) * 1000, 3) if len(latencies) else None,
+        'rss_mb': round(rss, 1),
+        'pss_mb': round(pss, 1),
+    }
+
+
+def main():
+    cpus = os.cpu_count() or 1
+    default_workers = ','.join(str(2 ** i) for i in range(cpus.bit_length()) if 2 ** i <= cpus)
+    parser = argparse.ArgumentParser(description="Throughput of the pre-fork server at each worker count.")
+    parser.add_argument('--workers', default=default_workers, help="Comma-separated worker counts to test.")
+    parser.add_argument('--clients', type=int, default=None,
+                        help="Concurrent client connections (default: 4 per worker of the largest count).")
+    parser.add_argument('--duration', type=float, default=10.0, help="Measured seconds per worker count.")
+    parser.add_argument('--warmup', type=float, default=2.0, help="Unmeasured seconds before each measurement.")
+    parser.add_argument('--port', type=int, default=3190, help="Port for the benchmarked servers.")
+    parser.add_argument('--output', default=None, help="Write the JSON report to this file as well.")
+    args = parser.parse_args()
+
+    worker_counts = [int(w) for w in args.workers.split(',') if w.strip()]
+    clients = args.clients or 4 * max(worker_counts)
+    payloads = make_payloads()
+
+    print("=" * 92)
+    print(f"      ASTRA PRE-FORK SCALING BENCHMARK  ({cpus} CPUs, {clients} closed-loop clients, "
+          f"{args.duration:.0f}s per run)")
+    print("=" * 92)
+    print(f"{'workers':>8}{'req/s':>11}{'speedup':>10}{'efficiency':>12}{'p50 ms':>10}{'p99 ms':>10}"
+          f"{'errors':>8}{'RSS MB':>10}{'PSS MB':>10}")
+    report = []
+    for workers in worker_counts:
+        result = run(workers, clients, args.port, args.warmup, args.duration, payloads)
+        base = report[0]['rps'] if report else result['rps']
+        result['speedup'] = round(result['rps'] / base, 2) if base else None
+        result['efficiency'] = round(result['speedup'] / workers * report[0]['workers'], 2) \
+            if report and result['speedup'] else 1.0
+        report.append(result)
+        print(f"{workers:>8}{result['rps']:>11,.0f}{result['speedup']:>10.2f}{result['efficiency']:>12.2f}"
+              f"{result['p50_ms']:>10.2f}{result['p99_ms']:>10.2f}{result['errors']:>8}"
+              f"{result['rss_mb']:>10.0f}{result['pss_mb']:>10.0f}")
+    print("=" * 92)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({'cpus': cpus, 'duration': args.duration, 'results': report}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
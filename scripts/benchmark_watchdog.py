@@ -0,0 +1,66 @@
+# Benchmark for the Astra Watchdog rate limiter
+# Measures the per-request overhead of Watchdog.check_request in microseconds
+# and shows that memory stays bounded under millions of distinct client IPs.
+
+import os
+import sys
+import time
+import random
+import logging
+import resource
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from src.watchdog import Watchdog
+
+# Alerts are expected during the benchmark; keep the console quiet
+logging.getLogger('watchdog').setLevel(logging.ERROR)
+
+N_REQUESTS = 1_000_000
+MAX_TRACKED_IPS = 100_000
+
+
+def max_rss_mb():
+    # ru_maxrss is in kilobytes on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def run(name, watchdog, ips, clock_step=0.0):
+    """Feeds every IP in `ips` through check_request and reports the mean cost."""
+    now = time.monotonic()
+    check = watchdog.check_request
+    start = time.perf_counter()
+    for ip in ips:
+        check(ip, now)
+        now += clock_step
+    elapsed = time.perf_counter() - start
+    print(f"{name:<42} {elapsed / len(ips) * 1e6:8.3f} us/request   "
+          f"tracked={len(watchdog._ips):>7,}  blocked={len(watchdog._blocked):>6,}  max_rss={max_rss_mb():7.1f} MB")
+
+
+def main():
+    print("=" * 110)
+    print(f"      ASTRA WATCHDOG BENCHMARK  ({N_REQUESTS:,} requests per scenario)")
+    print("=" * 110)
+
+    # 1. Well-behaved clients: a realistic pool of IPs, nobody crosses a threshold
+    pool = [f"10.{i // 65536}.{(i // 256) % 256}.{i % 256}" for i in range(50_000)]
+    ips = [random.choice(pool) for _ in range(N_REQUESTS)]
+    run("Steady traffic, 50k IPs (allowed path)", Watchdog(max_tracked_ips=MAX_TRACKED_IPS), ips, clock_step=1e-3)
+
+    # 2. One attacker hammering: first requests trip the limits, the rest hit the blocked fast path
+    run("Single IP flood (blocked fast path)", Watchdog(max_tracked_ips=MAX_TRACKED_IPS),
+        ["203.0.113.7"] * N_REQUESTS, clock_step=1e-6)
+
+    # 3. Adversarial churn: every request from a new IP; memory must stay capped by the LRU
+    ips = [f"{(i >> 24) & 255}.{(i >> 16) & 255}.{(i >> 8) & 255}.{i & 255}" for i in range(N_REQUESTS)]
+    run(f"Distinct-IP churn, LRU cap {MAX_TRACKED_IPS:,}", Watchdog(max_tracked_ips=MAX_TRACKED_IPS), ips,
+        clock_step=1e-6)
+
+    # 4. Churn with idle expiry doing the cleanup instead of the cap
+    run("Distinct-IP churn, idle expiry (ttl=5s)", Watchdog(max_tracked_ips=MAX_TRACKED_IPS, idle_ttl=5.0), ips,
+        clock_step=1e-4)
+    print("=" * 110)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,154 @@
+# JSON vs Packed Wire Format Benchmark for the Astra API
+# Starts one API process and sends the same sessions through the JSON
+# endpoints (/predict, /predict/batch) and the packed binary endpoint
+# (/predict/packed), one request at a time over a keep-alive connection.
+# For each case it reports the server's CPU time per request and per session
+# (user + system time of the server process from /proc, so the client's own
+# encoding work is not counted), client-side latency, and request/response
+# sizes on the wire.
+
+import argparse
+import http.client
+import json
+import os
+import random
+import signal
+import subprocess
+import sys
+import time
+
+import numpy as np
+
+REPO_ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, REPO_ROOT)
+from src.simulation import generate_session
+from src.wire import MEDIA_TYPE, decode_response, encode_request
+
+SEED = 42
+CLOCK_TICKS = os.sysconf('SC_CLK_TCK')
+
+
+def cpu_seconds(pid: int) -> float:
+    """User + system CPU time of `pid` (all threads), from /proc."""
+    with open(f'/proc/{pid}/stat') as f:
+        fields = f.read().rsplit(')', 1)[1].split()
+    return (int(fields[11]) + int(fields[12])) / CLOCK_TICKS
+
+
+def wait_ready(port: int, timeout: float = 60.0) -> list:
+    """Waits for the model to load; returns the model's feature columns."""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            conn = http.client.HTTPConnection('127.0.0.1', port, timeout=2)
+            conn.request('GET', '/model/info')
+            response = conn.getresponse()
+            body = response.read()
+            conn.close()
+            if response.status == 200:
+                return json.loads(body)['feature_columns']
+        except (OSError, http.client.HTTPException):
+            pass
+        time.sleep(0.2)
+    raise RuntimeError(f"The API did not become ready on port {port}.")
+
+
+def make_bodies(feature_columns: list, batch: int, n: int) -> dict:
+    """The same `n` requests of `batch` sessions in each format."""
+    random.seed(SEED)
+    batches = [[generate_session()[0] for _ in range(batch)] for _ in range(n)]
+    packed = [encode_request(np.array([[s[c] for c in feature_columns] for s in sessions]), feature_columns)
+              for sessions in batches]
+    if batch == 1:
+        return {'json': ('/predict', 'application/json', [json.dumps(s[0]).encode() for s in batches]),
+                'packed': ('/predict/packed', MEDIA_TYPE, packed)}
+    return {'json': ('/predict/batch', 'application/json', [json.dumps(s).encode() for s in batches]),
+            'packed': ('/predict/packed', MEDIA_TYPE, packed)}
+
+
+def drive(port: int, pid: int, path: str, content_type: str, bodies: list, warmup: int) -> dict:
+    conn = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+    headers = {'Content-Type': content_type}
+
+    def send(body):
+        conn.request('POST', path, body, headers)
+        response = conn.getresponse()
+        data = response.read()
+        if response.status != 200:
+            raise RuntimeError(f"{path} answered {response.status}: {data[:200]!r}")
+        return data
+
+    for body in bodies[:warmup]:
+        send(body)
+    latencies, response_bytes = [], 0
+    cpu_start = cpu_seconds(pid)
+    for body in bodies:
+        start = time.perf_counter()
+        data = send(body)
+        latencies.append(time.perf_counter() - start)
+        response_bytes += len(data)
+    cpu = cpu_seconds(pid) - cpu_start
+    conn.close()
+    if content_type == MEDIA_TYPE:
+        decode_response(data)  # The last answer must be a well-formed packed response
+    return {
+        'requests': len(bodies),
+        'server_cpu_us_per_request': round(cpu / len(bodies) * 1e6, 1),
+        'mean_latency_ms': round(float(np.mean(latencies)) * 1000, 3),
+        'p99_latency_ms': round(float(np.percentile(latencies, 99)) * 1000, 3),
+        'request_bytes': round(sum(len(b) for b in bodies) / len(bodies)),
+        'response_bytes': round(response_bytes / len(bodies)),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Server CPU per request: JSON vs the packed wire format.")
+    parser.add_argument('--batch-sizes', default='1,64', help="Comma-separated sessions per request.")
+    parser.add_argument('--requests', type=int, default=3000, help="Measured requests per case.")
+    parser.add_argument('--warmup', type=int, default=300, help="Unmeasured requests before each case.")
+    parser.add_argument('--port', type=int, default=3191, help="Port for the benchmarked server.")
+    parser.add_argument('--output', default=None, help="Write the JSON report to this file as well.")
+    args = parser.parse_args()
+
+    env = {**os.environ, 'PYTHONPATH': REPO_ROOT, 'ASTRA_WATCHDOG_TRUSTED_IPS': '127.0.0.1',
+           'ASTRA_VERDICT_CACHE_SIZE': '0', 'ASTRA_MODEL_POLL_INTERVAL': '0'}
+    server = subprocess.Popen([sys.executable, '-m', 'uvicorn', 'src.backend:app', '--port', str(args.port),
+                               '--log-level', 'warning', '--no-access-log'], env=env,
+                              cwd=os.path.dirname(os.path.abspath(__file__)),
+                              stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    report = []
+    try:
+        feature_columns = wait_ready(args.port)
+        print("=" * 96)
+        print(f"      ASTRA WIRE FORMAT BENCHMARK  ({args.requests} sequential requests per case)")
+        print("=" * 96)
+        print(f"{'batch':>6}{'format':>8}{'CPU us/req':>12}{'CPU us/row':>12}{'mean ms':>10}{'p99 ms':>10}"
+              f"{'req B':>10}{'resp B':>10}{'CPU saved':>12}")
+        for batch in [int(b) for b in args.batch_sizes.split(',') if b.strip()]:
+            cases = make_bodies(feature_columns, batch, args.requests + args.warmup)
+            results = {}
+            for name, (path, content_type, bodies) in cases.items():
+                result = drive(args.port, server.pid, path, content_type, bodies, args.warmup)
+                result.update({'batch_size': batch, 'format': name, 'path': path,
+                               'server_cpu_us_per_session': round(result['server_cpu_us_per_request'] / batch, 2)})
+                results[name] = result
+                report.append(result)
+            json_cpu = results['json']['server_cpu_us_per_request']
+            for name, result in results.items():
+                saved = 1 - result['server_cpu_us_per_request'] / json_cpu if json_cpu else 0.0
+                result['cpu_saved_vs_json'] = round(saved, 3)
+                print(f"{batch:>6}{name:>8}{result['server_cpu_us_per_request']:>12,.1f}"
+                      f"{result['server_cpu_us_per_session']:>12,.2f}{result['mean_latency_ms']:>10.3f}"
+                      f"{result['p99_latency_ms']:>10.3f}{result['request_bytes']:>10,}{result['response_bytes']:>10,}"
+                      f"{saved:>12.1%}")
+        print("=" * 96)
+    finally:
+        server.send_signal(signal.SIGTERM)
+        server.wait(timeout=60)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({'requests': args.requests, 'results': report}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,205 @@
+# Offline Bulk Scorer for Astra
+# Streams an NDJSON or CSV session archive through the same model the API
+# serves (the compiled model bundle by default, or the pickled scaler + model)
+# and writes one verdict per input row as it goes. Rows are scored in chunks
+# fanned out to a process pool; at most 2 * workers chunks are in memory at
+# once and output keeps input order, so memory stays flat for any file size.
+#
+#   python bulk_score.py ../archive/2025-08-05.ndjson -o verdicts.ndjson --workers 8
+
+import argparse
+import csv
+import json
+import logging
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+
+import joblib
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from src.engine import BUNDLE_PATH, MODELS_DIR, CompiledForest, to_verdicts
+from src.model_manager import SklearnScorer
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+DEFAULT_CHUNK_SIZE = 20_000
+VERDICT_FIELDS = ['is_bot', 'decision', 'confidence_score']
+
+
+def load_scorer(engine='compiled', bundle_path=BUNDLE_PATH):
+    if engine == 'compiled':
+        return CompiledForest.load(bundle_path)
+    return SklearnScorer(
+        joblib.load(os.path.join(MODELS_DIR, 'astra_model.joblib')),
+        joblib.load(os.path.join(MODELS_DIR, 'astra_scaler.joblib')),
+        joblib.load(os.path.join(MODELS_DIR, 'feature_columns.joblib')),
+    )
+
+
+_scorer = None
+
+
+def _init_worker(engine, bundle_path):
+    global _scorer
+    _scorer = load_scorer(engine, bundle_path)
+
+
+def score_records(scorer, records, id_field=None):
+    """
+    Scores a list of (line number, parsed record or error message) pairs.
+    Returns one output dict per pair, in order; records with missing or
+    non-numeric features get an `error` entry instead of a verdict.
+    """
+    columns = scorer.feature_columns
+    outputs, rows, positions = [], [], []
+    for line, record in records:
+        output = {'line': line}
+        if id_field and isinstance(record, dict) and id_field in record:
+            output[id_field] = record[id_field]
+        if isinstance(record, str):
+            output['error'] = record
+        elif not isinstance(record, dict):
+            output['error'] = "Each session must be a JSON object."
+        else:
+            try:
+                row = {c: float(record[c]) for c in columns}
+                if any(value != value for value in row.values()):
+                    raise KeyError('(empty value)')
+                rows.append(row)
+                positions.append(len(outputs))
+            except KeyError as e:
+                output['error'] = f"Missing feature {e}"
+            except (TypeError, ValueError) as e:
+                output['error'] = f"Non-numeric feature value: {e}"
+        outputs.append(output)
+    if rows:
+        for position, verdict in zip(positions, to_verdicts(scorer.predict_rows(rows), scorer.classes_)):
+            outputs[position].update(verdict)
+    return outputs
+
+
+def _score_ndjson_chunk(args):
+    lines, id_field = args
+    records = []
+    for line, raw in lines:
+        try:
+            records.append((line, json.loads(raw)))
+        except ValueError as e:
+            records.append((line, f"Invalid JSON: {e}"))
+    return score_records(_scorer, records, id_field)
+
+
+def _score_csv_chunk(args):
+    records, id_field = args
+    return score_records(_scorer, records, id_field)
+
+
+def _ndjson_jobs(path, chunk_size, id_field):
+    with open(path, 'rb') as f:
+        numbered = ((n, raw) for n, raw in enumerate(f, start=1) if raw.strip())
+        while True:
+            lines = list(islice(numbered, chunk_size))
+            if not lines:
+                return
+            yield _score_ndjson_chunk, (lines, id_field)
+
+
+def _csv_jobs(path, chunk_size, id_field):
+    line = 1  # Header
+    for chunk in pd.read_csv(path, chunksize=chunk_size):
+        records = [(line + i + 1, record) for i, record in enumerate(chunk.to_dict('records'))]
+        line += len(chunk)
+        yield _score_csv_chunk, (records, id_field)
+
+
+class _Writer:
+    """Writes verdicts as NDJSON or CSV (chosen by the output file extension)."""
+
+    def __init__(self, path, id_field=None):
+        self.file = sys.stdout if path == '-' else open(path, 'w', newline='')
+        self.csv = path.endswith('.csv')
+        if self.csv:
+            fields = ['line'] + ([id_field] if id_field else []) + VERDICT_FIELDS + ['error']
+            self.writer = csv.DictWriter(self.file, fieldnames=fields, extrasaction='ignore')
+            self.writer.writeheader()
+
+    def write(self, outputs):
+        if self.csv:
+            self.writer.writerows(outputs)
+        else:
+            self.file.write(''.join(json.dumps(o) + '\n' for o in outputs))
+
+    def close(self):
+        if self.file is not sys.stdout:
+            self.file.close()
+
+
+def bulk_score(input_path, output_path, engine='compiled', bundle_path=BUNDLE_PATH, workers=1,
+               chunk_size=DEFAULT_CHUNK_SIZE, id_field=None):
+    """Scores `input_path` into `output_path`; returns counts of rows, verdicts and errors."""
+    is_csv = input_path.endswith('.csv')
+    jobs = (_csv_jobs if is_csv else _ndjson_jobs)(input_path, chunk_size, id_field)
+    writer = _Writer(output_path, id_field)
+    counts = {'rows': 0, 'scored': 0, 'blocked': 0, 'errors': 0}
+
+    def write(outputs):
+        writer.write(outputs)
+        counts['rows'] += len(outputs)
+        for o in outputs:
+            if 'error' in o:
+                counts['errors'] += 1
+            else:
+                counts['scored'] += 1
+                counts['blocked'] += o['decision'] == 'BLOCK'
+
+    start = time.perf_counter()
+    try:
+        if workers <= 1:
+            _init_worker(engine, bundle_path)
+            for fn, job in jobs:
+                write(fn(job))
+        else:
+            with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                     initargs=(engine, bundle_path)) as pool:
+                pending = []
+                for fn, job in jobs:
+                    pending.append(pool.submit(fn, job))
+                    if len(pending) >= 2 * workers:
+                        write(pending.pop(0).result())
+                for future in pending:
+                    write(future.result())
+    finally:
+        writer.close()
+    counts['seconds'] = round(time.perf_counter() - start, 3)
+    counts['rows_per_sec'] = round(counts['rows'] / counts['seconds'], 1) if counts['seconds'] else None
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Score an NDJSON or CSV session archive offline.")
+    parser.add_argument('input', help="Sessions as .ndjson/.jsonl (one object per line) or .csv.")
+    parser.add_argument('-o', '--output', default='-', help="Verdicts file (.ndjson or .csv); '-' for stdout.")
+    parser.add_argument('--engine', choices=['compiled', 'sklearn'], default='compiled',
+                        help="Model bundle (default) or the pickled scaler + model.")
+    parser.add_argument('--bundle', default=BUNDLE_PATH, help="Model bundle used by the compiled engine.")
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help="Scoring processes.")
+    parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE, help="Rows per scoring task.")
+    parser.add_argument('--id-field', default=None, help="Input field copied to each verdict (e.g. session_id).")
+    args = parser.parse_args()
+
+    if not os.path.exists(args.input):
+        logger.error(f"The input file '{args.input}' was not found.")
+        sys.exit(1)
+    counts = bulk_score(args.input, args.output, engine=args.engine, bundle_path=args.bundle,
+                        workers=args.workers, chunk_size=args.chunk_size, id_field=args.id_field)
+    logger.info(f"Scored {counts['scored']:,} of {counts['rows']:,} rows ({counts['blocked']:,} blocked, "
+                f"{counts['errors']:,} errors) in {counts['seconds']}s — {counts['rows_per_sec']:,} rows/s.")
+
+
+if __name__ == "__main__":
+    main()
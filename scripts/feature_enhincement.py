@@ -1,71 +1,137 @@
 import pandas as pd
 import numpy as np
 import os
-import random
+import argparse
+from concurrent.futures import ProcessPoolExecutor
 
 # --- Configuration ---
 INPUT_FILENAME = '../data/tatkal_sessions.csv'
 OUTPUT_FILENAME = '../data/tatkal_sessions_enhanced.csv'
+DEFAULT_SEED = 42
+DEFAULT_CHUNK_SIZE = 100_000
 
-def enhance_features(df):
+# Random draws are made per fixed block of global row numbers, each block with
+# its own seed derived from (seed, block number). A row's values therefore
+# depend only on the seed and its position in the file, never on how the file
+# was chunked or which worker handled it.
+RNG_BLOCK_ROWS = 8192
+
+
+def _block_draws(seed, block):
+    """Draws every new feature, for both classes, for one block of rows."""
+    rng = np.random.default_rng(np.random.SeedSequence(seed, spawn_key=(block,)))
+    n = RNG_BLOCK_ROWS
+    return {
+        # Human: slower, variable typing in ms / pauses to think / occasional typos / established account
+        'human_keystroke': rng.uniform(80, 250, n),
+        'human_idle': rng.uniform(1.0, 8.0, n),
+        'human_backspace': rng.integers(0, 7, n, endpoint=True),
+        'human_age': rng.integers(30, 1500, n, endpoint=True),
+        # Bot: programmatic typing / no pauses / brand new account (and never a backspace)
+        'bot_keystroke': rng.uniform(5, 20, n),
+        'bot_idle': rng.uniform(0.0, 0.5, n),
+        'bot_age': rng.integers(0, 5, n, endpoint=True),
+    }
+
+
+def _draws_for_rows(seed, start, stop):
+    """Concatenates block draws covering global rows [start, stop)."""
+    first_block = start // RNG_BLOCK_ROWS
+    last_block = max(first_block, (stop - 1) // RNG_BLOCK_ROWS)
+    blocks = [_block_draws(seed, b) for b in range(first_block, last_block + 1)]
+    offset = start - first_block * RNG_BLOCK_ROWS
+    return {key: np.concatenate([b[key] for b in blocks])[offset:offset + stop - start] for key in blocks[0]}
+
+
+def enhance_features(df, seed=DEFAULT_SEED, start_row=0):
     """
     Adds new, more sophisticated behavioral features to the existing dataset.
     The values are generated based on whether the session belongs to a human or a bot.
+    `start_row` is the global position of the first row, used when `df` is one
+    chunk of a larger file.
     """
-    print("Enhancing dataset with new features...")
-    
-    # Create lists to hold the new feature data
-    avg_keystroke_intervals = []
-    mouse_idle_times = []
-    backspace_counts = []
-    account_ages = []
-
-    # Iterate over each row of the DataFrame
-    for index, row in df.iterrows():
-        is_bot = row['is_bot']
-        
-        if is_bot == 0:  # If the row represents a Human
-            # Generate realistic human-like values
-            avg_keystroke_intervals.append(random.uniform(80, 250))  # Slower, variable typing in ms
-            mouse_idle_times.append(random.uniform(1.0, 8.0))      # Pauses to think/read
-            backspace_counts.append(random.randint(0, 7))          # Makes occasional typos
-            account_ages.append(random.randint(30, 1500))          # Established account in days
-        
-        else:  # If the row represents a Bot
-            # Generate bot-like, efficient values
-            avg_keystroke_intervals.append(random.uniform(5, 20))   # Near-instantaneous, programmatic typing
-            mouse_idle_times.append(random.uniform(0.0, 0.5))      # No pauses
-            backspace_counts.append(0)                             # Perfect input, no corrections
-            account_ages.append(random.randint(0, 5))              # Brand new account
-            
-    # Add the new lists as columns to the DataFrame
-    df['avg_keystroke_interval_ms'] = avg_keystroke_intervals
-    df['mouse_idle_time_sec'] = mouse_idle_times
-    df['backspace_count'] = backspace_counts
-    df['account_age_days'] = account_ages
-    
-    print("New features added successfully.")
+    draws = _draws_for_rows(seed, start_row, start_row + len(df))
+    is_bot = df['is_bot'].to_numpy() != 0
+
+    df['avg_keystroke_interval_ms'] = np.where(is_bot, draws['bot_keystroke'], draws['human_keystroke'])
+    df['mouse_idle_time_sec'] = np.where(is_bot, draws['bot_idle'], draws['human_idle'])
+    df['backspace_count'] = np.where(is_bot, 0, draws['human_backspace'])
+    df['account_age_days'] = np.where(is_bot, draws['bot_age'], draws['human_age'])
     return df
 
+
+def _enhance_chunk(args):
+    chunk, seed, start_row = args
+    return enhance_features(chunk, seed=seed, start_row=start_row)
+
+
+def _chunks_with_offsets(input_path, chunk_size, seed):
+    start_row = 0
+    for chunk in pd.read_csv(input_path, chunksize=chunk_size):
+        yield chunk, seed, start_row
+        start_row += len(chunk)
+
+
+def enhance_file(input_path, output_path, seed=DEFAULT_SEED, chunk_size=DEFAULT_CHUNK_SIZE, workers=1):
+    """
+    Streams `input_path` through `enhance_features` chunk by chunk and writes
+    each enhanced chunk as soon as it is ready. At most `2 * workers` chunks
+    are held in memory at once. Returns (rows written, first chunk, last chunk).
+    """
+    print(f"Enhancing '{input_path}' in chunks of {chunk_size:,} rows with {workers} worker(s), seed {seed}...")
+    rows, first, last = 0, None, None
+    header = True
+
+    def write(enhanced):
+        nonlocal rows, first, last, header
+        enhanced.to_csv(output_path, mode='w' if header else 'a', header=header, index=False)
+        header = False
+        rows += len(enhanced)
+        first = enhanced if first is None else first
+        last = enhanced
+
+    jobs = _chunks_with_offsets(input_path, chunk_size, seed)
+    if workers <= 1:
+        for job in jobs:
+            write(_enhance_chunk(job))
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            pending = []
+            for job in jobs:
+                pending.append(pool.submit(_enhance_chunk, job))
+                if len(pending) >= 2 * workers:
+                    write(pending.pop(0).result())
+            for future in pending:
+                write(future.result())
+
+    print(f"New features added successfully to {rows:,} rows.")
+    return rows, first, last
+
+
 # --- Main Execution ---
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Add keystroke, idle-time, backspace and account-age features.")
+    parser.add_argument('--input', default=INPUT_FILENAME, help="Session CSV with an is_bot column.")
+    parser.add_argument('--output', default=OUTPUT_FILENAME, help="Where to write the enhanced CSV.")
+    parser.add_argument('--seed', type=int, default=DEFAULT_SEED, help="Random seed; same seed gives identical output.")
+    parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE, help="Rows read and processed at a time.")
+    parser.add_argument('--workers', type=int, default=1, help="Processes to fan chunks out to.")
+    args = parser.parse_args()
+
     # Check if the input file exists
-    if not os.path.exists(INPUT_FILENAME):
-        print(f"Error: The data file '{INPUT_FILENAME}' was not found.")
+    if not os.path.exists(args.input):
+        print(f"Error: The data file '{args.input}' was not found.")
         print("Please make sure your CSV file is in the same directory as this script.")
     else:
-        print(f"Loading original dataset from '{INPUT_FILENAME}'...")
-        original_df = pd.read_csv(INPUT_FILENAME)
-        
-        # Enhance the dataframe with new features
-        enhanced_df = enhance_features(original_df.copy())
-        
-        # Save the new dataframe to a new file
-        enhanced_df.to_csv(OUTPUT_FILENAME, index=False)
-        
-        print(f"\nEnhanced dataset saved to '{OUTPUT_FILENAME}'")
-        print("\nPreview of the new data (first 5 rows):")
-        print(enhanced_df.head())
-        
-        print("\nPreview of the new data (last 5 rows to show bot data):")
-        print(enhanced_df.tail())
+        print(f"Loading original dataset from '{args.input}'...")
+        _, first_chunk, last_chunk = enhance_file(
+            args.input, args.output, seed=args.seed, chunk_size=args.chunk_size, workers=args.workers
+        )
+
+        print(f"\nEnhanced dataset saved to '{args.output}'")
+        if first_chunk is not None:
+            print("\nPreview of the new data (first 5 rows):")
+            print(first_chunk.head())
+
+            print("\nPreview of the new data (last 5 rows to show bot data):")
+            print(last_chunk.tail())
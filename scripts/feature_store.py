@@ -0,0 +1,151 @@
+# Cached Feature-Matrix Store for Astra
+# Converts the training CSV once into typed, memory-mappable .npy arrays
+# (float32 features, uint8 label) plus the stratified train/test split indices,
+# so training and evaluation map the data instead of re-parsing the CSV.
+# The cache is rebuilt automatically when the source CSV changes.
+
+import json
+import logging
+import os
+import shutil
+
+import numpy as np
+import pandas as pd
+from sklearn.model_selection import train_test_split
+
+logger = logging.getLogger(__name__)
+
+CACHE_DIR = '../data/.cache'
+STORE_VERSION = 1
+LABEL_COLUMN = 'is_bot'
+TEST_SIZE = 0.2
+RANDOM_STATE = 42
+READ_CHUNK_ROWS = 250_000
+
+
+class FeatureStore:
+    """Memory-mapped view of a cached dataset."""
+
+    def __init__(self, path, meta):
+        self.path = path
+        self.meta = meta
+        self.feature_columns = meta['feature_columns']
+        self.X = np.load(os.path.join(path, 'X.npy'), mmap_mode='r')
+        self.y = np.load(os.path.join(path, 'y.npy'), mmap_mode='r')
+        self.train_idx = np.load(os.path.join(path, 'train_idx.npy'))
+        self.test_idx = np.load(os.path.join(path, 'test_idx.npy'))
+
+    def __len__(self):
+        return self.X.shape[0]
+
+    def frame(self, idx=None, columns=None):
+        """Features as a DataFrame (optionally only rows `idx`, in `columns` order)."""
+        X = self.X if idx is None else self.X[idx]
+        df = pd.DataFrame(X, columns=self.feature_columns)
+        return df if columns is None else df[columns]
+
+    def train(self, columns=None):
+        """(X_train, y_train), identical rows to train_test_split(test_size=0.2, random_state=42, stratify=y)."""
+        return self.frame(self.train_idx, columns), pd.Series(self.y[self.train_idx], name=LABEL_COLUMN)
+
+    def test(self, columns=None):
+        """(X_test, y_test) for the same split."""
+        return self.frame(self.test_idx, columns), pd.Series(self.y[self.test_idx], name=LABEL_COLUMN)
+
+
+def _source_fingerprint(csv_path):
+    stat = os.stat(csv_path)
+    return {'source': os.path.abspath(csv_path), 'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+
+
+def _store_path(csv_path, cache_dir):
+    return os.path.join(cache_dir, os.path.splitext(os.path.basename(csv_path))[0])
+
+
+def _count_rows(csv_path):
+    """Data rows in the CSV (lines minus the header), counted without parsing."""
+    lines, last = 0, b'\n'
+    with open(csv_path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 24), b''):
+            lines += block.count(b'\n')
+            last = block[-1:]
+    if last != b'\n':
+        lines += 1  # No trailing newline on the final row
+    return max(0, lines - 1)
+
+
+def build_store(csv_path, cache_dir=CACHE_DIR):
+    """Parses `csv_path` in chunks into a fresh cache directory and returns its path."""
+    target = _store_path(csv_path, cache_dir)
+    tmp = target + '.tmp'
+    shutil.rmtree(tmp, ignore_errors=True)
+    os.makedirs(tmp)
+
+    header = pd.read_csv(csv_path, nrows=0).columns.tolist()
+    feature_columns = [col for col in header if col != LABEL_COLUMN]
+    n_rows = _count_rows(csv_path)
+    logger.info(f"Building feature store for '{csv_path}' ({n_rows:,} rows, {len(feature_columns)} features)...")
+
+    X = np.lib.format.open_memmap(os.path.join(tmp, 'X.npy'), mode='w+', dtype=np.float32,
+                                  shape=(n_rows, len(feature_columns)))
+    y = np.lib.format.open_memmap(os.path.join(tmp, 'y.npy'), mode='w+', dtype=np.uint8, shape=(n_rows,))
+    row = 0
+    for chunk in pd.read_csv(csv_path, chunksize=READ_CHUNK_ROWS):
+        n = len(chunk)
+        X[row:row + n] = chunk[feature_columns].to_numpy(dtype=np.float32)
+        y[row:row + n] = chunk[LABEL_COLUMN].to_numpy(dtype=np.uint8)
+        row += n
+    if row != n_rows:
+        raise ValueError(f"Expected {n_rows} rows in '{csv_path}' but parsed {row}.")
+    X.flush()
+    y.flush()
+
+    # Splitting row indices reproduces exactly the rows the DataFrame split used to pick
+    train_idx, test_idx = train_test_split(np.arange(n_rows), test_size=TEST_SIZE, random_state=RANDOM_STATE,
+                                           stratify=np.asarray(y))
+    np.save(os.path.join(tmp, 'train_idx.npy'), train_idx)
+    np.save(os.path.join(tmp, 'test_idx.npy'), test_idx)
+    del X, y
+
+    meta = {
+        'version': STORE_VERSION,
+        **_source_fingerprint(csv_path),
+        'rows': n_rows,
+        'feature_columns': feature_columns,
+        'label_column': LABEL_COLUMN,
+        'test_size': TEST_SIZE,
+        'random_state': RANDOM_STATE,
+    }
+    with open(os.path.join(tmp, 'meta.json'), 'w') as f:
+        json.dump(meta, f, indent=2)
+
+    shutil.rmtree(target, ignore_errors=True)
+    os.replace(tmp, target)
+    return target
+
+
+def load_feature_store(csv_path='../data/tatkal.csv', cache_dir=CACHE_DIR, rebuild=False):
+    """
+    Returns the memory-mapped FeatureStore for `csv_path`, (re)building the
+    cache first if it is missing, from an older store version, or the CSV's
+    size or modification time no longer match.
+    """
+    if not os.path.exists(csv_path):
+        raise FileNotFoundError(f"The data file '{csv_path}' was not found.")
+    path = _store_path(csv_path, cache_dir)
+    meta_path = os.path.join(path, 'meta.json')
+
+    meta = None
+    if not rebuild and os.path.exists(meta_path):
+        with open(meta_path) as f:
+            meta = json.load(f)
+        fingerprint = _source_fingerprint(csv_path)
+        if meta.get('version') != STORE_VERSION or any(meta.get(k) != v for k, v in fingerprint.items()):
+            logger.info(f"Feature store for '{csv_path}' is stale; rebuilding.")
+            meta = None
+
+    if meta is None:
+        build_store(csv_path, cache_dir)
+        with open(meta_path) as f:
+            meta = json.load(f)
+    return FeatureStore(path, meta)
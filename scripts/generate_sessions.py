@@ -0,0 +1,242 @@
+# Synthetic Session Generator for Astra
+# Writes large labelled datasets as fixed-size shards, for training at scale
+# and load tests. Sessions are drawn vectorized from the same per-class
+# distributions the traffic simulator uses (HUMAN_PROFILE / BOT_PROFILE in
+# src/simulation.py), optionally with adversarial bots that copy part of
+# their behaviour from the human distributions.
+#
+# Draws are made per fixed block of global row numbers, each block seeded from
+# (seed, block number) as in feature_enhincement.py, so a row depends only on
+# the seed and its position: the dataset is the same whatever the shard size
+# or the number of worker processes.
+#
+# Shards come as CSV (the columns of data/tatkal.csv, readable by
+# train_model.py and testing.py) and/or a compact binary format: a small JSON
+# header followed by column blocks in the log sink's columnar block encoding,
+# float32 for durations and the narrowest unsigned integer for counts. It is
+# about a third smaller than the CSV and loads without any text parsing.
+
+import argparse
+import json
+import os
+import struct
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from src.log_sink import encode_columnar_block, iter_columnar_blocks
+from src.simulation import BOT_PROFILE, HUMAN_PROFILE
+
+# --- Configuration ---
+DEFAULT_SEED = 42
+DEFAULT_BOT_RATIO = 0.3
+DEFAULT_SHARD_ROWS = 1_000_000
+OUTPUT_DIR = '../data/synthetic'
+RNG_BLOCK_ROWS = 65_536
+
+# Column order of data/tatkal.csv
+COLUMNS = ['login_duration', 'journey_planner_duration', 'train_selection_duration', 'form_fill_duration',
+           'captcha_duration', 'session_duration', 'mouse_movements', 'page_scrolls', 'form_corrections', 'is_bot',
+           'avg_keystroke_interval_ms', 'mouse_idle_time_sec', 'backspace_count', 'account_age_days']
+FEATURES = [c for c in COLUMNS if c != 'is_bot']
+
+# --- Binary shard format ---
+# File:  MAGIC | uint16 version | uint32 header length | JSON header (columns, dtypes, rows, seed, ...)
+# Then:  blocks of up to RNG_BLOCK_ROWS rows, each uint32 n_rows | one little-endian array per column
+SHARD_MAGIC = b'ASTRASES'
+SHARD_VERSION = 1
+
+
+def _shard_dtype(feature: str) -> np.dtype:
+    if HUMAN_PROFILE[feature][0] == 'uniform':
+        return np.dtype('<f4')
+    high = max(HUMAN_PROFILE[feature][2], BOT_PROFILE[feature][2])
+    return next(np.dtype(t) for t in ('u1', '<u2', '<u4') if high <= np.iinfo(t).max)
+
+
+SHARD_DTYPES = {c: _shard_dtype(c) for c in FEATURES}
+SHARD_DTYPES['is_bot'] = np.dtype('u1')
+
+
+def _draw(rng, spec, n):
+    kind, low, high = spec
+    if kind == 'uniform':
+        return np.round(rng.uniform(low, high, n), 2)
+    return rng.integers(low, high, n, endpoint=True)
+
+
+def generate_block(seed: int, block: int, bot_ratio: float = DEFAULT_BOT_RATIO, adversarial_ratio: float = 0.0,
+                   mimicry: float = 0.5) -> Dict[str, np.ndarray]:
+    """
+    Columns of the RNG_BLOCK_ROWS sessions in block `block`. A `bot_ratio`
+    share are bots; `adversarial_ratio` of the bots mimic humans, taking each
+    feature from the human distribution with probability `mimicry`.
+    Adversarial bots are still labelled bots. Also returns an `adversarial` mask.
+    """
+    rng = np.random.default_rng(np.random.SeedSequence(seed, spawn_key=(block,)))
+    n = RNG_BLOCK_ROWS
+    is_bot = rng.random(n) < bot_ratio
+    adversarial = is_bot & (rng.random(n) < adversarial_ratio)
+    columns = {}
+    for feature in FEATURES:
+        human = _draw(rng, HUMAN_PROFILE[feature], n)
+        bot = _draw(rng, BOT_PROFILE[feature], n)
+        mimic = rng.random(n) < mimicry
+        columns[feature] = np.where(~is_bot | (adversarial & mimic), human, bot)
+    columns['is_bot'] = is_bot.astype(np.uint8)
+    columns['adversarial'] = adversarial
+    return columns
+
+
+def generate_rows(seed: int, start: int, stop: int, **mix):
+    """Yields (first row, columns) for global rows [start, stop), one RNG block (or part of one) at a time."""
+    row = start
+    while row < stop:
+        block = row // RNG_BLOCK_ROWS
+        offset = row - block * RNG_BLOCK_ROWS
+        count = min(RNG_BLOCK_ROWS - offset, stop - row)
+        columns = generate_block(seed, block, **mix)
+        yield row, {name: values[offset:offset + count] for name, values in columns.items()}
+        row += count
+
+
+def shard_name(index: int) -> str:
+    return f"sessions-{index:05d}"
+
+
+def _shard_header(rows: int, start_row: int, seed: int, mix: dict) -> bytes:
+    header = json.dumps({
+        'columns': COLUMNS,
+        'dtypes': {c: SHARD_DTYPES[c].str for c in COLUMNS},
+        'rows': rows,
+        'start_row': start_row,
+        'seed': seed,
+        'mix': mix,
+    }).encode('utf-8')
+    return SHARD_MAGIC + struct.pack('<HI', SHARD_VERSION, len(header)) + header
+
+
+def read_binary_shard(path: str) -> pd.DataFrame:
+    """Reads a binary shard back into the CSV's columns."""
+    with open(path, 'rb') as f:
+        data = f.read()
+    if data[:len(SHARD_MAGIC)] != SHARD_MAGIC:
+        raise ValueError(f"'{path}' is not an Astra session shard.")
+    offset = len(SHARD_MAGIC)
+    version, header_len = struct.unpack_from('<HI', data, offset)
+    if version != SHARD_VERSION:
+        raise ValueError(f"'{path}': unsupported shard version {version}.")
+    offset += struct.calcsize('<HI')
+    header = json.loads(data[offset:offset + header_len])
+    columns = header['columns']
+    dtypes = {c: np.dtype(header['dtypes'][c]) for c in columns}
+    parts: Dict[str, list] = {c: [] for c in columns}
+    for _, _, arrays in iter_columnar_blocks(data, offset + header_len, columns, dtypes):
+        for column in columns:
+            parts[column].append(arrays[column])
+    return pd.DataFrame({c: np.concatenate(parts[c]) if parts[c] else np.empty(0, dtypes[c]) for c in columns})
+
+
+def write_shard(args) -> dict:
+    """Generates and writes one shard in the requested formats; returns its manifest entry."""
+    index, start_row, rows, seed, mix, output_dir, formats = args
+    name = shard_name(index)
+    started = time.perf_counter()
+    csv_path = os.path.join(output_dir, f"{name}.csv") if 'csv' in formats else None
+    bin_path = os.path.join(output_dir, f"{name}.bin") if 'binary' in formats else None
+    csv_file = open(csv_path, 'w', newline='') if csv_path else None
+    bin_file = open(bin_path, 'wb') if bin_path else None
+    bots = adversarial = 0
+    try:
+        if bin_file:
+            bin_file.write(_shard_header(rows, start_row, seed, mix))
+        first = True
+        for _, columns in generate_rows(seed, start_row, start_row + rows, **mix):
+            bots += int(columns['is_bot'].sum())
+            adversarial += int(columns['adversarial'].sum())
+            if csv_file:
+                pd.DataFrame({c: columns[c] for c in COLUMNS}).to_csv(csv_file, header=first, index=False,
+                                                                      float_format='%.2f')
+            if bin_file:
+                bin_file.write(encode_columnar_block(COLUMNS, SHARD_DTYPES, columns))
+            first = False
+    finally:
+        for f in (csv_file, bin_file):
+            if f:
+                f.close()
+    entry = {'name': name, 'start_row': start_row, 'rows': rows, 'bots': bots, 'adversarial_bots': adversarial,
+             'seconds': round(time.perf_counter() - started, 3)}
+    for key, path in (('csv', csv_path), ('binary', bin_path)):
+        if path:
+            entry[key] = {'file': os.path.basename(path), 'bytes': os.path.getsize(path)}
+    return entry
+
+
+def generate_dataset(rows: int, output_dir: str = OUTPUT_DIR, shard_rows: int = DEFAULT_SHARD_ROWS,
+                     seed: int = DEFAULT_SEED, bot_ratio: float = DEFAULT_BOT_RATIO, adversarial_ratio: float = 0.0,
+                     mimicry: float = 0.5, formats=('csv', 'binary'), workers: int = None) -> dict:
+    """
+    Writes `rows` sessions as shards of `shard_rows` rows (the last may be
+    shorter) across a process pool, plus `manifest.json`. Returns the manifest.
+    """
+    mix = {'bot_ratio': bot_ratio, 'adversarial_ratio': adversarial_ratio, 'mimicry': mimicry}
+    os.makedirs(output_dir, exist_ok=True)
+    tasks = [(i, start, min(shard_rows, rows - start), seed, mix, output_dir, tuple(formats))
+             for i, start in enumerate(range(0, rows, shard_rows))]
+    started = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        shards = list(pool.map(write_shard, tasks))
+    elapsed = time.perf_counter() - started
+    manifest = {
+        'seed': seed,
+        **mix,
+        'rows': rows,
+        'shard_rows': shard_rows,
+        'rng_block_rows': RNG_BLOCK_ROWS,
+        'columns': COLUMNS,
+        'binary_dtypes': {c: SHARD_DTYPES[c].str for c in COLUMNS},
+        'formats': list(formats),
+        'bots': sum(s['bots'] for s in shards),
+        'adversarial_bots': sum(s['adversarial_bots'] for s in shards),
+        'seconds': round(elapsed, 3),
+        'rows_per_minute': round(rows / elapsed * 60) if elapsed else None,
+        'shards': shards,
+    }
+    with open(os.path.join(output_dir, 'manifest.json'), 'w') as f:
+        json.dump(manifest, f, indent=2)
+    return manifest
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate sharded synthetic Astra sessions.")
+    parser.add_argument('--rows', type=int, required=True, help="Total sessions to generate.")
+    parser.add_argument('--output', default=OUTPUT_DIR, help="Directory for the shards and manifest.json.")
+    parser.add_argument('--shard-rows', type=int, default=DEFAULT_SHARD_ROWS, help="Sessions per shard.")
+    parser.add_argument('--seed', type=int, default=DEFAULT_SEED, help="Random seed.")
+    parser.add_argument('--bot-ratio', type=float, default=DEFAULT_BOT_RATIO, help="Share of sessions that are bots.")
+    parser.add_argument('--adversarial-ratio', type=float, default=0.0,
+                        help="Share of bots that mimic humans.")
+    parser.add_argument('--mimicry', type=float, default=0.5,
+                        help="Per-feature probability that an adversarial bot's value is drawn from the human profile.")
+    parser.add_argument('--format', choices=['csv', 'binary', 'both'], default='both', help="Shard formats to write.")
+    parser.add_argument('--workers', type=int, default=None, help="Worker processes (default: all CPUs).")
+    args = parser.parse_args()
+
+    formats = ('csv', 'binary') if args.format == 'both' else (args.format,)
+    manifest = generate_dataset(args.rows, output_dir=args.output, shard_rows=args.shard_rows, seed=args.seed,
+                                bot_ratio=args.bot_ratio, adversarial_ratio=args.adversarial_ratio,
+                                mimicry=args.mimicry, formats=formats, workers=args.workers)
+    sizes = {fmt: sum(s[fmt]['bytes'] for s in manifest['shards']) for fmt in formats}
+    print(f"{manifest['rows']:,} sessions ({manifest['bots']:,} bots, {manifest['adversarial_bots']:,} adversarial) "
+          f"in {len(manifest['shards'])} shards, {manifest['seconds']:.1f}s "
+          f"({manifest['rows_per_minute']:,} rows/min). "
+          + ", ".join(f"{fmt}: {size / 1e6:.1f} MB" for fmt, size in sizes.items()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,194 @@
+# Latency-budgeted Model Selection for Astra
+# Sweeps tree-ensemble size/depth in a process pool and scores every candidate
+# on both held-out F1 and serving latency, measured with the compiled engine
+# the API uses. Returns the Pareto frontier and the most accurate candidate
+# whose single-row p99 latency fits the budget.
+#
+# The validation fold is carved out of the training split once: its scaled
+# matrices are written as .npy files that every worker memory-maps, so no
+# candidate re-reads, re-splits or re-scales the data. Fitting runs in
+# parallel; latency is measured afterwards, one candidate at a time, so
+# candidates never compete for CPU while they are being timed.
+
+import itertools
+import json
+import logging
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import joblib
+import numpy as np
+from sklearn.ensemble import ExtraTreesClassifier, RandomForestClassifier
+from sklearn.metrics import f1_score
+from sklearn.model_selection import train_test_split
+from sklearn.preprocessing import StandardScaler
+
+from feature_store import CACHE_DIR, RANDOM_STATE
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from src.engine import CompiledForest
+
+logger = logging.getLogger(__name__)
+
+SWEEP_DIR = os.path.join(CACHE_DIR, 'sweep')
+REPORT_PATH = '../models/sweep_report.json'
+
+FAMILIES = {'rf': RandomForestClassifier, 'et': ExtraTreesClassifier}
+DEFAULT_GRID = {'n_estimators': [25, 50, 100, 200], 'max_depth': [4, 6, 10, None]}
+DEFAULT_P99_BUDGET_MS = 0.5
+VALIDATION_SIZE = 0.2
+
+# Latency measurement: single-row calls (the /predict path) and batches of LATENCY_BATCH rows
+LATENCY_SINGLE_CALLS = 1000
+LATENCY_BATCH = 64
+LATENCY_BATCH_CALLS = 100
+
+
+def prepare_folds(store, path=SWEEP_DIR):
+    """
+    Splits the training rows into fit/validation folds, fits the scaler on the
+    fit fold and writes the prepared arrays to `path` for the workers to map.
+    """
+    os.makedirs(path, exist_ok=True)
+    y_train = np.asarray(store.y[store.train_idx])
+    fit_idx, val_idx = train_test_split(store.train_idx, test_size=VALIDATION_SIZE, random_state=RANDOM_STATE,
+                                        stratify=y_train)
+    scaler = StandardScaler().fit(store.frame(fit_idx))
+    arrays = {
+        'X_fit': scaler.transform(store.frame(fit_idx)),
+        'y_fit': np.asarray(store.y[fit_idx]),
+        'X_val': scaler.transform(store.frame(val_idx)),
+        'y_val': np.asarray(store.y[val_idx]),
+        'X_val_raw': np.asarray(store.X[val_idx], dtype=np.float64),
+    }
+    for name, array in arrays.items():
+        np.save(os.path.join(path, f'{name}.npy'), array)
+    joblib.dump(scaler, os.path.join(path, 'scaler.joblib'))
+    logger.info(f"Prepared folds in '{path}': {len(fit_idx)} fit rows, {len(val_idx)} validation rows.")
+    return path
+
+
+def _load_folds(path):
+    return {name: np.load(os.path.join(path, f'{name}.npy'), mmap_mode='r')
+            for name in ('X_fit', 'y_fit', 'X_val', 'y_val', 'X_val_raw')}
+
+
+_folds = None
+
+
+def _init_worker(path):
+    global _folds
+    _folds = _load_folds(path)
+
+
+def _fit_candidate(candidate):
+    """Fits one candidate on the fit fold and scores F1 on the validation fold (runs in a worker)."""
+    family, params = candidate
+    start = time.perf_counter()
+    model = FAMILIES[family](**params, random_state=RANDOM_STATE, n_jobs=1)
+    model.fit(_folds['X_fit'], _folds['y_fit'])
+    fit_seconds = time.perf_counter() - start
+    f1 = f1_score(_folds['y_val'], model.predict(_folds['X_val']))
+    return candidate, model, float(f1), fit_seconds
+
+
+def measure_latency(engine, X_raw):
+    """Single-row p50/p99 and batch p99 of `engine.predict_rows`, in milliseconds."""
+    columns = engine.feature_columns
+    rows = [dict(zip(columns, map(float, x))) for x in X_raw[:max(LATENCY_SINGLE_CALLS, LATENCY_BATCH)]]
+    engine.predict_rows(rows[:LATENCY_BATCH])  # Warm-up
+
+    single = np.empty(LATENCY_SINGLE_CALLS)
+    for i in range(LATENCY_SINGLE_CALLS):
+        row = [rows[i % len(rows)]]
+        start = time.perf_counter()
+        engine.predict_rows(row)
+        single[i] = time.perf_counter() - start
+
+    batch = np.empty(LATENCY_BATCH_CALLS)
+    for i in range(LATENCY_BATCH_CALLS):
+        offset = (i * LATENCY_BATCH) % max(1, len(rows) - LATENCY_BATCH + 1)
+        chunk = rows[offset:offset + LATENCY_BATCH]
+        start = time.perf_counter()
+        engine.predict_rows(chunk)
+        batch[i] = time.perf_counter() - start
+
+    return {
+        'single_p50_ms': round(float(np.percentile(single, 50)) * 1000, 4),
+        'single_p99_ms': round(float(np.percentile(single, 99)) * 1000, 4),
+        'batch_p99_ms': round(float(np.percentile(batch, 99)) * 1000, 4),
+        'batch_us_per_row': round(float(np.median(batch)) / LATENCY_BATCH * 1e6, 2),
+    }
+
+
+def pareto_frontier(results):
+    """Candidates no other candidate beats on both F1 and single-row p99 latency."""
+    frontier, best_f1 = [], -1.0
+    for result in sorted(results, key=lambda r: (r['single_p99_ms'], -r['f1'])):
+        if result['f1'] > best_f1:
+            frontier.append(result)
+            best_f1 = result['f1']
+    return frontier
+
+
+def select(results, p99_budget_ms):
+    """The most accurate candidate within the budget (fastest on ties), or the fastest if none fits."""
+    within = [r for r in results if r['single_p99_ms'] <= p99_budget_ms]
+    if not within:
+        logger.warning(f"No candidate meets the {p99_budget_ms} ms p99 budget; choosing the fastest one.")
+        return min(results, key=lambda r: r['single_p99_ms'])
+    return max(within, key=lambda r: (r['f1'], -r['single_p99_ms']))
+
+
+def run_sweep(store, families=('rf',), grid=None, workers=None, p99_budget_ms=DEFAULT_P99_BUDGET_MS,
+              report_path=REPORT_PATH):
+    """
+    Runs the sweep and writes a JSON report. Returns (chosen, results); each
+    result holds the family, parameters, F1, fit time and latencies.
+    """
+    grid = grid or DEFAULT_GRID
+    keys = sorted(grid)
+    candidates = [(family, dict(zip(keys, values)))
+                  for family in families for values in itertools.product(*(grid[k] for k in keys))]
+    path = prepare_folds(store)
+    scaler = joblib.load(os.path.join(path, 'scaler.joblib'))
+    X_val_raw = _load_folds(path)['X_val_raw']
+    workers = workers or os.cpu_count() or 1
+    logger.info(f"Sweeping {len(candidates)} candidates on {workers} worker(s)...")
+
+    fitted = []
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(path,)) as pool:
+        for future in as_completed([pool.submit(_fit_candidate, c) for c in candidates]):
+            fitted.append(future.result())
+
+    results = []
+    for (family, params), model, f1, fit_seconds in sorted(fitted, key=lambda f: str(f[0])):
+        engine = CompiledForest.from_sklearn(model, scaler, store.feature_columns)
+        result = {'family': family, 'params': params, 'f1': round(f1, 5), 'fit_seconds': round(fit_seconds, 3),
+                  'nodes': int(len(engine.feature)), **measure_latency(engine, X_val_raw)}
+        results.append(result)
+        logger.info(f"{family} {params}: F1={result['f1']:.4f}  p99={result['single_p99_ms']:.3f} ms  "
+                    f"batch={result['batch_us_per_row']:.1f} us/row")
+
+    frontier = pareto_frontier(results)
+    chosen = select(results, p99_budget_ms)
+    for result in results:
+        result['pareto'] = result in frontier
+    report = {'p99_budget_ms': p99_budget_ms, 'validation_size': VALIDATION_SIZE, 'chosen': chosen,
+              'frontier': frontier, 'candidates': results}
+    os.makedirs(os.path.dirname(report_path) or '.', exist_ok=True)
+    with open(report_path, 'w') as f:
+        json.dump(report, f, indent=2)
+
+    print("\n" + "=" * 78)
+    print(f"{'':2}{'family':<7}{'n_estimators':>13}{'max_depth':>10}{'F1':>9}{'p99 ms':>10}{'us/row@64':>11}")
+    for result in frontier:
+        marker = '*' if result is chosen else ' '
+        print(f"{marker:2}{result['family']:<7}{str(result['params'].get('n_estimators')):>13}"
+              f"{str(result['params'].get('max_depth')):>10}{result['f1']:>9.4f}{result['single_p99_ms']:>10.3f}"
+              f"{result['batch_us_per_row']:>11.1f}")
+    print(f"Pareto frontier shown; * = chosen under the {p99_budget_ms} ms p99 budget. Report: '{report_path}'")
+    print("=" * 78)
+    return chosen, results
@@ -1,98 +1,315 @@
 # Test Script for Astra IRCTC Bot Detector
-# This script loads a pre-trained model and evaluates it on the 20% test set.
+# This script loads a pre-trained model and evaluates it on the 20% test set,
+# or streams any labelled CSV through it chunk by chunk (--data). With
+# --headless it writes the confusion matrix plot and a JSON report instead of
+# opening a window; --benchmark adds an inference throughput/latency suite.
 
 import pandas as pd
 import numpy as np
-from sklearn.model_selection import train_test_split
-from sklearn.metrics import classification_report, confusion_matrix, accuracy_score, precision_score, recall_score, f1_score
 import joblib
 import os
+import sys
+import json
+import time
+import argparse
 import logging
-import seaborn as sns
-import matplotlib.pyplot as plt
+import platform
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+import sklearn
+import matplotlib
+
+from feature_store import load_feature_store
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from src.engine import CompiledForest
 
 # Set up logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
-def load_artifacts_and_test_data(data_path='../data/tatkal.csv'):
+OUTPUT_DIR = '../reports'
+DEFAULT_CHUNK_SIZE = 100_000
+DEFAULT_BATCH_SIZES = [1, 8, 64, 512]
+DEFAULT_THREADS = [1, 2, 4]
+BENCHMARK_SEED = 42
+BENCHMARK_MIN_SECONDS = 0.5   # Per measurement; the median of the repeats is reported
+BENCHMARK_REPEATS = 3
+REGRESSION_TOLERANCE = 0.10   # Rows/sec drop versus the baseline that counts as a regression
+
+def load_artifacts(models_dir='../models'):
     """
-    Loads the saved model, scaler, feature list, and the specific 20% test data split.
+    Loads the saved model, scaler and feature list.
     """
     try:
         logger.info("Loading saved model and artifacts from 'models' directory...")
-        model = joblib.load('../models/astra_model.joblib')
-        scaler = joblib.load('../models/astra_scaler.joblib')
-        feature_columns = joblib.load('../models/feature_columns.joblib')
+        model = joblib.load(os.path.join(models_dir, 'astra_model.joblib'))
+        scaler = joblib.load(os.path.join(models_dir, 'astra_scaler.joblib'))
+        feature_columns = joblib.load(os.path.join(models_dir, 'feature_columns.joblib'))
         logger.info("Artifacts loaded successfully.")
-
-        df = pd.read_csv(data_path)
-        X = df[feature_columns]
-        y = df['is_bot']
-
-        # Recreate the exact same train-test split to isolate the test set
-        _, X_test, _, y_test = train_test_split(X, y, test_size=0.2, random_state=42, stratify=y)
-        logger.info(f"Test data isolated successfully. Shape: {X_test.shape}")
-        
-        return model, scaler, X_test, y_test
-
+        return model, scaler, feature_columns
     except FileNotFoundError as e:
         logger.error(f"Error: A required file was not found. {e}")
         logger.error("Please ensure you have run the training script first to generate the model files.")
         raise
-    except Exception as e:
-        logger.error(f"An error occurred during loading: {e}")
-        raise
+
+def iter_test_chunks(feature_columns, data_path='../data/tatkal.csv', chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Yields (X, y) chunks of the 20% test split. The feature store holds the
+    exact train-test split indices used for training.
+    """
+    store = load_feature_store(data_path)
+    logger.info(f"Test data isolated successfully. Rows: {len(store.test_idx)}")
+    for start in range(0, len(store.test_idx), chunk_size):
+        idx = store.test_idx[start:start + chunk_size]
+        yield store.frame(idx, columns=feature_columns), np.asarray(store.y[idx])
+
+def iter_csv_chunks(feature_columns, csv_path, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Yields (X, y) chunks of any labelled CSV, never holding more than one chunk in memory."""
+    if not os.path.exists(csv_path):
+        raise FileNotFoundError(f"The data file '{csv_path}' was not found.")
+    for chunk in pd.read_csv(csv_path, chunksize=chunk_size):
+        yield chunk[feature_columns], chunk['is_bot'].to_numpy()
+
+def evaluate(model, scaler, chunks):
+    """Scores each chunk and accumulates the 2x2 confusion matrix (rows: actual, columns: predicted)."""
+    cm = np.zeros((2, 2), dtype=np.int64)
+    rows, start = 0, time.perf_counter()
+    for X, y in chunks:
+        y_pred = model.predict(scaler.transform(X))
+        cm += np.bincount(np.asarray(y, dtype=np.int64) * 2 + y_pred.astype(np.int64), minlength=4).reshape(2, 2)
+        rows += len(y)
+    elapsed = time.perf_counter() - start
+    logger.info(f"Scored {rows:,} rows in {elapsed:.2f}s.")
+    return cm, elapsed
+
+def metrics_from_confusion(cm):
+    """Accuracy plus per-class precision/recall/F1 from a confusion matrix; 'Bot' is the positive class."""
+    total = int(cm.sum())
+    per_class = {}
+    for label, name in enumerate(['Human', 'Bot']):
+        tp = int(cm[label, label])
+        predicted = int(cm[:, label].sum())
+        actual = int(cm[label, :].sum())
+        precision = tp / predicted if predicted else 0.0
+        recall = tp / actual if actual else 0.0
+        f1 = 2 * precision * recall / (precision + recall) if precision + recall else 0.0
+        per_class[name] = {'precision': precision, 'recall': recall, 'f1': f1, 'support': actual}
+    return {
+        'samples': total,
+        'accuracy': float(np.trace(cm)) / total if total else 0.0,
+        'precision': per_class['Bot']['precision'],
+        'recall': per_class['Bot']['recall'],
+        'f1': per_class['Bot']['f1'],
+        'per_class': per_class,
+        'confusion_matrix': cm.tolist(),
+    }
+
+def plot_confusion_matrix(cm, output_path=None):
+    """Draws the confusion matrix; saves it to `output_path`, or shows it when none is given."""
+    import matplotlib.pyplot as plt
+    import seaborn as sns
+
+    plt.figure(figsize=(8, 6))
+    sns.heatmap(cm, annot=True, fmt='d', cmap='Blues', xticklabels=['Human', 'Bot'], yticklabels=['Human', 'Bot'])
+    plt.title('Confusion Matrix on Test Data')
+    plt.ylabel('Actual Label')
+    plt.xlabel('Predicted Label')
+    if output_path:
+        plt.savefig(output_path, bbox_inches='tight')
+        plt.close()
+    else:
+        plt.show()
+
+# --- Benchmark ---
+def _time_calls(predict, batches, batch_size, threads, min_seconds):
+    """Runs `predict` over `batches` on `threads` threads for at least `min_seconds`; returns (rows, wall, call times)."""
+    deadline = time.perf_counter() + min_seconds
+
+    def worker(offset):
+        times, rows, i = [], 0, offset
+        while time.perf_counter() < deadline:
+            batch = batches[i % len(batches)]
+            start = time.perf_counter()
+            predict(batch)
+            times.append(time.perf_counter() - start)
+            rows += batch_size
+            i += threads
+        return rows, times
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        results = list(pool.map(worker, range(threads)))
+    wall = time.perf_counter() - start
+    return sum(r for r, _ in results), wall, np.concatenate([np.asarray(t) for _, t in results])
+
+def run_benchmark(model, scaler, feature_columns, X, batch_sizes=DEFAULT_BATCH_SIZES, threads=DEFAULT_THREADS,
+                  repeats=BENCHMARK_REPEATS, min_seconds=BENCHMARK_MIN_SECONDS):
+    """
+    Times the scaler + model path (and the compiled engine the API serves with)
+    at each batch size and thread count. The input rows are a fixed, seeded
+    sample, and each cell reports the median of `repeats` timed runs after a
+    warm-up, so reports from different runs can be compared cell by cell.
+    """
+    rng = np.random.default_rng(BENCHMARK_SEED)
+    X = X.iloc[rng.permutation(len(X))].reset_index(drop=True)
+    engine = CompiledForest.from_sklearn(model, scaler, feature_columns)
+    paths = {
+        'sklearn': lambda batch: model.predict_proba(scaler.transform(batch[0])),
+        'compiled': lambda batch: engine.predict_rows(batch[1]),
+    }
+
+    results = []
+    for batch_size in batch_sizes:
+        frames = [X.iloc[i:i + batch_size] for i in range(0, max(1, len(X) - batch_size + 1), batch_size)][:64]
+        frames = [f if len(f) == batch_size else X.sample(batch_size, replace=True, random_state=BENCHMARK_SEED)
+                  for f in frames]
+        batches = [(f, f.to_dict('records')) for f in frames]
+        for path, predict in paths.items():
+            predict(batches[0])  # Warm-up
+            for n_threads in threads:
+                runs = [_time_calls(predict, batches, batch_size, n_threads, min_seconds) for _ in range(repeats)]
+                rows_per_sec = [rows / wall for rows, wall, _ in runs]
+                median_run = runs[int(np.argsort(rows_per_sec)[len(runs) // 2])]
+                call_times = median_run[2]
+                result = {
+                    'path': path,
+                    'batch_size': batch_size,
+                    'threads': n_threads,
+                    'rows_per_sec': round(float(np.median(rows_per_sec)), 1),
+                    'us_per_row': round(float(np.median(call_times)) / batch_size * 1e6, 3),
+                    'call_p50_ms': round(float(np.percentile(call_times, 50)) * 1000, 4),
+                    'call_p99_ms': round(float(np.percentile(call_times, 99)) * 1000, 4),
+                }
+                results.append(result)
+                logger.info(f"{path:<8} batch={batch_size:<5} threads={n_threads:<2} "
+                            f"{result['rows_per_sec']:>12,.0f} rows/s  {result['us_per_row']:>10.2f} us/row")
+    return results
+
+def compare_to_baseline(benchmark, baseline_path, tolerance=REGRESSION_TOLERANCE):
+    """Benchmark cells whose rows/sec fell more than `tolerance` below the baseline report's."""
+    with open(baseline_path) as f:
+        baseline = {(r['path'], r['batch_size'], r['threads']): r for r in json.load(f).get('benchmark', [])}
+    regressions = []
+    for result in benchmark:
+        before = baseline.get((result['path'], result['batch_size'], result['threads']))
+        if before and result['rows_per_sec'] < before['rows_per_sec'] * (1 - tolerance):
+            regressions.append({**result, 'baseline_rows_per_sec': before['rows_per_sec'],
+                                'change': round(result['rows_per_sec'] / before['rows_per_sec'] - 1, 4)})
+    return regressions
+
+def environment_info(model):
+    return {
+        'timestamp': datetime.now().isoformat(),
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'sklearn': sklearn.__version__,
+        'cpu_count': os.cpu_count(),
+        'machine': platform.machine(),
+        'model': {'type': type(model).__name__, 'n_estimators': len(model.estimators_),
+                  'max_depth': model.get_params().get('max_depth')},
+    }
+
+def parse_list(value):
+    return [int(v) for v in value.split(',') if v.strip()]
 
 def main():
     """
     Main function to run the test script.
     """
+    parser = argparse.ArgumentParser(description="Evaluate and benchmark the Astra bot detector.")
+    parser.add_argument('--data', default=None,
+                        help="Labelled CSV to stream through the model (default: the held-out test split).")
+    parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE, help="Rows scored at a time.")
+    parser.add_argument('--headless', action='store_true', help="Write the plot and a JSON report instead of showing the plot.")
+    parser.add_argument('--output-dir', default=OUTPUT_DIR, help="Where --headless writes its files.")
+    parser.add_argument('--benchmark', action='store_true', help="Also run the inference throughput/latency suite.")
+    parser.add_argument('--batch-sizes', type=parse_list, default=DEFAULT_BATCH_SIZES, help="e.g. 1,8,64,512")
+    parser.add_argument('--threads', type=parse_list, default=DEFAULT_THREADS, help="e.g. 1,2,4")
+    parser.add_argument('--baseline', default=None,
+                        help="Earlier JSON report to compare benchmark throughput against; exits 1 on a regression.")
+    args = parser.parse_args()
+
     logger.info("--- Starting Astra Model Test Script ---")
-    
+
     try:
-        model, scaler, X_test, y_test = load_artifacts_and_test_data()
-        
-        # Scale the test data using the loaded scaler
-        X_test_scaled = scaler.transform(X_test)
-        
-        logger.info("Making predictions on the held-out test set...")
-        y_pred = model.predict(X_test_scaled)
-        
-        # --- Evaluation Metrics ---
-        accuracy = accuracy_score(y_test, y_pred)
-        precision = precision_score(y_test, y_pred)
-        recall = recall_score(y_test, y_pred)
-        f1 = f1_score(y_test, y_pred)
-        report = classification_report(y_test, y_pred, target_names=['Human', 'Bot'])
-        
+        model, scaler, feature_columns = load_artifacts()
+        if args.headless:
+            matplotlib.use('Agg')
+            os.makedirs(args.output_dir, exist_ok=True)
+
+        logger.info("Making predictions on the held-out test set..." if args.data is None
+                    else f"Streaming '{args.data}' through the model...")
+        chunks = iter_test_chunks(feature_columns, chunk_size=args.chunk_size) if args.data is None \
+            else iter_csv_chunks(feature_columns, args.data, chunk_size=args.chunk_size)
+        cm, elapsed = evaluate(model, scaler, chunks)
+        metrics = metrics_from_confusion(cm)
+
         # --- Final Test Report ---
         print("\n" + "="*60)
         print("      ASTRA MODEL TEST SET EVALUATION")
         print("="*60)
         print(f"Model: ../models/astra_model.joblib")
-        print(f"Test Samples: {len(X_test)}")
+        print(f"Test Samples: {metrics['samples']}")
         print("\n--- PERFORMANCE ON UNSEEN DATA ---")
-        print(f"  Accuracy:  {accuracy:.4f}  ({accuracy*100:.2f}%)")
-        print(f"  Precision: {precision:.4f}  ({precision*100:.2f}%)")
-        print(f"  Recall:    {recall:.4f}  ({recall*100:.2f}%)")
-        print(f"  F1-Score:  {f1:.4f}  ({f1*100:.2f}%)")
+        print(f"  Accuracy:  {metrics['accuracy']:.4f}  ({metrics['accuracy']*100:.2f}%)")
+        print(f"  Precision: {metrics['precision']:.4f}  ({metrics['precision']*100:.2f}%)")
+        print(f"  Recall:    {metrics['recall']:.4f}  ({metrics['recall']*100:.2f}%)")
+        print(f"  F1-Score:  {metrics['f1']:.4f}  ({metrics['f1']*100:.2f}%)")
         print("\n--- CLASSIFICATION REPORT ---")
-        print(report)
-        
+        print(f"{'':>10}{'precision':>11}{'recall':>9}{'f1-score':>10}{'support':>10}")
+        for name, values in metrics['per_class'].items():
+            print(f"{name:>10}{values['precision']:>11.2f}{values['recall']:>9.2f}{values['f1']:>10.2f}"
+                  f"{values['support']:>10}")
+
+        report = {
+            'environment': environment_info(model),
+            'data': args.data or 'test split',
+            'evaluation': {**metrics, 'seconds': round(elapsed, 3),
+                           'rows_per_sec': round(metrics['samples'] / elapsed, 1) if elapsed else None},
+        }
+
+        if args.benchmark:
+            X_bench = next(iter_test_chunks(feature_columns, chunk_size=4096))[0] if args.data is None \
+                else next(iter_csv_chunks(feature_columns, args.data, chunk_size=4096))[0]
+            report['benchmark'] = run_benchmark(model, scaler, feature_columns, X_bench,
+                                                batch_sizes=args.batch_sizes, threads=args.threads)
+            print("\n--- INFERENCE BENCHMARK ---")
+            print(f"{'path':<10}{'batch':>7}{'threads':>9}{'rows/s':>14}{'us/row':>11}{'p99 ms/call':>13}")
+            for r in report['benchmark']:
+                print(f"{r['path']:<10}{r['batch_size']:>7}{r['threads']:>9}{r['rows_per_sec']:>14,.0f}"
+                      f"{r['us_per_row']:>11.2f}{r['call_p99_ms']:>13.3f}")
+
         # --- Confusion Matrix Visualization ---
-        cm = confusion_matrix(y_test, y_pred)
-        plt.figure(figsize=(8, 6))
-        sns.heatmap(cm, annot=True, fmt='d', cmap='Blues', xticklabels=['Human', 'Bot'], yticklabels=['Human', 'Bot'])
-        plt.title('Confusion Matrix on Test Data')
-        plt.ylabel('Actual Label')
-        plt.xlabel('Predicted Label')
-        plt.show()
-        
+        if args.headless:
+            stamp = datetime.now().strftime('%Y%m%d-%H%M%S')
+            plot_path = os.path.join(args.output_dir, f'confusion_matrix_{stamp}.png')
+            report_path = os.path.join(args.output_dir, f'evaluation_{stamp}.json')
+            plot_confusion_matrix(cm, plot_path)
+            report['confusion_matrix_plot'] = plot_path
+            with open(report_path, 'w') as f:
+                json.dump(report, f, indent=2)
+            print(f"\nReport written to '{report_path}', plot to '{plot_path}'.")
+        else:
+            plot_confusion_matrix(cm)
+
+        if args.baseline and args.benchmark:
+            regressions = compare_to_baseline(report['benchmark'], args.baseline)
+            if regressions:
+                print(f"\n❌ {len(regressions)} benchmark cell(s) regressed more than "
+                      f"{REGRESSION_TOLERANCE:.0%} versus '{args.baseline}':")
+                for r in regressions:
+                    print(f"  {r['path']} batch={r['batch_size']} threads={r['threads']}: "
+                          f"{r['rows_per_sec']:,.0f} vs {r['baseline_rows_per_sec']:,.0f} rows/s ({r['change']:+.1%})")
+                sys.exit(1)
+            print(f"\nNo benchmark regressions versus '{args.baseline}'.")
+
         print("\n✅ Testing complete.")
 
     except Exception as e:
         logger.error(f"An error occurred during the testing process: {e}")
+        sys.exit(1)
 
 if __name__ == "__main__":
     main()
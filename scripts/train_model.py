@@ -3,42 +3,59 @@
 
 import pandas as pd
 import numpy as np
-from sklearn.model_selection import train_test_split
 from sklearn.preprocessing import StandardScaler
-from sklearn.ensemble import RandomForestClassifier
 import joblib
 import os
+import sys
+import argparse
 import logging
+import sklearn
+import time
+from sklearn.model_selection import train_test_split
+from sklearn.tree import DecisionTreeClassifier
+
+from feature_store import RANDOM_STATE, load_feature_store
+from model_sweep import DEFAULT_P99_BUDGET_MS, FAMILIES, VALIDATION_SIZE, run_sweep
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from src.cascade import DEFAULT_MIN_SUPPORT, DEFAULT_TARGET_PRECISION as DEFAULT_CASCADE_PRECISION, Cascade, fit_leaves
+from src.drift import build_reference, save_reference
+from src.engine import CompiledForest
+from src.progressive import DEFAULT_TARGET_PRECISION, STAGE_NAMES, STAGES, block_threshold, stage_bundle_path, stage_columns
 
 # Set up logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
 def load_data(filepath='../data/tatkal.csv'):
-    """Load the enhanced dataset."""
+    """Load the enhanced dataset from its memory-mapped feature store (built from the CSV on first use)."""
     try:
-        df = pd.read_csv(filepath)
-        logger.info(f"Enhanced dataset loaded successfully. Shape: {df.shape}")
-        return df
+        store = load_feature_store(filepath)
+        logger.info(f"Enhanced dataset loaded successfully. Shape: {store.X.shape}")
+        return store
     except FileNotFoundError:
         logger.error(f"Error: The data file '{filepath}' was not found. Please run the feature enhancement script first.")
         raise
 
-def train_and_save_artifacts(df):
+# Used unless a sweep picks something else
+DEFAULT_FAMILY = 'rf'
+DEFAULT_PARAMS = {'n_estimators': 100, 'max_depth': 10}
+
+def train_and_save_artifacts(store, family=DEFAULT_FAMILY, params=None):
     """
     Prepares data, trains the model, and saves all necessary artifacts.
+    `family` ('rf' or 'et') and `params` select the tree ensemble.
     """
+    params = {**DEFAULT_PARAMS, **(params or {})}
     try:
         # 1. Define Features and Target
-        feature_columns = [col for col in df.columns if col != 'is_bot']
-        X = df[feature_columns]
-        y = df['is_bot']
+        feature_columns = store.feature_columns
         logger.info(f"Using {len(feature_columns)} features for training.")
 
         # 2. Split data into 80% training and 20% testing
-        # We create the split here but only use the training set for fitting.
-        X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42, stratify=y)
-        logger.info(f"Data split into {len(X_train)} training samples and {len(X_test)} testing samples.")
+        # The split indices are stored with the data; only the training set is used for fitting.
+        X_train, y_train = store.train()
+        logger.info(f"Data split into {len(store.train_idx)} training samples and {len(store.test_idx)} testing samples.")
 
         # 3. Scale the features
         scaler = StandardScaler()
@@ -46,11 +63,10 @@ def train_and_save_artifacts(df):
         X_train_scaled = scaler.fit_transform(X_train)
         logger.info("Feature scaler fitted on training data.")
 
-        # 4. Initialize and train the Random Forest model
-        logger.info("Training Random Forest model...")
-        model = RandomForestClassifier(
-            n_estimators=100,
-            max_depth=10,
+        # 4. Initialize and train the tree ensemble (a Random Forest unless a sweep chose otherwise)
+        logger.info(f"Training {FAMILIES[family].__name__} with {params}...")
+        model = FAMILIES[family](
+            **params,
             random_state=42,
             n_jobs=-1
         )
@@ -64,18 +80,228 @@ def train_and_save_artifacts(df):
         joblib.dump(feature_columns, '../models/feature_columns.joblib')
         logger.info("Model, scaler, and feature list saved successfully to 'models/' directory.")
 
+        # 6. Export the single-file bundle the API maps at startup
+        header = CompiledForest.from_sklearn(model, scaler, feature_columns).save(
+            '../models/astra_model.bundle',
+            metadata={'exported_from': 'astra_model.joblib', 'sklearn_version': sklearn.__version__},
+        )
+        logger.info(f"Model bundle v{header['model_version']} saved to 'models/astra_model.bundle'.")
+
+        # 7. Save the training distribution of every feature, the baseline the API's drift monitor compares against
+        save_reference(build_reference(X_train.to_numpy(), feature_columns), '../models/drift_reference.json')
+        logger.info("Feature drift reference saved to 'models/drift_reference.json'.")
+
     except Exception as e:
         logger.error(f"An error occurred during the training process: {e}")
         raise
 
+def train_stage_models(store, family=DEFAULT_FAMILY, params=None, target_precision=DEFAULT_TARGET_PRECISION,
+                       output_dir='../models/stages'):
+    """
+    Trains one model per booking-flow stage on the features known once that
+    stage has finished, for progressive scoring. Each stage's block threshold
+    is the lowest bot probability reaching `target_precision` on a validation
+    fold carved out of the training split; the test split then reports how
+    many bots each stage blocks, how many humans it wrongly blocks, and how
+    much of the session was still to come when a bot was blocked.
+    """
+    params = {**DEFAULT_PARAMS, **(params or {})}
+    y_train = np.asarray(store.y[store.train_idx])
+    fit_idx, val_idx = train_test_split(store.train_idx, test_size=VALIDATION_SIZE, random_state=RANDOM_STATE,
+                                        stratify=y_train)
+    y_fit, y_val = np.asarray(store.y[fit_idx]), np.asarray(store.y[val_idx])
+    X_test, y_test = store.test()
+    y_test = y_test.to_numpy()
+    blocked_at = np.full(len(y_test), -1)  # First stage that blocked each test session
+    os.makedirs(output_dir, exist_ok=True)
+
+    report = []
+    for i, stage in enumerate(STAGE_NAMES):
+        columns = stage_columns(stage)
+        scaler = StandardScaler().fit(store.frame(fit_idx, columns))
+        model = FAMILIES[family](**params, random_state=42, n_jobs=-1)
+        model.fit(scaler.transform(store.frame(fit_idx, columns)), y_fit)
+        engine = CompiledForest.from_sklearn(model, scaler, columns)
+        bot = list(engine.classes_).index(1)
+
+        # The engine takes raw features: the scaler is folded into its thresholds
+        threshold = block_threshold(engine.predict_proba(store.frame(val_idx, columns).to_numpy(np.float64))[:, bot],
+                                    y_val, target_precision)
+        test_proba = engine.predict_proba(X_test[columns].to_numpy(dtype=np.float64))[:, bot]
+        blocked = test_proba >= threshold if threshold is not None else np.zeros(len(y_test), dtype=bool)
+        blocked_at[(blocked_at < 0) & blocked] = i
+        so_far = blocked_at >= 0
+        result = {
+            'stage': stage,
+            'block_threshold': threshold,
+            'test_precision': round(float(y_test[blocked].mean()), 4) if blocked.any() else None,
+            'test_recall': round(float(blocked[y_test == 1].mean()), 4),
+            'bots_blocked_so_far': round(float(so_far[y_test == 1].mean()), 4),
+            'humans_blocked_so_far': round(float(so_far[y_test == 0].mean()), 4),
+        }
+        report.append(result)
+        header = engine.save(stage_bundle_path(stage, output_dir), metadata={
+            'stage': stage, 'block_threshold': threshold, 'target_precision': target_precision,
+            'sklearn_version': sklearn.__version__, 'test': result,
+        })
+        logger.info(f"Stage '{stage}' model v{header['model_version']} saved (block threshold {threshold}).")
+
+    # Time still left in the flow when each bot was blocked: the session minus the stages already done
+    elapsed = np.zeros(len(y_test))
+    remaining = np.full(len(y_test), np.nan)
+    for i, (_, added) in enumerate(STAGES):
+        elapsed += X_test[[c for c in added if c.endswith('_duration')]].sum(axis=1).to_numpy()
+        now_blocked = blocked_at == i
+        remaining[now_blocked] = X_test['session_duration'].to_numpy()[now_blocked] - elapsed[now_blocked]
+    early_bots = (y_test == 1) & (blocked_at >= 0)
+
+    print("\n" + "=" * 78)
+    print(f"{'stage':<18}{'threshold':>10}{'precision':>11}{'recall':>9}{'bots so far':>13}{'humans so far':>15}")
+    for r in report:
+        threshold = f"{r['block_threshold']:.3f}" if r['block_threshold'] is not None else 'off'
+        precision = f"{r['test_precision']:.4f}" if r['test_precision'] is not None else '-'
+        print(f"{r['stage']:<18}{threshold:>10}{precision:>11}{r['test_recall']:>9.4f}"
+              f"{r['bots_blocked_so_far']:>13.4f}{r['humans_blocked_so_far']:>15.4f}")
+    if early_bots.any():
+        print(f"Bots blocked before the flow completed: {early_bots.sum()} of {(y_test == 1).sum()}, "
+              f"median {np.median(remaining[early_bots]):.2f}s before the end of the session.")
+    print("=" * 78)
+    return report
+
+# Pre-filter of the scoring cascade: one tree, shallow enough to score a batch in microseconds
+CASCADE_MAX_DEPTH = 3
+CASCADE_MIN_SAMPLES_LEAF = 20
+
+def _median_seconds(fn, X, batch_size, repeats=3):
+    """Median over `repeats` of the time to score X in consecutive batches of `batch_size` rows."""
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        for i in range(0, len(X), batch_size):
+            fn(X[i:i + batch_size])
+        timings.append(time.perf_counter() - start)
+    return float(np.median(timings))
+
+def train_cascade(store, target_precision=DEFAULT_CASCADE_PRECISION, max_depth=CASCADE_MAX_DEPTH,
+                  min_support=DEFAULT_MIN_SUPPORT, bundle_path='../models/astra_model.bundle',
+                  output_path='../models/cascade_prefilter.bundle'):
+    """
+    Trains the cascade's pre-filter, a single shallow tree, on a fold of the
+    training split, and records per-leaf support, precision and feature
+    ranges on the validation fold (see src/cascade.py for which leaves may
+    then decide). The test split compares the cascade (pre-filter, then the
+    full model saved at `bundle_path` for what it leaves undecided) against
+    the full model alone, for accuracy and for scoring time at serving batch
+    sizes. The bundle records that model's version; the API only serves the
+    pre-filter alongside it.
+    """
+    feature_columns = store.feature_columns
+    y_train = np.asarray(store.y[store.train_idx])
+    fit_idx, val_idx = train_test_split(store.train_idx, test_size=VALIDATION_SIZE, random_state=RANDOM_STATE,
+                                        stratify=y_train)
+    scaler = StandardScaler().fit(store.frame(fit_idx, feature_columns))
+    tree = DecisionTreeClassifier(max_depth=max_depth, min_samples_leaf=CASCADE_MIN_SAMPLES_LEAF, random_state=42)
+    tree.fit(scaler.transform(store.frame(fit_idx, feature_columns)), np.asarray(store.y[fit_idx]))
+    prefilter = CompiledForest.from_sklearn(tree, scaler, feature_columns)
+    leaves = fit_leaves(prefilter, store.frame(val_idx, feature_columns).to_numpy(np.float64),
+                        np.asarray(store.y[val_idx]), store.frame(fit_idx, feature_columns).to_numpy(np.float64),
+                        np.asarray(store.y[fit_idx]))
+    cascade = Cascade(prefilter, leaves, target_precision, min_support)
+
+    forest = CompiledForest.load(bundle_path)
+    X_test, y_test = store.test()
+    X_test, y_test = X_test[feature_columns].to_numpy(np.float64), y_test.to_numpy()
+    full_labels = forest.classes_[forest.predict_proba(X_test).argmax(axis=1)]
+
+    def cascade_labels(X):
+        decided, is_bot, _ = cascade.decide(X, feature_columns)
+        labels = is_bot.astype(full_labels.dtype)
+        if not decided.all():
+            # As the API does: the whole matrix when nothing was decided, so a single escalated row is not copied
+            escalated = ~decided
+            labels[escalated] = forest.classes_[
+                forest.predict_proba(X if not decided.any() else X[escalated]).argmax(axis=1)]
+        return labels, decided
+
+    labels, decided = cascade_labels(X_test)
+    result = {
+        'depth': prefilter.max_depth,
+        'deciding_leaves': cascade.stats()['deciding_leaves'],
+        'leaves': len(leaves),
+        'prefilter_share': round(float(decided.mean()), 4),
+        'prefilter_accuracy': round(float((labels[decided] == y_test[decided]).mean()), 4) if decided.any() else None,
+        'full_accuracy': round(float((full_labels == y_test).mean()), 4),
+        'cascade_accuracy': round(float((labels == y_test).mean()), 4),
+        'agreement_with_full': round(float((labels == full_labels).mean()), 4),
+        'timing': [],
+    }
+    result['accuracy_loss'] = round(result['full_accuracy'] - result['cascade_accuracy'], 4)
+    for batch_size in (1, 64):
+        full_seconds = _median_seconds(forest.predict_proba, X_test, batch_size)
+        cascade_seconds = _median_seconds(cascade_labels, X_test, batch_size)
+        result['timing'].append({
+            'batch_size': batch_size,
+            'full_us_per_row': round(full_seconds / len(X_test) * 1e6, 2),
+            'cascade_us_per_row': round(cascade_seconds / len(X_test) * 1e6, 2),
+            'speedup': round(full_seconds / cascade_seconds, 2) if cascade_seconds else None,
+        })
+
+    header = prefilter.save(output_path, metadata={
+        'leaves': leaves, 'target_precision': target_precision, 'min_support': min_support,
+        'max_depth': max_depth, 'forest_version': forest.metadata.get('model_version'),
+        'sklearn_version': sklearn.__version__, 'test': result,
+    })
+    logger.info(f"Cascade pre-filter v{header['model_version']} saved ({result['deciding_leaves']} of "
+                f"{result['leaves']} leaves may decide).")
+
+    print("\n" + "=" * 78)
+    print(f"Cascade pre-filter: depth-{prefilter.max_depth} tree (limit {max_depth}), {result['deciding_leaves']} of "
+          f"{result['leaves']} leaves decide; it decides {result['prefilter_share']:.1%} of test sessions")
+    print(f"Accuracy: full model {result['full_accuracy']:.4f}, cascade {result['cascade_accuracy']:.4f} "
+          f"(loss {result['accuracy_loss']:.4f}, agreement {result['agreement_with_full']:.4f})")
+    print(f"{'batch':>8}{'full us/row':>14}{'cascade us/row':>17}{'speedup':>10}")
+    for timing in result['timing']:
+        print(f"{timing['batch_size']:>8}{timing['full_us_per_row']:>14.2f}{timing['cascade_us_per_row']:>17.2f}"
+              f"{timing['speedup']:>9.2f}x")
+    print("=" * 78)
+    return result
+
 def main():
     """
     Main function to orchestrate the model training.
     """
+    parser = argparse.ArgumentParser(description="Train the Astra bot detector.")
+    parser.add_argument('--sweep', action='store_true',
+                        help="Sweep ensemble size/depth and train the most accurate model within the latency budget.")
+    parser.add_argument('--p99-budget-ms', type=float, default=DEFAULT_P99_BUDGET_MS,
+                        help="Single-row p99 serving latency budget for --sweep (milliseconds).")
+    parser.add_argument('--families', default='rf', help="Comma-separated ensembles to sweep: rf, et.")
+    parser.add_argument('--workers', type=int, default=None, help="Sweep processes (default: all CPUs).")
+    parser.add_argument('--skip-stages', action='store_true', help="Do not train the per-stage progressive models.")
+    parser.add_argument('--stage-precision', type=float, default=DEFAULT_TARGET_PRECISION,
+                        help="Validation precision an early (per-stage) BLOCK must reach.")
+    parser.add_argument('--skip-cascade', action='store_true', help="Do not train the cascade's pre-filter.")
+    parser.add_argument('--cascade-precision', type=float, default=DEFAULT_CASCADE_PRECISION,
+                        help="Validation precision a pre-filter leaf must reach to decide.")
+    parser.add_argument('--cascade-min-support', type=int, default=DEFAULT_MIN_SUPPORT,
+                        help="Validation sessions a pre-filter leaf needs behind it to decide.")
+    parser.add_argument('--cascade-depth', type=int, default=CASCADE_MAX_DEPTH, help="Depth of the pre-filter tree.")
+    args = parser.parse_args()
+
     logger.info("--- Starting Astra Model Training Script ---")
     try:
         dataset = load_data()
-        train_and_save_artifacts(dataset)
+        family, params = DEFAULT_FAMILY, DEFAULT_PARAMS
+        if args.sweep:
+            chosen, _ = run_sweep(dataset, families=[f.strip() for f in args.families.split(',') if f.strip()],
+                                  workers=args.workers, p99_budget_ms=args.p99_budget_ms)
+            family, params = chosen['family'], chosen['params']
+        train_and_save_artifacts(dataset, family=family, params=params)
+        if not args.skip_cascade:
+            train_cascade(dataset, target_precision=args.cascade_precision, max_depth=args.cascade_depth,
+                          min_support=args.cascade_min_support)
+        if not args.skip_stages:
+            train_stage_models(dataset, family=family, params=params, target_precision=args.stage_precision)
         print("\n" + "="*50)
         print("✅ Training complete. Artifacts are ready for testing.")
         print("="*50)
@@ -0,0 +1,205 @@
+# Admission Control for Astra
+# Bounds the work /predict accepts so latency stays flat under a spike
+# (Tatkal opening) instead of growing until clients time out. A request is
+# admitted to the model only if fewer than `max_in_flight` are already
+# waiting on it and it can still be answered within the latency budget: the
+# time it has already spent plus the expected wait for the queue ahead of it,
+# estimated from recent per-session scoring cost. Time spent before the
+# handler runs (waiting for the event loop, HTTP parsing) is invisible to the
+# request itself, so a probe task measures how late the loop runs and that lag
+# is counted against the budget too. Admitted requests carry a deadline; one
+# still queued when it passes is dropped by the scheduler.
+#
+# A request that is not admitted (or misses its deadline) is either shed with
+# 503 + Retry-After, or answered from the cascade's pre-filter alone and
+# flagged as degraded, whichever `action` says. Parsing and validating a
+# request costs about as much CPU as scoring it, so once the loop lag alone
+# passes EDGE_LAG_SHARE of the budget even degraded answers cannot keep up:
+# AdmissionMiddleware then sheds before the body is read, at about a sixth
+# of the CPU of any answer the handler can give. That check uses sustained
+# lag, the smallest lag of the last EDGE_LAG_WINDOW probes: one long stall
+# (scoring a large /predict/batch, say) delays a single probe, while a loop
+# that is really behind delays all of them.
+
+import asyncio
+import json
+import math
+import threading
+import time
+from collections import deque
+from typing import Iterable, Optional
+
+from src.metrics import Counter
+
+# How quickly the per-session cost estimate follows new batches (weight of the newest)
+EWMA_ALPHA = 0.2
+
+# How often the event-loop lag probe wakes up (seconds)
+LAG_PROBE_INTERVAL = 0.01
+
+# Share of the latency budget the sustained loop lag may reach before requests are shed unread
+EDGE_LAG_SHARE = 0.05
+# Probes the loop must have run late on, every one of them, for its lag to count as sustained
+EDGE_LAG_WINDOW = 10
+
+SHED, DEGRADE = 'shed', 'degrade'
+ACTIONS = (SHED, DEGRADE)
+
+# Rejection reasons ('overload': shed by AdmissionMiddleware before reaching the handler)
+CONCURRENCY, BUDGET, DEADLINE, OVERLOAD = 'concurrency', 'budget', 'deadline', 'overload'
+
+
+class AdmissionController:
+    """
+    Concurrency limit and latency budget for /predict. `max_in_flight` and
+    `latency_budget` (seconds) of 0 disable that check. Used from the event
+    loop; `observe_batch` may be called from worker threads.
+    """
+
+    def __init__(self, max_in_flight: int = 0, latency_budget: float = 0.0, action: str = DEGRADE):
+        if action not in ACTIONS:
+            raise ValueError(f"Unknown overload action '{action}'. Use one of: {', '.join(ACTIONS)}.")
+        self.max_in_flight = max(0, int(max_in_flight))
+        self.latency_budget = max(0.0, float(latency_budget))
+        self.action = action
+        self.in_flight = 0
+        self.item_seconds = 0.0  # EWMA of scoring time per session
+        self.loop_lag = 0.0  # EWMA of how late the event loop runs a ready callback
+        self.sustained_lag = 0.0  # Smallest lag over the last EDGE_LAG_WINDOW probes
+        self._recent_lags = deque(maxlen=EDGE_LAG_WINDOW)
+        self._lock = threading.Lock()
+        self._probe: Optional[asyncio.Task] = None
+
+        # Statistics
+        self.admitted = 0
+        self.rejected = {CONCURRENCY: 0, BUDGET: 0, DEADLINE: 0, OVERLOAD: 0}
+        self.shed = 0
+        self.degraded = 0
+
+    # --- Lifecycle ---
+    async def start(self):
+        """Starts the event-loop lag probe on the running loop (only needed with a latency budget)."""
+        if self.latency_budget:
+            self._probe = asyncio.create_task(self._probe_loop_lag())
+
+    async def stop(self):
+        if self._probe:
+            self._probe.cancel()
+            try:
+                await self._probe
+            except asyncio.CancelledError:
+                pass
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.max_in_flight or self.latency_budget)
+
+    def check(self, received_at: float, queue_depth: int, now: Optional[float] = None) -> Optional[str]:
+        """
+        None if a request that arrived at `received_at` (time.perf_counter())
+        may be queued behind `queue_depth` others, else the reason it may not.
+        """
+        if self.max_in_flight and self.in_flight >= self.max_in_flight:
+            return self._reject(CONCURRENCY)
+        if self.latency_budget:
+            now = time.perf_counter() if now is None else now
+            if now - received_at + self.loop_lag + (queue_depth + 1) * self.item_seconds > self.latency_budget:
+                return self._reject(BUDGET)
+        self.admitted += 1
+        return None
+
+    def overloaded(self) -> bool:
+        """True when the event loop is so far behind that requests should be shed without being read."""
+        return bool(self.latency_budget) and self.sustained_lag > self.latency_budget * EDGE_LAG_SHARE
+
+    def deadline(self, received_at: float) -> Optional[float]:
+        """The time.perf_counter() value by which an admitted request must have started scoring."""
+        return received_at + self.latency_budget if self.latency_budget else None
+
+    def missed_deadline(self):
+        self._reject(DEADLINE)
+
+    def enter(self):
+        self.in_flight += 1
+
+    def leave(self):
+        self.in_flight -= 1
+
+    def observe_lag(self, lag: float):
+        """Feeds one lag probe sample (seconds) into the loop-lag EWMA and the sustained lag."""
+        self.loop_lag = (1 - EWMA_ALPHA) * self.loop_lag + EWMA_ALPHA * lag
+        self._recent_lags.append(lag)
+        self.sustained_lag = min(self._recent_lags) if len(self._recent_lags) == EDGE_LAG_WINDOW else 0.0
+
+    def observe_batch(self, size: int, seconds: float):
+        """Feeds the per-session cost estimate from a scored batch."""
+        if size <= 0:
+            return
+        per_item = seconds / size
+        with self._lock:
+            self.item_seconds = per_item if not self.item_seconds \
+                else (1 - EWMA_ALPHA) * self.item_seconds + EWMA_ALPHA * per_item
+
+    def retry_after(self, queue_depth: int) -> int:
+        """Whole seconds until the current queue is expected to have drained (at least 1)."""
+        return max(1, math.ceil(queue_depth * self.item_seconds))
+
+    def stats(self) -> dict:
+        return {
+            'max_in_flight': self.max_in_flight,
+            'latency_budget_ms': round(self.latency_budget * 1000, 3),
+            'action': self.action,
+            'in_flight': self.in_flight,
+            'estimated_us_per_session': round(self.item_seconds * 1e6, 2),
+            'loop_lag_ms': round(self.loop_lag * 1000, 3),
+            'sustained_loop_lag_ms': round(self.sustained_lag * 1000, 3),
+            'admitted': self.admitted,
+            'rejected': dict(self.rejected),
+            'shed': self.shed,
+            'degraded': self.degraded,
+        }
+
+    def _reject(self, reason: str) -> str:
+        self.rejected[reason] += 1
+        return reason
+
+    async def _probe_loop_lag(self):
+        while True:
+            t = time.perf_counter()
+            await asyncio.sleep(LAG_PROBE_INTERVAL)
+            self.observe_lag(max(0.0, time.perf_counter() - t - LAG_PROBE_INTERVAL))
+
+
+class AdmissionMiddleware:
+    """
+    Plain ASGI middleware that answers requests to `paths` with 503 +
+    Retry-After, without reading their bodies, while the controller reports
+    the event loop overloaded. Shed requests are counted under the 'overload'
+    reason in the controller and in the `rejections`/`outcomes` counters.
+    """
+
+    def __init__(self, app, controller: AdmissionController, paths: Iterable[str],
+                 rejections: Counter, outcomes: Counter):
+        self.app = app
+        self.controller = controller
+        self.paths = frozenset(paths)
+        self.rejections = rejections
+        self.outcomes = outcomes
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http' or scope['path'] not in self.paths or not self.controller.overloaded():
+            await self.app(scope, receive, send)
+            return
+        controller = self.controller
+        controller.shed += 1
+        controller._reject(OVERLOAD)
+        self.rejections.inc(OVERLOAD)
+        self.outcomes.inc('shed')
+        body = json.dumps({'detail': "Server overloaded; please retry."}).encode()
+        await send({
+            'type': 'http.response.start',
+            'status': 503,
+            'headers': [(b'content-type', b'application/json'), (b'content-length', str(len(body)).encode()),
+                        (b'retry-after', str(controller.retry_after(0)).encode())],
+        })
+        await send({'type': 'http.response.body', 'body': body})
@@ -1,17 +1,38 @@
 # Backend API for Astra IRCTC Bot Detector
-# This script uses FastAPI and now logs every prediction to a CSV file.
+# This script uses FastAPI and logs every prediction through a buffered background log sink.
 
 import uvicorn
-from fastapi import FastAPI, HTTPException, Request
+from fastapi import FastAPI, HTTPException, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
-import pandas as pd
+from fastapi.responses import PlainTextResponse, StreamingResponse
+from pydantic import BaseModel, ValidationError
+from typing import Any, Dict, List, Optional
 import joblib
+import numpy as np
 import os
+import json
+import time
+import asyncio
 import logging
+import resource
 from contextlib import asynccontextmanager
 from datetime import datetime
-import csv
+
+from src.admission import DEADLINE, DEGRADE, AdmissionController, AdmissionMiddleware
+from src.cascade import CASCADE_PATH, FOREST, PREFILTER, Cascade
+from src.drift import REFERENCE_PATH, WINDOWS as DRIFT_WINDOWS, DriftMonitor, load_reference
+from src.engine import BUNDLE_PATH, MODELS_DIR, CompiledForest, bundle_is_current, load_or_compile
+from src.inference import BATCH_SIZE_BUCKETS, DeadlineExceeded, InferenceScheduler
+from src.metrics import MetricsRegistry, RequestMetricsMiddleware
+from src.model_manager import ModelManager, SklearnScorer
+from src.log_sink import PredictionLogSink
+from src.log_store import LogStore, parse_time
+from src.profiler import SamplingProfiler
+from src.progressive import PartialSessionStore, ProgressiveScorer, load_stage_models
+from src.stats import RollingStats
+from src.verdict_cache import VerdictCache
+from src.watchdog import LOOPBACK_IPS, get_watchdog
+from src import wire
 
 # --- Configuration & Setup ---
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
@@ -19,28 +40,335 @@ logger = logging.getLogger(__name__)
 
 LOG_FILE = '../logs/api_log.csv'
 artifacts = {}
+stats = RollingStats()
+
+# Set by src/prefork.py in each forked worker: the model, shared-memory stats and log queue it inherited
+worker = None
+
+# Micro-batching knobs: trade a little latency for throughput under load
+MAX_BATCH_SIZE = int(os.environ.get('ASTRA_MAX_BATCH_SIZE', 64))
+MAX_BATCH_WAIT_US = int(os.environ.get('ASTRA_MAX_BATCH_WAIT_US', 500))
+INFERENCE_WORKERS = int(os.environ.get('ASTRA_INFERENCE_WORKERS', 2))
+
+# Prediction log: 'csv' keeps LOG_FILE as the live file, 'columnar' writes binary .alog segments
+LOG_FORMAT = os.environ.get('ASTRA_LOG_FORMAT', 'csv').lower()
+LOG_QUEUE_SIZE = int(os.environ.get('ASTRA_LOG_QUEUE_SIZE', 100_000))
+LOG_FLUSH_SIZE = int(os.environ.get('ASTRA_LOG_FLUSH_SIZE', 1000))
+LOG_FLUSH_INTERVAL = float(os.environ.get('ASTRA_LOG_FLUSH_INTERVAL', 1.0))
+LOG_SEGMENT_SECONDS = int(os.environ.get('ASTRA_LOG_SEGMENT_SECONDS', 3600))
+
+# Log retention, applied whenever a segment closes (0 disables): delete segments older than
+# LOG_RETENTION_DAYS, and rewrite segments older than LOG_COMPACT_AFTER_DAYS as one columnar file per day
+LOG_RETENTION_DAYS = float(os.environ.get('ASTRA_LOG_RETENTION_DAYS', 0))
+LOG_COMPACT_AFTER_DAYS = float(os.environ.get('ASTRA_LOG_COMPACT_AFTER_DAYS', 0))
+log_store = LogStore(LOG_FILE, retention_days=LOG_RETENTION_DAYS, compact_after_days=LOG_COMPACT_AFTER_DAYS)
+
+# Comma-separated client IPs the watchdog never rate limits (gateways, load generators); loopback by
+# default, so the local demo is not blocked. Set it empty to rate-limit loopback clients too
+WATCHDOG_TRUSTED_IPS = [ip.strip() for ip in os.environ.get('ASTRA_WATCHDOG_TRUSTED_IPS', ','.join(LOOPBACK_IPS)).split(',')
+                        if ip.strip()]
+
+# 'compiled' maps the flat-array model bundle; 'sklearn' scores through the pickled scaler + forest
+ENGINE = os.environ.get('ASTRA_ENGINE', 'compiled').lower()
+MODEL_BUNDLE = os.environ.get('ASTRA_MODEL_BUNDLE', BUNDLE_PATH)
+MODEL_PATH = os.path.join(MODELS_DIR, 'astra_model.joblib')
+SCALER_PATH = os.path.join(MODELS_DIR, 'astra_scaler.joblib')
+FEATURE_COLUMNS_PATH = os.path.join(MODELS_DIR, 'feature_columns.joblib')
+
+# Hot reload: poll the model file every N seconds (0 disables). With a shadow fraction > 0 a new
+# model is first scored in shadow on that share of traffic and only goes live via /model/promote.
+MODEL_POLL_INTERVAL = float(os.environ.get('ASTRA_MODEL_POLL_INTERVAL', 2.0))
+SHADOW_FRACTION = float(os.environ.get('ASTRA_SHADOW_FRACTION', 0.0))
+
+# Verdicts for retried/repeated /predict submissions (size 0 disables the cache)
+VERDICT_CACHE_SIZE = int(os.environ.get('ASTRA_VERDICT_CACHE_SIZE', 100_000))
+VERDICT_CACHE_TTL = float(os.environ.get('ASTRA_VERDICT_CACHE_TTL', 30.0))
+verdict_cache = VerdictCache(max_entries=VERDICT_CACHE_SIZE, ttl=VERDICT_CACHE_TTL)
+
+# Admission control for /predict: most requests waiting on the model, the latency budget a request
+# must be answerable within (0 disables either), and what happens to the rest ('degrade' answers from
+# the cascade pre-filter, 'shed' returns 503 + Retry-After)
+MAX_IN_FLIGHT = int(os.environ.get('ASTRA_MAX_IN_FLIGHT', 1024))
+LATENCY_BUDGET_MS = float(os.environ.get('ASTRA_LATENCY_BUDGET_MS', 250))
+OVERLOAD_ACTION = os.environ.get('ASTRA_OVERLOAD_ACTION', DEGRADE).lower()
+admission = AdmissionController(MAX_IN_FLIGHT, LATENCY_BUDGET_MS / 1000, OVERLOAD_ACTION)
+
+# Scoring cascade: decide clear-cut sessions with the pre-filter saved by train_model.py, if there is one
+CASCADE_ENABLED = os.environ.get('ASTRA_CASCADE', '1').lower() in ('1', 'true', 'yes')
+CASCADE_BUNDLE = os.environ.get('ASTRA_CASCADE_BUNDLE', CASCADE_PATH)
+
+# Progressive (per-stage) scoring: sessions whose flow is in progress, and how long one may idle
+PROGRESSIVE_SESSIONS = int(os.environ.get('ASTRA_PROGRESSIVE_SESSIONS', 100_000))
+PROGRESSIVE_TTL = float(os.environ.get('ASTRA_PROGRESSIVE_TTL', 900.0))
+
+# /predict/batch: most sessions accepted in one request (0 disables the limit)
+BATCH_MAX_SESSIONS = int(os.environ.get('ASTRA_BATCH_MAX_SESSIONS', 10_000))
+
+# /predict/stream: lines scored per batch, and the longest line accepted
+STREAM_BATCH_LINES = int(os.environ.get('ASTRA_STREAM_BATCH_LINES', 256))
+STREAM_MAX_LINE_BYTES = 1 << 20
+
+# /predict/packed: most records accepted in one request
+PACKED_MAX_RECORDS = int(os.environ.get('ASTRA_PACKED_MAX_RECORDS', 10_000))
+
+# The sampling profiler's /debug/profiler endpoints only exist when this is set
+PROFILER_ENABLED = os.environ.get('ASTRA_PROFILER', '0').lower() in ('1', 'true', 'yes')
+profiler = SamplingProfiler()
+
+# --- Metrics (served at /metrics in Prometheus text format) ---
+metrics = MetricsRegistry()
+REQUESTS_TOTAL = metrics.counter('astra_http_requests_total', 'HTTP requests by route and status code.',
+                                 ('path', 'status'))
+REQUEST_SECONDS = metrics.histogram('astra_http_request_seconds', 'End-to-end HTTP request time by route.', ('path',))
+STAGE_SECONDS = metrics.histogram('astra_stage_seconds', 'Time spent in each stage of the prediction path.',
+                                  ('stage',))
+BATCH_SIZE = metrics.histogram('astra_inference_batch_size', 'Rows per scored micro-batch.',
+                               buckets=BATCH_SIZE_BUCKETS)
+DECISIONS_TOTAL = metrics.counter('astra_decisions_total', 'Verdicts served, by decision and source.',
+                                  ('decision', 'source'))
+CASCADE_TOTAL = metrics.counter('astra_cascade_decisions_total', 'Sessions decided by each tier of the scoring cascade.',
+                                ('tier',))
+ADMISSION_TOTAL = metrics.counter('astra_admission_total', '/predict requests by admission outcome.', ('outcome',))
+ADMISSION_REJECTIONS_TOTAL = metrics.counter('astra_admission_rejections_total',
+                                             '/predict requests refused the full model, by reason.', ('reason',))
+STAGE_UPDATES_TOTAL = metrics.counter('astra_stage_updates_total', 'Progressive scoring updates by stage and decision.',
+                                      ('stage', 'decision'))
+metrics.gauge('astra_model_info', 'Active model (always 1).', lambda: {
+    (ENGINE, str(artifacts['models'].active_info.get('model_version')), str(artifacts['models'].generation)): 1
+} if _model_ready() else {}, ('engine', 'version', 'generation'))
+metrics.gauge('astra_inference_queue_depth', 'Requests waiting for a micro-batch.',
+              lambda: {(): artifacts['scheduler'].stats()['queue_depth']} if artifacts.get('scheduler') else {})
+metrics.gauge('astra_predict_in_flight', '/predict requests admitted and waiting on the model.',
+              lambda: {(): admission.in_flight})
+metrics.gauge('astra_log_queue_depth', 'Prediction records waiting to be written.',
+              lambda: {(): artifacts['log_sink'].stats()['queue_depth']} if artifacts.get('log_sink') else {})
+metrics.gauge('astra_log_dropped_records', 'Prediction records dropped because the log queue was full.',
+              lambda: {(): artifacts['log_sink'].stats()['dropped']} if artifacts.get('log_sink') else {})
+metrics.gauge('astra_verdict_cache_entries', 'Verdicts held by the /predict cache.',
+              lambda: {(): verdict_cache.stats()['entries']})
+metrics.gauge('astra_progressive_sessions', 'Sessions with partial state held for progressive scoring.',
+              lambda: {(): len(artifacts['progressive'].store)} if artifacts.get('progressive') else {})
+metrics.gauge('astra_feature_drift_psi', 'PSI of each feature over the last hour against the training data.',
+              lambda: {(name,): f['psi'] for name, f in artifacts['drift'].report_all()['windows']['1h']['features'].items()
+                       if 'psi' in f} if artifacts.get('drift') else {}, ('feature',))
+metrics.gauge('astra_uptime_seconds', 'Seconds since the API started.', lambda: {(): time.time() - stats.started_at})
+
+def _lap(stage: str, since: float) -> float:
+    """Records the time since `since` under `stage` and returns the current time."""
+    now = time.perf_counter()
+    STAGE_SECONDS.labels(stage).observe(now - since)
+    return now
+
+def _observe_batch(queue_waits: List[float], score_seconds: float):
+    """Scheduler callback: per-item queue wait, batch scoring time and batch size."""
+    queue_wait = STAGE_SECONDS.labels('queue_wait')
+    for wait in queue_waits:
+        queue_wait.observe(wait)
+    STAGE_SECONDS.labels('batch').observe(score_seconds)
+    BATCH_SIZE.labels().observe(len(queue_waits))
+    admission.observe_batch(len(queue_waits), score_seconds)
+
+def _rss_mb() -> float:
+    """Resident memory of this worker in MB (peak RSS where /proc is unavailable)."""
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+def _load_scorer(path: Optional[str] = None):
+    """
+    The configured engine's scorer with its cascade pre-filter attached as
+    `scorer.cascade`, so a hot reload swaps both at once and a batch reads
+    them from the one reference.
+    """
+    scorer = _load_model(path)
+    scorer.cascade = _load_cascade(scorer)
+    if scorer.cascade is None and admission.enabled and admission.action == DEGRADE:
+        logger.warning("ASTRA_OVERLOAD_ACTION=degrade answers overflow from the cascade pre-filter, which is not "
+                       "loaded; requests over the admission limits will be shed with 503 instead.")
+    return scorer
+
+def _load_model(path: Optional[str] = None):
+    """
+    Loads a scorer for the configured engine; `path` overrides the bundle (or,
+    for the sklearn engine, the pickled model). The compiled engine maps the
+    model bundle and never unpickles the forest; the pickles are only read when
+    the bundle is missing or older than them, or for the sklearn engine.
+    """
+    if ENGINE == 'compiled':
+        if path is not None or bundle_is_current(MODEL_BUNDLE, source_path=MODEL_PATH):
+            engine = CompiledForest.load(path or MODEL_BUNDLE)
+            logger.info(f"Model bundle v{engine.metadata['model_version']} mapped ({engine.n_trees} trees).")
+            return engine
+        engine = load_or_compile(joblib.load(MODEL_PATH), joblib.load(SCALER_PATH), joblib.load(FEATURE_COLUMNS_PATH),
+                                 path=MODEL_BUNDLE, source_path=MODEL_PATH)
+        logger.info(f"Compiled inference engine ready ({engine.n_trees} trees).")
+        return engine
+
+    model_path = path or MODEL_PATH
+    scorer = SklearnScorer(joblib.load(model_path), joblib.load(SCALER_PATH), joblib.load(FEATURE_COLUMNS_PATH),
+                           metadata={'model_path': model_path})
+    logger.info("Artifacts loaded successfully!")
+    return scorer
+
+def _load_cascade(scorer) -> Optional[Cascade]:
+    """
+    The cascade's pre-filter tier for `scorer`, if enabled and a bundle
+    evaluated against this model exists; otherwise every session goes to the forest.
+    """
+    if not CASCADE_ENABLED:
+        return None
+    try:
+        cascade = Cascade.load(CASCADE_BUNDLE)
+    except (OSError, ValueError) as e:
+        logger.info(f"No cascade pre-filter loaded ({e}); every session is scored by the full model.")
+        return None
+    if set(cascade.feature_columns) != set(scorer.feature_columns):
+        logger.warning("The cascade pre-filter was trained on other features; the cascade is disabled.")
+        return None
+    model_version = scorer.metadata.get('model_version')
+    if cascade.forest_version and model_version and cascade.forest_version != model_version:
+        logger.warning(f"The cascade pre-filter was evaluated against model v{cascade.forest_version}, not the "
+                       f"loaded v{model_version}; the cascade is disabled until it is retrained.")
+        return None
+    stats = cascade.stats()
+    logger.info(f"Cascade pre-filter ready ({stats['deciding_leaves']} leaves decide at precision "
+                f"{stats['target_precision']} with at least {stats['min_support']} sessions).")
+    return cascade
+
+def _load_drift_monitor(feature_columns: List[str]) -> Optional[DriftMonitor]:
+    """The drift monitor for the training reference saved by train_model.py, if there is a usable one."""
+    try:
+        reference = load_reference(REFERENCE_PATH)
+    except (OSError, ValueError) as e:
+        logger.info(f"No feature drift reference loaded ({e}); drift monitoring is disabled.")
+        return None
+    if set(reference['feature_columns']) != set(feature_columns):
+        logger.warning("The drift reference was built for other features; drift monitoring is disabled.")
+        return None
+    logger.info(f"Feature drift monitor ready (reference of {reference['rows']} training rows).")
+    return DriftMonitor(reference)
+
+def create_log_sink(feature_columns: List[str]) -> PredictionLogSink:
+    """The configured prediction log writer (one per server: pre-fork workers forward to the parent's)."""
+    return PredictionLogSink(
+        LOG_FILE,
+        feature_columns,
+        log_format=LOG_FORMAT,
+        max_queue=LOG_QUEUE_SIZE,
+        flush_size=LOG_FLUSH_SIZE,
+        flush_interval=LOG_FLUSH_INTERVAL,
+        segment_seconds=LOG_SEGMENT_SECONDS,
+        on_rotate=log_store.maintain_async,
+    )
+
+def _model_ready() -> bool:
+    models = artifacts.get('models')
+    return models is not None and models.active is not None
+
+def _client_ip(request: Request) -> str:
+    return request.client.host if request.client else 'unknown'
+
+def _enforce_watchdog(request: Request) -> List[dict]:
+    """
+    Counts the request against its client IP's rate limits and returns the
+    alerts that raised; raises 429 + Retry-After while the IP is blocked.
+    """
+    watchdog = get_watchdog()
+    client_ip = _client_ip(request)
+    allowed, alerts = watchdog.check_request(client_ip)
+    if not allowed:
+        raise HTTPException(
+            status_code=429,
+            detail="Too many requests: this IP is temporarily blocked by the watchdog.",
+            headers={"Retry-After": str(watchdog.retry_after(client_ip))},
+        )
+    return alerts
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # This code runs on startup
+    global stats
     logger.info("Starting up Astra API...")
+    boot_start = time.perf_counter()
+    if worker is not None:
+        # Pre-fork worker: record into this worker's shared-memory slot, report the whole server
+        stats = worker.stats
+        worker.start_publishing(metrics.dump, _own_totals)
+    models = ModelManager(
+        _load_scorer,
+        watch_path=MODEL_BUNDLE if ENGINE == 'compiled' else MODEL_PATH,
+        poll_interval=MODEL_POLL_INTERVAL,
+        shadow_fraction=SHADOW_FRACTION,
+        required_columns=list(SessionData.__annotations__),
+    )
     try:
-        artifacts['model'] = joblib.load('models/astra_model.joblib')
-        artifacts['scaler'] = joblib.load('models/astra_scaler.joblib')
-        artifacts['feature_columns'] = joblib.load('models/feature_columns.joblib')
-        logger.info("Artifacts loaded successfully!")
-
-        os.makedirs('../logs', exist_ok=True)
-        if not os.path.exists(LOG_FILE):
-            with open(LOG_FILE, 'w', newline='') as f:
-                writer = csv.writer(f)
-                header = ['Timestamp', 'is_bot', 'decision', 'confidence_score'] + artifacts['feature_columns']
-                writer.writerow(header)
+        # Loads and warms the model, so the first real request pays no first-call costs
+        # A pre-fork worker starts from the model its parent loaded (shared copy-on-write)
+        models.load(worker.scorer if worker is not None else None)
+        artifacts['models'] = models
+        artifacts['feature_columns'] = models.active.feature_columns
+        if worker is not None:
+            artifacts['log_sink'] = worker.log_sink
+        else:
+            artifacts['log_sink'] = create_log_sink(artifacts['feature_columns'])
+            if LOG_RETENTION_DAYS or LOG_COMPACT_AFTER_DAYS:
+                log_store.maintain_async()
+        artifacts['log_sink'].start()
+        artifacts['drift'] = _load_drift_monitor(artifacts['feature_columns'])
     except FileNotFoundError as e:
         logger.error(f"Error loading artifacts: {e}. Please ensure model files are in 'models'.")
-        artifacts['model'] = None
+        artifacts['models'] = None
+
+    stage_models = load_stage_models()
+    artifacts['progressive'] = ProgressiveScorer(stage_models, PartialSessionStore(PROGRESSIVE_SESSIONS, PROGRESSIVE_TTL))
+    if stage_models:
+        logger.info(f"Progressive scoring ready for stages: {', '.join(artifacts['progressive'].stages)}.")
+    else:
+        logger.info("No stage models found in 'models/stages'; progressive scoring is disabled.")
+
+    get_watchdog().trusted_ips.update(WATCHDOG_TRUSTED_IPS)
+    if worker is not None:
+        # Pre-fork worker: count each IP's requests across all workers, so limits are server-wide
+        get_watchdog().shared = worker.watchdog
+
+    scheduler = InferenceScheduler(
+        _score_rows,
+        max_batch_size=MAX_BATCH_SIZE,
+        max_wait_us=MAX_BATCH_WAIT_US,
+        workers=INFERENCE_WORKERS,
+        observer=_observe_batch,
+    )
+    await scheduler.start()
+    artifacts['scheduler'] = scheduler
+    await admission.start()
+    if artifacts['models'] is not None:
+        await models.start()
+
+    artifacts['startup'] = {
+        'engine': ENGINE,
+        'time_to_ready_ms': round((time.perf_counter() - boot_start) * 1000, 2),
+        'rss_mb': round(_rss_mb(), 1),
+        'pid': os.getpid(),
+        'worker': worker.slot if worker is not None else None,
+    }
+    logger.info(f"Astra API ready in {artifacts['startup']['time_to_ready_ms']} ms "
+                f"(worker {os.getpid()}, RSS {artifacts['startup']['rss_mb']} MB).")
     yield
     logger.info("Shutting down Astra API...")
+    await admission.stop()
+    await scheduler.stop()
+    profiler.stop()
+    if artifacts.get('models'):
+        await artifacts['models'].stop()
+    if artifacts.get('log_sink'):
+        artifacts['log_sink'].stop()
+    if worker is not None:
+        worker.stop_publishing()
 
 # Initialize the FastAPI app
 app = FastAPI(
@@ -50,6 +378,10 @@ app = FastAPI(
     lifespan=lifespan
 )
 
+# Middleware added later wraps what was added before, so CORS also covers the 503s shed here
+app.add_middleware(AdmissionMiddleware, controller=admission, paths=('/predict',),
+                   rejections=ADMISSION_REJECTIONS_TOTAL, outcomes=ADMISSION_TOTAL)
+
 # --- Add CORS Middleware ---
 app.add_middleware(
     CORSMiddleware,
@@ -58,6 +390,7 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+app.add_middleware(RequestMetricsMiddleware, requests=REQUESTS_TOTAL, durations=REQUEST_SECONDS)
 
 # Pydantic Data Model for incoming data
 class SessionData(BaseModel):
@@ -75,49 +408,671 @@ class SessionData(BaseModel):
     backspace_count: int
     account_age_days: int
 
+class StageUpdate(BaseModel):
+    session_id: str
+    stage: str
+    features: Dict[str, float]
+
 def log_prediction(log_data: dict):
-    """Appends a prediction result to the CSV log file."""
-    try:
-        header = ['Timestamp', 'is_bot', 'decision', 'confidence_score'] + artifacts.get('feature_columns', [])
-        with open(LOG_FILE, 'a', newline='') as f:
-            writer = csv.DictWriter(f, fieldnames=header, extrasaction='ignore')
-            writer.writerow(log_data)
-    except Exception as e:
-        logger.error(f"Error writing to log file: {e}")
+    """Queues a prediction result for the background log writer."""
+    log_predictions([log_data])
+
+def log_predictions(log_rows: List[dict]):
+    """Queues several prediction results; never waits on disk (full queue = counted drop)."""
+    sink = artifacts.get('log_sink')
+    if sink is not None:
+        sink.submit_many(log_rows)
 
 @app.get("/")
 async def root():
     return {"message": "Astra IRCTC Bot Detector API is running."}
 
 @app.post("/predict", tags=["Prediction"])
-async def predict_bot(session_data: SessionData, request: Request):
-    if not artifacts.get('model'):
+async def predict_bot(session_data: SessionData, request: Request, response: Response):
+    """
+    Scores one session. A retry carrying the same `Idempotency-Key` (or
+    `X-Session-Id`) header, or an identical payload, within the verdict
+    cache TTL gets the stored verdict without being re-scored; the
+    `X-Astra-Cache` response header says which happened. A session already
+    blocked early by /predict/stage (same `X-Session-Id`) gets that BLOCK
+    back without being re-scored. Under overload,
+    admission control answers from the cascade pre-filter instead (marked
+    `degraded`, with an `X-Astra-Degraded` header giving the reason) or
+    returns 503 with Retry-After.
+    """
+    if not _model_ready():
         raise HTTPException(status_code=503, detail="Model is not available.")
+    start = time.perf_counter()
+    received_at = request.scope.get(RequestMetricsMiddleware.SCOPE_KEY)
+    if received_at is not None:
+        # Body read, JSON decoding and pydantic validation all happen before the handler runs
+        STAGE_SECONDS.labels('parse_validate').observe(start - received_at)
+
+    # Rate limiting happens before any model work so blocked IPs cost next to nothing
+    alerts = _enforce_watchdog(request)
+    t = _lap('watchdog', start)
+
     try:
-        prediction_result = await _make_prediction(session_data)
+        features = session_data.dict()
+        prediction_result = None
+        session_id = request.headers.get('idempotency-key') or request.headers.get('x-session-id')
+        early = None
+        if request.headers.get('x-session-id'):
+            # The flow is complete, so its progressive-scoring state is no longer needed
+            early = artifacts['progressive'].finish(request.headers['x-session-id'])
+        if early is not None and early['decision'] == 'BLOCK':
+            # An early BLOCK from /predict/stage is final: the full model does not get to overturn it
+            prediction_result = {"is_bot": 1, "decision": "BLOCK", "confidence_score": early['bot_probability'],
+                                 "tier": "progressive", "stage": early['stage']}
+            source = 'progressive'
+            if verdict_cache.enabled:
+                # The partial state is gone now, so a retry must find the BLOCK in the cache
+                cache_key, fingerprint = verdict_cache.key_for(features, artifacts['feature_columns'], session_id)
+                verdict_cache.put(cache_key, fingerprint, artifacts['models'].generation, prediction_result)
+        elif verdict_cache.enabled:
+            generation = artifacts['models'].generation
+            cache_key, fingerprint = verdict_cache.key_for(features, artifacts['feature_columns'], session_id)
+            prediction_result = verdict_cache.get(cache_key, fingerprint, generation)
+            response.headers['X-Astra-Cache'] = 'hit' if prediction_result is not None else 'miss'
+            source = 'cache'
+            t = _lap('cache', t)
+        if prediction_result is None:
+            source = 'model'
+            prediction_result, reason = await _admitted_prediction(features, start if received_at is None else received_at)
+            t = _lap('inference', t)
+            if reason is not None:
+                # Never cached: the next retry should get the full model's verdict if there is room for it
+                prediction_result = _overload_verdict(features, reason)
+                response.headers['X-Astra-Degraded'] = reason
+                source = 'degraded'
+            elif verdict_cache.enabled:
+                verdict_cache.put(cache_key, fingerprint, generation, prediction_result)
         log_entry = {
             'Timestamp': datetime.now().isoformat(),
             **prediction_result,
-            **session_data.dict()
+            **features
         }
         log_prediction(log_entry)
+        t = _lap('log', t)
+        stats.record(prediction_result, time.perf_counter() - start, features)
+        alerts += get_watchdog().record_prediction(features, prediction_result, _client_ip(request))
+        _lap('record', t)
+        DECISIONS_TOTAL.inc(prediction_result['decision'], source)
+        if alerts:
+            return {**prediction_result, "alerts": alerts}
         return prediction_result
+    except HTTPException:
+        raise
     except Exception as e:
+        stats.record_error()
         logger.error(f"An error occurred during prediction: {e}")
         raise HTTPException(status_code=500, detail=f"An internal error occurred: {str(e)}")
 
-async def _make_prediction(session_data: SessionData) -> dict:
-    """Helper function to run the model prediction."""
-    input_df = pd.DataFrame([session_data.dict()])
-    input_df = input_df[artifacts['feature_columns']]
-    input_scaled = artifacts['scaler'].transform(input_df)
-    prediction = artifacts['model'].predict(input_scaled)
-    prediction_proba = artifacts['model'].predict_proba(input_scaled)
-    is_bot = int(prediction[0])
-    decision = "BLOCK" if is_bot == 1 else "ALLOW"
-    confidence_score = float(prediction_proba[0][is_bot])
-    return {"is_bot": is_bot, "decision": decision, "confidence_score": confidence_score}
+@app.post("/predict/stage", tags=["Prediction"])
+async def predict_stage(update: StageUpdate, request: Request):
+    """
+    Progressive scoring: send each stage's features as soon as the stage
+    finishes (login, journey_planner, train_selection, form_fill) and get an
+    updated verdict back, BLOCK or CONTINUE. Features of earlier stages are
+    remembered per `session_id`, so each update only needs the new ones. A
+    BLOCK is final for the session (later updates echo it with `sticky`
+    set); the full session still goes to /predict
+    (with the same `X-Session-Id` header, which releases the partial state
+    and returns the early BLOCK instead of re-scoring).
+    """
+    progressive = artifacts.get('progressive')
+    if progressive is None or not progressive.models:
+        raise HTTPException(status_code=503, detail="Stage models are not available.")
+    start = time.perf_counter()
+    _enforce_watchdog(request)
+    try:
+        # One single-row traversal of a small forest: cheaper inline than a trip through the scheduler
+        verdict = progressive.update(update.session_id, update.stage, update.features)
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    _lap('stage_update', start)
+    STAGE_UPDATES_TOTAL.inc(update.stage, verdict['decision'])
+    if verdict['decision'] == 'BLOCK' and not verdict['sticky']:
+        DECISIONS_TOTAL.inc('BLOCK', 'progressive')
+    return {"session_id": update.session_id, **verdict}
+
+@app.post("/predict/batch", tags=["Prediction"])
+async def predict_batch(sessions: List[Any], request: Request):
+    """
+    Scores an array of sessions with one scaler and one model call.
+    Results come back in request order; an item that fails validation gets
+    an `error` entry instead of failing the whole batch. More than
+    ASTRA_BATCH_MAX_SESSIONS sessions are refused with 413.
+    """
+    if not _model_ready():
+        raise HTTPException(status_code=503, detail="Model is not available.")
+    received_at = request.scope.get(RequestMetricsMiddleware.SCOPE_KEY)
+    if received_at is not None:
+        STAGE_SECONDS.labels('batch_parse').observe(time.perf_counter() - received_at)
+    # Gateways that batch for many clients are exempted with ASTRA_WATCHDOG_TRUSTED_IPS
+    _enforce_watchdog(request)
+    if BATCH_MAX_SESSIONS and len(sessions) > BATCH_MAX_SESSIONS:
+        raise HTTPException(status_code=413,
+                            detail=f"Too many sessions: {len(sessions)} (limit {BATCH_MAX_SESSIONS}).")
+
+    try:
+        results, scored = await _score_items(sessions)
+    except Exception as e:
+        logger.error(f"An error occurred during batch prediction: {e}")
+        raise HTTPException(status_code=500, detail=f"An internal error occurred: {str(e)}")
+
+    return {
+        "count": len(sessions),
+        "scored": scored,
+        "errors": len(sessions) - scored,
+        "results": results,
+    }
+
+@app.post("/predict/stream", tags=["Prediction"])
+async def predict_stream(request: Request):
+    """
+    Scores a newline-delimited JSON body (one session object per line) and
+    streams one NDJSON verdict per line back, in input order, as each batch
+    of lines is scored, so memory stays flat however long the body is.
+    Every output line carries its 1-based input `line` number; blank lines
+    are skipped and a line that is not a valid session gets an `error` entry.
+    """
+    if not _model_ready():
+        raise HTTPException(status_code=503, detail="Model is not available.")
+    _enforce_watchdog(request)
+
+    async def score_pending(pending):
+        numbers = [number for number, _ in pending]
+        results, _ = await _score_items([item for _, item in pending])
+        return ''.join(json.dumps({"line": number, **result}) + '\n' for number, result in zip(numbers, results))
+
+    async def verdicts():
+        pending, buffer, line_number = [], b'', 0
+        try:
+            async for chunk in request.stream():
+                buffer += chunk
+                if b'\n' not in chunk:
+                    if len(buffer) > STREAM_MAX_LINE_BYTES:
+                        yield json.dumps({"line": line_number + 1, "error": "Line too long; stream aborted."}) + '\n'
+                        return
+                    continue
+                *lines, buffer = buffer.split(b'\n')
+                for raw in lines:
+                    line_number += 1
+                    if raw.strip():
+                        pending.append((line_number, _parse_line(raw)))
+                    if len(pending) >= STREAM_BATCH_LINES:
+                        yield await score_pending(pending)
+                        pending = []
+            if buffer.strip():
+                pending.append((line_number + 1, _parse_line(buffer)))
+            if pending:
+                yield await score_pending(pending)
+        except Exception as e:
+            # Headers are already sent; report the failure in-band and end the stream
+            logger.error(f"An error occurred during stream prediction: {e}")
+            yield json.dumps({"error": f"An internal error occurred: {str(e)}"}) + '\n'
+
+    return _BodyStreamingResponse(verdicts(), media_type="application/x-ndjson")
+
+@app.post("/predict/packed", tags=["Prediction"])
+async def predict_packed(request: Request):
+    """
+    Scores sessions sent in the packed binary wire format (src/wire.py):
+    little-endian float64 rows in the model's `feature_columns` order behind
+    a versioned header, answered with packed (is_bot, confidence, cascade
+    tier) records in request order. For gateway clients; skips JSON and
+    pydantic entirely.
+    """
+    if not _model_ready():
+        raise HTTPException(status_code=503, detail="Model is not available.")
+    start = time.perf_counter()
+    _enforce_watchdog(request)
+    # One scorer for the whole request: the layout is checked against the model that scores it
+    scorer = artifacts['models'].active
+    try:
+        X = wire.decode_request(await request.body(), scorer.feature_columns, PACKED_MAX_RECORDS)
+    except wire.WireFormatError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    t = _lap('packed_decode', start)
+
+    try:
+        is_bot, confidence, decided = await artifacts['scheduler'].run_in_worker(_score_matrix, scorer, X)
+        t = _lap('packed_inference', t)
+    except Exception as e:
+        stats.record_error()
+        logger.error(f"An error occurred during packed prediction: {e}")
+        raise HTTPException(status_code=500, detail=f"An internal error occurred: {str(e)}")
+
+    timestamp = datetime.now().isoformat()
+    latency = time.perf_counter() - start
+    columns = scorer.feature_columns
+    log_rows = [{'Timestamp': timestamp, 'is_bot': bot, 'decision': 'BLOCK' if bot == 1 else 'ALLOW',
+                 'confidence_score': score, 'tier': PREFILTER if by_prefilter else FOREST, **dict(zip(columns, values))}
+                for values, bot, score, by_prefilter in zip(X.tolist(), is_bot.tolist(), confidence.tolist(),
+                                                            decided.tolist())]
+    if log_rows:
+        log_predictions(log_rows)
+    recent = [({k: row[k] for k in ('is_bot', 'decision', 'confidence_score', 'tier')}, row)
+              for row in log_rows[-stats.recent.maxlen:]]
+    stats.record_batch(is_bot == 1, confidence, latency, recent)
+    blocked = int(is_bot.sum())
+    if blocked:
+        DECISIONS_TOTAL.inc('BLOCK', 'model', amount=blocked)
+    if len(is_bot) - blocked:
+        DECISIONS_TOTAL.inc('ALLOW', 'model', amount=len(is_bot) - blocked)
+    body = wire.encode_response(is_bot, confidence, columns, decided)
+    _lap('packed_log_record', t)
+    return Response(content=body, media_type=wire.MEDIA_TYPE)
+
+class _BodyStreamingResponse(StreamingResponse):
+    """
+    A StreamingResponse whose body iterator itself reads the request body.
+    Starlette's default listens for a disconnect on `receive` while streaming,
+    which would swallow the request chunks the iterator is waiting for; here
+    a disconnect surfaces through `request.stream()` instead.
+    """
+
+    async def __call__(self, scope, receive, send):
+        await self.stream_response(send)
+
+def _parse_line(raw: bytes):
+    """One NDJSON line as a dict, or the exception explaining why it is not one."""
+    try:
+        return json.loads(raw)
+    except ValueError as e:
+        return ValueError(f"Invalid JSON: {e}")
+
+async def _score_items(items: List[Any]):
+    """
+    Validates and scores items in one batch, logging and counting the valid
+    ones. Returns (results in input order, number scored); an invalid item
+    (or an exception standing in for an unparseable one) gets an `error` entry.
+    """
+    start = time.perf_counter()
+    results: List[dict] = [None] * len(items)
+    valid_rows, valid_positions = [], []
+    for position, item in enumerate(items):
+        if isinstance(item, Exception):
+            results[position] = {"error": str(item)}
+            continue
+        if not isinstance(item, dict):
+            results[position] = {"error": "Each session must be a JSON object."}
+            continue
+        try:
+            valid_rows.append(SessionData(**item).dict())
+            valid_positions.append(position)
+        except (ValidationError, TypeError) as e:
+            results[position] = {"error": str(e)}
+    t = _lap('batch_validate', start)
+
+    try:
+        predictions = await artifacts['scheduler'].run_batch(valid_rows)
+        t = _lap('batch_inference', t)
+    except Exception:
+        stats.record_error()
+        raise
+
+    timestamp = datetime.now().isoformat()
+    latency = time.perf_counter() - start
+    log_rows = []
+    for position, row, prediction_result in zip(valid_positions, valid_rows, predictions):
+        results[position] = prediction_result
+        log_rows.append({'Timestamp': timestamp, **prediction_result, **row})
+        stats.record(prediction_result, latency, row)
+        DECISIONS_TOTAL.inc(prediction_result['decision'], 'model')
+    if log_rows:
+        log_predictions(log_rows)
+    _lap('batch_log_record', t)
+    return results, len(valid_rows)
+
+def _score_rows(rows: List[dict]) -> List[dict]:
+    """
+    Scores feature dicts as one matrix: the cascade's pre-filter first, then
+    a single scaler.transform and predict_proba call (or one pass of the
+    compiled engine) for the sessions it leaves undecided.
+    """
+    if not rows:
+        return []
+    # Read the active model once: a hot reload mid-batch must not mix two models in one batch
+    scorer = artifacts['models'].active
+    t = time.perf_counter()
+    X = np.array([[row[c] for c in scorer.feature_columns] for row in rows], dtype=np.float64)
+    _lap('features', t)
+    is_bot, confidence, decided = _score_matrix(scorer, X, rows)
+    return [{"is_bot": bot, "decision": "BLOCK" if bot == 1 else "ALLOW", "confidence_score": score,
+             "tier": PREFILTER if by_prefilter else FOREST}
+            for bot, score, by_prefilter in zip(is_bot.tolist(), confidence.tolist(), decided.tolist())]
+
+def _score_matrix(scorer, X: np.ndarray, rows: Optional[List[dict]] = None) -> tuple:
+    """
+    (is_bot, confidence, decided by the pre-filter) arrays for a raw feature
+    matrix in the scorer's column order. `rows` are the same sessions as
+    dicts, if the caller has them; they are only built here for a shadow candidate.
+    """
+    models = artifacts['models']
+    cascade = getattr(scorer, 'cascade', None)
+    t = time.perf_counter()
+    if cascade is not None:
+        decided, is_bot, confidence = cascade.decide(X, scorer.feature_columns)
+        t = _lap('prefilter', t)
+        escalated = np.flatnonzero(~decided)
+    else:
+        decided = np.zeros(len(X), dtype=bool)
+        is_bot, confidence = np.zeros(len(X), dtype=np.uint8), np.zeros(len(X))
+        escalated = np.arange(len(X))
+    if len(escalated):
+        prediction_proba = scorer.predict_proba(scorer.raw_to_matrix(X if len(escalated) == len(X) else X[escalated]))
+        t = _lap('model', t)
+        best = prediction_proba.argmax(axis=1)
+        is_bot[escalated] = scorer.classes_[best]
+        confidence[escalated] = prediction_proba[np.arange(len(escalated)), best]
+    n_decided = len(X) - len(escalated)
+    if n_decided:
+        CASCADE_TOTAL.inc(PREFILTER, amount=n_decided)
+    if len(escalated):
+        CASCADE_TOTAL.inc(FOREST, amount=len(escalated))
+    if models.candidate is not None:
+        if rows is None:
+            rows = [dict(zip(scorer.feature_columns, values)) for values in X.tolist()]
+        models.shadow(rows, scorer)
+    t = _lap('format', t)
+    drift = artifacts.get('drift')
+    if drift is not None:
+        drift.observe(X, scorer.feature_columns)
+        _lap('drift', t)
+    return is_bot, confidence, decided
+
+async def _make_prediction(features: dict, deadline: Optional[float] = None) -> dict:
+    """Queues the session's features on the micro-batching scheduler and awaits its prediction."""
+    return await artifacts['scheduler'].submit(features, deadline)
+
+async def _admitted_prediction(features: dict, received_at: float) -> tuple:
+    """
+    (prediction, None) from the full model if admission control lets the
+    request in and it is scored before its deadline, else (None, reason).
+    """
+    if not admission.enabled:
+        return await _make_prediction(features), None
+    reason = admission.check(received_at, artifacts['scheduler'].queue_depth)
+    if reason is not None:
+        return None, reason
+    ADMISSION_TOTAL.inc('admitted')
+    admission.enter()
+    try:
+        return await _make_prediction(features, admission.deadline(received_at)), None
+    except DeadlineExceeded:
+        admission.missed_deadline()
+        return None, DEADLINE
+    finally:
+        admission.leave()
+
+def _overload_verdict(features: dict, reason: str) -> dict:
+    """
+    The degraded verdict for a request refused the full model: the cascade
+    pre-filter's most likely class. Raises 503 + Retry-After instead when
+    configured to shed, or when there is no pre-filter to fall back on.
+    """
+    ADMISSION_REJECTIONS_TOTAL.inc(reason)
+    cascade = getattr(artifacts['models'].active, 'cascade', None)
+    if admission.action == DEGRADE and cascade is not None:
+        columns = cascade.feature_columns
+        is_bot, confidence = cascade.classify(np.array([[features[c] for c in columns]], dtype=np.float64), columns)
+        admission.degraded += 1
+        ADMISSION_TOTAL.inc('degraded')
+        bot = int(is_bot[0])
+        return {"is_bot": bot, "decision": "BLOCK" if bot == 1 else "ALLOW", "confidence_score": float(confidence[0]),
+                "tier": PREFILTER, "degraded": True}
+    admission.shed += 1
+    ADMISSION_TOTAL.inc('shed')
+    raise HTTPException(
+        status_code=503,
+        detail=f"Server overloaded ({reason}); please retry.",
+        headers={"Retry-After": str(admission.retry_after(artifacts['scheduler'].queue_depth))},
+    )
+
+def _section_counts(section: str, section_stats: dict) -> Dict[str, int]:
+    return {f'{section}.{name}': value for name, value in section_stats.items() if isinstance(value, int)}
+
+def _own_totals() -> Dict[str, int]:
+    """This worker's counters behind /watchdog/stats and /logging/stats, keyed as prefork.WORKER_TOTALS."""
+    sink = artifacts.get('log_sink')
+    return {**_section_counts('watchdog', get_watchdog().get_stats()),
+            **(_section_counts('logging', sink.stats()) if sink is not None else {})}
+
+def _server_wide(section: str, section_stats: dict) -> dict:
+    """
+    Under pre-fork, `section_stats` (this worker's) with the counters the
+    workers publish summed over the whole server, the others as of their last
+    one-second publish. Unchanged in a single process.
+    """
+    if worker is None:
+        return section_stats
+    prefix = f'{section}.'
+    totals = worker.server_totals(_section_counts(section, section_stats))
+    return {**section_stats, **{name[len(prefix):]: value for name, value in totals.items() if name.startswith(prefix)},
+            'workers': worker.workers}
+
+# --- Watchdog Endpoints ---
+@app.get("/watchdog/stats", tags=["Watchdog"])
+async def watchdog_stats():
+    """
+    Session, detection, alert and rejection counters, summed over every
+    worker under pre-fork (`workers` says how many); `suspicious_ips` is
+    the answering worker's own, marked in `per_worker`.
+    """
+    report = _server_wide('watchdog', get_watchdog().get_stats())
+    if worker is not None:
+        total = report['total_sessions']
+        report['detection_rate'] = round(report['bots_detected'] / total, 4) if total else 0.0
+        report['per_worker'] = ['suspicious_ips']
+    return report
+
+@app.get("/watchdog/alerts", tags=["Watchdog"])
+async def watchdog_alerts(limit: int = 50):
+    return {"alerts": get_watchdog().get_alerts(limit)}
+
+@app.get("/watchdog/suspicious-ips", tags=["Watchdog"])
+async def watchdog_suspicious_ips():
+    return {"suspicious_ips": get_watchdog().get_suspicious_ips()}
+
+@app.post("/watchdog/export", tags=["Watchdog"])
+async def watchdog_export():
+    """Returns the monitoring data and saves a copy next to the prediction log."""
+    data = get_watchdog().export()
+    export_path = os.path.join(os.path.dirname(LOG_FILE), f"watchdog_export_{datetime.now():%Y%m%d_%H%M%S}.json")
+    try:
+        os.makedirs(os.path.dirname(export_path), exist_ok=True)
+        with open(export_path, 'w') as f:
+            json.dump(data, f, indent=2)
+        data['export_path'] = export_path
+    except OSError as e:
+        logger.error(f"Error writing watchdog export: {e}")
+    return data
+
+@app.get("/stats", tags=["Monitoring"])
+async def traffic_stats():
+    """Rolling 1m/5m/1h request, decision, confidence and latency aggregates, served from memory."""
+    return stats.snapshot_all()
+
+@app.get("/stats/stream", tags=["Monitoring"])
+async def traffic_stats_stream(request: Request, interval: float = 1.0):
+    """Server-sent events stream pushing the `/stats` payload every `interval` seconds."""
+    interval = min(max(interval, 0.2), 60.0)
+
+    async def events():
+        while not await request.is_disconnected():
+            yield f"data: {json.dumps(stats.snapshot_all())}\n\n"
+            await asyncio.sleep(interval)
+
+    return StreamingResponse(events(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
+
+@app.get("/cache/stats", tags=["Monitoring"])
+async def cache_stats():
+    """Size, hit/miss and eviction counters of the /predict verdict cache."""
+    return verdict_cache.stats()
+
+@app.get("/progressive/stats", tags=["Monitoring"])
+async def progressive_stats():
+    """Stage models, early blocks per stage and partial-state store usage."""
+    progressive = artifacts.get('progressive')
+    return progressive.stats() if progressive is not None else {}
+
+@app.get("/logging/stats", tags=["Monitoring"])
+async def logging_stats():
+    """
+    Queue depth, write and drop counters of the prediction log sink; under
+    pre-fork, records enqueued and dropped by every worker.
+    """
+    sink = artifacts.get('log_sink')
+    if sink is None:
+        raise HTTPException(status_code=503, detail="Prediction log sink is not running.")
+    return _server_wide('logging', sink.stats())
+
+@app.get("/logging/history", tags=["Monitoring"])
+async def logging_history(start: str = '-1h', end: Optional[str] = None, bucket: Optional[float] = None):
+    """
+    Requests, BLOCKs, block rate and confidence histogram logged between
+    `start` and `end` (epoch seconds, ISO timestamps, or relative like
+    `-15m`, `-2h`, `-7d`; `end` defaults to now), answered from the
+    segment indexes. With `bucket` (seconds) a time series is included.
+    """
+    try:
+        start_ts = parse_time(start)
+        end_ts = parse_time(end) if end else time.time()
+        # Reading segments is file I/O: keep it off the event loop
+        result = await asyncio.to_thread(log_store.query, start_ts, end_ts)
+        if bucket:
+            result['series'] = await asyncio.to_thread(log_store.timeseries, start_ts, end_ts, bucket)
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    return result
+
+@app.get("/drift", tags=["Monitoring"])
+async def feature_drift(window: Optional[str] = None):
+    """
+    Per-feature drift of live traffic against the training data: PSI,
+    binned KS distance and mean shift over the last 5m/1h/24h (or only
+    `window`). PSI >= 0.25 is reported as drift, 0.1 - 0.25 as moderate.
+    """
+    drift = artifacts.get('drift')
+    if drift is None:
+        raise HTTPException(status_code=503, detail="No drift reference loaded; run train_model.py to create one.")
+    snapshot = drift.report_all()
+    if window is None:
+        return snapshot
+    if window not in DRIFT_WINDOWS:
+        raise HTTPException(status_code=422, detail=f"Unknown window '{window}'. Use one of: {', '.join(DRIFT_WINDOWS)}.")
+    return {**{k: v for k, v in snapshot.items() if k != 'windows'}, **snapshot['windows'][window]}
+
+@app.get("/model/info", tags=["Monitoring"])
+async def model_info():
+    """
+    Active model version and metadata, reload and shadow statistics, the
+    active model's cascade pre-filter with its deciding leaves and share of
+    traffic decided (this worker's), and this worker's startup time and memory.
+    """
+    if not _model_ready():
+        raise HTTPException(status_code=503, detail="Model is not available.")
+    models = artifacts['models']
+    return {
+        "engine": ENGINE,
+        "feature_columns": models.active.feature_columns,
+        "packed_layout": f"{wire.layout_id(models.active.feature_columns):#010x}",
+        "metadata": models.active.metadata,
+        **models.stats(),
+        "cascade": models.active.cascade.stats() if getattr(models.active, 'cascade', None) else None,
+        "startup": artifacts.get('startup'),
+        "rss_mb": round(_rss_mb(), 1),
+    }
+
+@app.post("/model/reload", tags=["Model"])
+async def model_reload(path: Optional[str] = None, shadow: bool = False):
+    """
+    Loads and warms a model in the background, then swaps it in without
+    pausing traffic, or with `shadow=true` scores it in shadow instead.
+    `path` must point inside the models directory; it defaults to the
+    configured model file.
+    """
+    if not _model_ready():
+        raise HTTPException(status_code=503, detail="Model is not available.")
+    if path is not None:
+        path = os.path.realpath(os.path.join(MODELS_DIR, path))
+        if os.path.commonpath([path, os.path.realpath(MODELS_DIR)]) != os.path.realpath(MODELS_DIR):
+            raise HTTPException(status_code=400, detail="Models can only be loaded from the models directory.")
+    try:
+        return await artifacts['models'].reload(path, shadow=shadow)
+    except Exception as e:
+        raise HTTPException(status_code=422, detail=f"Model could not be loaded: {e}")
+
+@app.post("/model/promote", tags=["Model"])
+async def model_promote():
+    """Makes the shadow candidate the live model."""
+    if not _model_ready():
+        raise HTTPException(status_code=503, detail="Model is not available.")
+    try:
+        return artifacts['models'].promote()
+    except ValueError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+
+@app.delete("/model/shadow", tags=["Model"])
+async def model_shadow_clear():
+    """Stops shadow scoring and discards the candidate."""
+    if not _model_ready():
+        raise HTTPException(status_code=503, detail="Model is not available.")
+    artifacts['models'].clear_shadow()
+    return artifacts['models'].stats()
+
+@app.get("/metrics", tags=["Monitoring"], response_class=PlainTextResponse)
+async def prometheus_metrics():
+    """
+    Request, per-stage latency, batch-size and decision metrics in Prometheus
+    text format. Under the pre-fork server, counters and histograms are summed
+    over every worker (others' as of their last one-second publish); gauges
+    are the answering worker's own.
+    """
+    merge = worker.peer_metrics() if worker is not None else None
+    return PlainTextResponse(metrics.render(merge), media_type="text/plain; version=0.0.4")
+
+@app.post("/debug/profiler/start", tags=["Monitoring"])
+async def profiler_start(interval_ms: float = 5.0, duration: float = 30.0):
+    """Starts the sampling profiler for `duration` seconds (requires ASTRA_PROFILER=1)."""
+    if not PROFILER_ENABLED:
+        raise HTTPException(status_code=404, detail="Profiler is disabled; set ASTRA_PROFILER=1 to enable it.")
+    try:
+        profiler.start(interval_ms=interval_ms, duration=min(max(duration, 1.0), 600.0))
+    except RuntimeError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    return profiler.stats()
+
+@app.post("/debug/profiler/stop", tags=["Monitoring"])
+async def profiler_stop():
+    if not PROFILER_ENABLED:
+        raise HTTPException(status_code=404, detail="Profiler is disabled; set ASTRA_PROFILER=1 to enable it.")
+    profiler.stop()
+    return profiler.stats()
+
+@app.get("/debug/profiler", tags=["Monitoring"], response_class=PlainTextResponse)
+async def profiler_report(limit: int = 200):
+    """Most frequent sampled stacks in folded format (flamegraph.pl / speedscope input)."""
+    if not PROFILER_ENABLED:
+        raise HTTPException(status_code=404, detail="Profiler is disabled; set ASTRA_PROFILER=1 to enable it.")
+    return PlainTextResponse(profiler.folded(limit))
+
+@app.get("/inference/stats", tags=["Monitoring"])
+async def inference_stats():
+    """Queue depth and micro-batch size statistics of the inference scheduler."""
+    scheduler = artifacts.get('scheduler')
+    if scheduler is None:
+        raise HTTPException(status_code=503, detail="Inference scheduler is not running.")
+    return scheduler.stats()
+
+@app.get("/admission/stats", tags=["Monitoring"])
+async def admission_stats():
+    """Admission-control limits, in-flight count and admitted/rejected/shed/degraded counters for /predict."""
+    return admission.stats()
 
 # To run: uvicorn src.backend:app --reload --port 3000
+# In production, serve from several processes: python -m src.prefork --workers 4 --port 3000
 if __name__ == "__main__":
     uvicorn.run("src.backend:app", host="127.0.0.1", port=3000, reload=True)
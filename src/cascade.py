@@ -0,0 +1,191 @@
+# Two-tier Scoring Cascade for Astra
+# Most sessions are clear-cut: bots finish in seconds on day-old accounts,
+# humans take minutes. A tiny pre-filter (one shallow decision tree, trained by
+# train_model.py and exported as a compiled bundle) scores every batch first;
+# sessions it is sure about are decided there, and only the ambiguous rest go
+# through the full forest.
+#
+# "Sure" is decided per leaf, on a validation fold the tree was not fitted on.
+# A leaf may decide its majority class only if at least `min_support`
+# validation sessions reach it and the add-one estimate of its precision
+# (majority + 1) / (support + 2) reaches `target_precision`. That estimate
+# stays below 1.0 however pure the leaf looks, so a small leaf cannot decide
+# on luck. A shallow tree only looks at a few features, so each deciding leaf
+# also keeps the range of every feature over the sessions it decided in
+# training; a session outside that range (bot-like on a feature the tree never
+# split on, say) is one the leaf has never seen, and goes to the forest.
+
+import logging
+import os
+import threading
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from src.engine import MODELS_DIR, CompiledForest
+
+logger = logging.getLogger(__name__)
+
+CASCADE_PATH = os.path.join(MODELS_DIR, 'cascade_prefilter.bundle')
+
+# Pre-filter decisions must be at least this precise on validation data
+DEFAULT_TARGET_PRECISION = 0.99
+# A leaf needs at least this many validation sessions behind it to decide
+DEFAULT_MIN_SUPPORT = 30
+
+PREFILTER, FOREST = 'prefilter', 'forest'
+
+
+def fit_leaves(prefilter: CompiledForest, X_val: np.ndarray, y_val: np.ndarray,
+               X_fit: np.ndarray, y_fit: np.ndarray) -> Dict[str, dict]:
+    """
+    Per-leaf validation support and bot count, plus each leaf's feature range
+    over the fit and validation sessions of its majority class; keyed by node
+    index as bundle metadata (`leaves`). Matrices are raw, in the
+    pre-filter's column order.
+    """
+    y_val, y_fit = np.asarray(y_val), np.asarray(y_fit)
+    val_leaves = prefilter.leaf_indices(X_val)[:, 0]
+    X_all = np.vstack([X_fit, X_val])
+    y_all = np.concatenate([y_fit, y_val])
+    all_leaves = np.concatenate([prefilter.leaf_indices(X_fit)[:, 0], val_leaves])
+    leaves = {}
+    for node in np.unique(val_leaves):
+        reached = val_leaves == node
+        support, bots = int(reached.sum()), int((y_val[reached] == 1).sum())
+        majority = X_all[(all_leaves == node) & (y_all == int(bots * 2 > support))]
+        leaves[str(int(node))] = {
+            'support': support,
+            'bots': bots,
+            'low': majority.min(axis=0).tolist(),
+            'high': majority.max(axis=0).tolist(),
+        }
+    return leaves
+
+
+class Cascade:
+    """
+    The pre-filter tier. `decide(X, feature_columns)` takes a raw feature
+    matrix in the caller's column order and returns which rows it decided,
+    with their labels and confidences; the caller scores the rest.
+    """
+
+    def __init__(self, prefilter: CompiledForest, leaves: Dict[str, dict],
+                 target_precision: float = DEFAULT_TARGET_PRECISION, min_support: int = DEFAULT_MIN_SUPPORT):
+        if prefilter.n_trees != 1:
+            raise ValueError(f"The cascade pre-filter must be a single tree, not {prefilter.n_trees}.")
+        self.prefilter = prefilter
+        self.target_precision = target_precision
+        self.min_support = min_support
+        # One tree, so each leaf's verdict is fixed: decide once per leaf, then scoring is a leaf lookup
+        n_nodes, n_features = len(prefilter.feature), len(prefilter.feature_columns)
+        support, bots = np.zeros(n_nodes), np.zeros(n_nodes)
+        # Nodes without a range (never reached in validation) can hold no row: both bounds reject
+        self._low = np.full((n_nodes, n_features), np.inf)
+        self._high = np.full((n_nodes, n_features), -np.inf)
+        for node, leaf in leaves.items():
+            node = int(node)
+            support[node], bots[node] = leaf['support'], leaf['bots']
+            self._low[node], self._high[node] = leaf['low'], leaf['high']
+        classes = list(prefilter.classes_)
+        tree_says_bot = prefilter.value[:, classes.index(1)] > prefilter.value[:, classes.index(0)]
+        likely_bot = np.where(support > 0, bots * 2 > support, tree_says_bot)
+        majority = np.where(likely_bot, bots, support - bots)
+        self._leaf_bot = likely_bot.astype(np.uint8)
+        self._leaf_confidence = (majority + 1) / (support + 2)
+        self._leaf_decided = (support >= min_support) & (self._leaf_confidence >= target_precision)
+        # Plain-Python copies for one-row calls, where numpy's per-call setup costs more than the walk itself
+        self._nodes = list(zip(prefilter.feature.tolist(), prefilter.threshold.tolist(),
+                               prefilter.left.tolist(), prefilter.right.tolist()))
+        self._root = int(prefilter.roots[0])
+        self._bounds = [list(zip(low, high)) if may_decide else None
+                        for low, high, may_decide in zip(self._low.tolist(), self._high.tolist(),
+                                                         self._leaf_decided.tolist())]
+        self._orders: Dict[tuple, Optional[np.ndarray]] = {}
+        self._lock = threading.Lock()
+        self.decided = {PREFILTER: 0, FOREST: 0}
+
+    @classmethod
+    def load(cls, path: str = CASCADE_PATH) -> "Cascade":
+        """Maps a pre-filter bundle saved by train_model.py; its leaf statistics are in the bundle metadata."""
+        prefilter = CompiledForest.load(path)
+        metadata = prefilter.metadata
+        if 'leaves' not in metadata:
+            raise ValueError(f"'{path}' has no per-leaf statistics; retrain it with train_model.py")
+        return cls(prefilter, metadata['leaves'], metadata.get('target_precision', DEFAULT_TARGET_PRECISION),
+                   metadata.get('min_support', DEFAULT_MIN_SUPPORT))
+
+    @property
+    def feature_columns(self) -> List[str]:
+        return self.prefilter.feature_columns
+
+    @property
+    def forest_version(self) -> Optional[str]:
+        """Model version of the forest this pre-filter was evaluated against (and must be served with)."""
+        return self.prefilter.metadata.get('forest_version')
+
+    def decide(self, X: np.ndarray, feature_columns: List[str]) -> tuple:
+        """(decided mask, is_bot, confidence); is_bot and confidence are only meaningful where decided."""
+        order = self._order(feature_columns)
+        X = X if order is None else X[:, order]
+        if len(X) == 1:
+            return self._decide_row(X[0].tolist())
+        leaves = self.prefilter.leaf_indices(X)[:, 0]
+        decided = self._leaf_decided[leaves] \
+            & (X >= self._low[leaves]).all(axis=1) & (X <= self._high[leaves]).all(axis=1)
+        n_decided = int(np.count_nonzero(decided))
+        with self._lock:
+            self.decided[PREFILTER] += n_decided
+            self.decided[FOREST] += len(X) - n_decided
+        return decided, self._leaf_bot[leaves], self._leaf_confidence[leaves]
+
+    def classify(self, X: np.ndarray, feature_columns: List[str]) -> tuple:
+        """
+        (is_bot, confidence) for every row from the pre-filter alone, whether
+        or not its leaf may decide: the degraded answer when the forest is overloaded.
+        """
+        order = self._order(feature_columns)
+        X = X if order is None else X[:, order]
+        leaves = [self._leaf(X[0].tolist())] if len(X) == 1 else self.prefilter.leaf_indices(X)[:, 0]
+        return self._leaf_bot[leaves], self._leaf_confidence[leaves]
+
+    def stats(self) -> dict:
+        with self._lock:
+            decided = dict(self.decided)
+        total = sum(decided.values())
+        return {
+            'target_precision': self.target_precision,
+            'min_support': self.min_support,
+            'depth': self.prefilter.max_depth,
+            'deciding_leaves': int(np.count_nonzero(self._leaf_decided)),
+            'model_version': self.prefilter.metadata.get('model_version'),
+            'forest_version': self.forest_version,
+            'decided': decided,
+            'prefilter_share': round(decided[PREFILTER] / total, 4) if total else None,
+            'test': self.prefilter.metadata.get('test'),
+        }
+
+    def _decide_row(self, row: List[float]) -> tuple:
+        """decide() for a single row, without the matrix setup that dominates at batch size 1."""
+        leaf = self._leaf(row)
+        bounds = self._bounds[leaf]
+        decided = bounds is not None and all(low <= x <= high for x, (low, high) in zip(row, bounds))
+        with self._lock:
+            self.decided[PREFILTER if decided else FOREST] += 1
+        return np.array([decided]), self._leaf_bot[leaf:leaf + 1].copy(), self._leaf_confidence[leaf:leaf + 1].copy()
+
+    def _leaf(self, row: List[float]) -> int:
+        """The leaf one row (a list in the pre-filter's column order) reaches, routed exactly as leaf_indices does."""
+        node = self._root
+        for _ in range(self.prefilter.max_depth):
+            feature, threshold, left, right = self._nodes[node]
+            node = left if row[feature] <= threshold else right
+        return node
+
+    def _order(self, feature_columns: List[str]) -> Optional[np.ndarray]:
+        """Column indices taking the caller's order to the pre-filter's (None when they already match)."""
+        key = tuple(feature_columns)
+        if key not in self._orders:
+            self._orders[key] = None if list(key) == self.feature_columns \
+                else np.array([key.index(c) for c in self.feature_columns])
+        return self._orders[key]
@@ -3,8 +3,17 @@
 
 import streamlit as st
 import pandas as pd
+import requests
+import json
 import time
 import os
+import sys
+from datetime import datetime, timedelta
+
+# Run as `streamlit run dashboard.py` from src/, so make the repository root importable
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from src.log_store import CONFIDENCE_BINS, LogStore
+from src.log_tail import LogTailer
 
 # --- Page Configuration ---
 st.set_page_config(
@@ -15,24 +24,49 @@ st.set_page_config(
 
 # --- Configuration ---
 LOG_FILE_PATH = "../logs/api_log.csv"
+RECENT_ROWS = 500  # Ring buffer size for the live table
+# Must match the backend's; 'columnar' follows the newest .alog segment next to LOG_FILE_PATH
+LOG_FORMAT = os.environ.get('ASTRA_LOG_FORMAT', 'csv').lower()
+
+# 'log' tails LOG_FILE_PATH; 'stream' subscribes to the backend's /stats/stream push feed
+DATA_SOURCE = os.environ.get('ASTRA_DASHBOARD_SOURCE', 'log').lower()
+STATS_STREAM_URL = os.environ.get('ASTRA_STATS_STREAM_URL', "http://127.0.0.1:3000/stats/stream")
+DRIFT_URL = os.environ.get('ASTRA_DRIFT_URL', "http://127.0.0.1:3000/drift")
 
 # --- Helper Functions ---
-def load_log_data():
-    """Loads and preprocesses the log data from the CSV file."""
-    if os.path.exists(LOG_FILE_PATH):
-        try:
-            return pd.read_csv(LOG_FILE_PATH)
-        except pd.errors.EmptyDataError:
-            return pd.DataFrame()
-    return pd.DataFrame()
+def get_log_tailer():
+    """
+    Returns this session's incremental log reader. It survives Streamlit
+    reruns, so the full history is parsed once and every refresh after that
+    only reads newly appended rows.
+    """
+    if 'log_tailer' not in st.session_state:
+        st.session_state['log_tailer'] = LogTailer(LOG_FILE_PATH, max_rows=RECENT_ROWS, log_format=LOG_FORMAT)
+    return st.session_state['log_tailer']
+
+def get_log_store():
+    """This session's time-indexed view of the log segments; segment indexes stay cached across reruns."""
+    if 'log_store' not in st.session_state:
+        st.session_state['log_store'] = LogStore(LOG_FILE_PATH)
+    return st.session_state['log_store']
+
+def stream_stats(url):
+    """Yields `/stats` payloads pushed by the backend as server-sent events."""
+    with requests.get(url, stream=True, timeout=(5, 30)) as response:
+        response.raise_for_status()
+        for line in response.iter_lines(decode_unicode=True):
+            if line and line.startswith("data:"):
+                yield json.loads(line[len("data:"):])
 
 # --- Main Dashboard UI ---
 st.title("🛡️ Astra Watchdog Dashboard")
 st.caption("Live monitoring of predictions logged by the backend API.")
 
-st.info(
-    "For this dashboard to update, ensure the `backend.py` and `simulation.py` scripts are running."
-)
+view = st.sidebar.radio("View", ["Live", "History", "Drift"])
+if view == "Live":
+    st.info(
+        "For this dashboard to update, ensure the `backend.py` and `simulation.py` scripts are running."
+    )
 
 # --- Placeholders for Live Metrics ---
 col1, col2, col3, col4 = st.columns(4)
@@ -41,34 +75,27 @@ bots_detected_placeholder = col2.empty()
 human_sessions_placeholder = col3.empty()
 bot_percentage_placeholder = col4.empty()
 
-# --- Placeholder for Live Session Log ---
-st.subheader("Live Prediction Log")
-log_placeholder = st.empty()
+window_placeholder = st.empty()
 
-# --- Main Application Loop ---
-while True:
-    log_df = load_log_data()
-
-    if not log_df.empty:
-        # Sort by timestamp to show the latest entries first
-        log_df['Timestamp'] = pd.to_datetime(log_df['Timestamp'])
-        log_df = log_df.sort_values(by="Timestamp", ascending=False)
-        
-        # --- Calculate Metrics ---
-        total_requests = len(log_df)
-        bots_detected = log_df[log_df['decision'] == 'BLOCK'].shape[0]
-        humans_allowed = total_requests - bots_detected
-        bot_percentage = (bots_detected / total_requests) * 100 if total_requests > 0 else 0
-        
-        # --- Update Metric Placeholders ---
-        total_requests_placeholder.metric("Total Requests", f"{total_requests:,}")
-        bots_detected_placeholder.metric("Bots Detected", f"{bots_detected:,}")
-        human_sessions_placeholder.metric("Humans Allowed", f"{humans_allowed:,}")
-        bot_percentage_placeholder.metric("Bot Traffic %", f"{bot_percentage:.1f}%")
-        
+# --- Placeholder for Live Session Log (the other views have no log table) ---
+log_placeholder = None
+if view == "Live":
+    st.subheader("Live Prediction Log")
+    log_placeholder = st.empty()
+
+def render_metrics(total_requests, bots_detected, humans_allowed):
+    bot_percentage = (bots_detected / total_requests) * 100 if total_requests > 0 else 0
+    total_requests_placeholder.metric("Total Requests", f"{total_requests:,}")
+    bots_detected_placeholder.metric("Bots Detected", f"{bots_detected:,}")
+    human_sessions_placeholder.metric("Humans Allowed", f"{humans_allowed:,}")
+    bot_percentage_placeholder.metric("Bot Traffic %", f"{bot_percentage:.1f}%")
+
+def render_log_table(rows, placeholder=None):
+    placeholder = placeholder or log_placeholder
+    if rows:
         # --- Format Log Table for Display ---
-        display_df = log_df.copy().head(20) # Show latest 20
-        display_df['Timestamp'] = display_df['Timestamp'].dt.strftime('%H:%M:%S')
+        display_df = pd.DataFrame(rows)
+        display_df['Timestamp'] = display_df['Timestamp'].apply(lambda x: x.strftime('%H:%M:%S'))
         display_df['Prediction'] = display_df['is_bot'].apply(lambda x: "🤖 Bot" if x == 1 else "👤 Human")
         display_df['Decision'] = display_df['decision'].apply(lambda x: "🚨 BLOCK" if x == 'BLOCK' else "✅ ALLOW")
         display_df['Confidence'] = display_df['confidence_score'].apply(lambda x: f"{x:.2%}")
@@ -83,9 +110,117 @@ while True:
             "account_age_days": "Acct. Age (d)"
         })
 
-        log_placeholder.dataframe(display_df_final, use_container_width=True, hide_index=True)
+        placeholder.dataframe(display_df_final, use_container_width=True, hide_index=True)
+    elif DATA_SOURCE == 'stream':
+        placeholder.info("No predictions yet since the backend started. Waiting for data...")
     else:
-        log_placeholder.info("No prediction logs found in `logs/api_log.csv`. Waiting for data...")
+        placeholder.info("No prediction logs found in `logs/api_log.csv`. Waiting for data...")
+
+# --- Historical View ---
+def render_history():
+    """Metrics, block-rate chart and rows for a chosen time range, answered from the log segment indexes."""
+    now = datetime.now()
+    default_start = now - timedelta(hours=1)
+    start_date = st.sidebar.date_input("From", default_start.date())
+    start_time = st.sidebar.time_input("From time", default_start.time().replace(microsecond=0))
+    end_date = st.sidebar.date_input("To", now.date())
+    end_time = st.sidebar.time_input("To time", now.time().replace(microsecond=0))
+    bucket_label = st.sidebar.selectbox("Resolution", ["1 minute", "5 minutes", "1 hour", "1 day"], index=1)
+    bucket = {"1 minute": 60, "5 minutes": 300, "1 hour": 3600, "1 day": 86400}[bucket_label]
+
+    start = datetime.combine(start_date, start_time).timestamp()
+    end = datetime.combine(end_date, end_time).timestamp()
+    if end <= start:
+        window_placeholder.warning("The end of the range must be after its start.")
+        return
+    store = get_log_store()
+    started = time.perf_counter()
+    summary = store.query(start, end)
+    try:
+        series = store.timeseries(start, end, bucket)
+    except ValueError as e:
+        window_placeholder.warning(str(e))
+        return
+    render_metrics(summary['requests'], summary['blocked'], summary['allowed'])
+    window_placeholder.caption(
+        f"{summary['segments_scanned']} segment(s) in range: {summary['segments_from_summary']} answered from "
+        f"segment summaries, {summary['chunks_from_summary']} chunks from chunk summaries, "
+        f"{summary['chunks_read']} chunks read ({summary['rows_read']:,} rows) "
+        f"in {(time.perf_counter() - started) * 1000:.0f} ms."
+    )
+    if summary['requests']:
+        chart = pd.DataFrame(series)
+        chart['Time'] = pd.to_datetime(chart['start'], unit='s', utc=True).dt.tz_convert(
+            datetime.now().astimezone().tzinfo)
+        chart_col, hist_col = st.columns([2, 1])
+        chart_col.subheader("Block rate")
+        chart_col.line_chart(chart.set_index('Time')[['block_rate']])
+        chart_col.subheader("Requests")
+        chart_col.bar_chart(chart.set_index('Time')[['requests']])
+        hist_col.subheader("Confidence")
+        hist_col.bar_chart(pd.DataFrame(
+            {'sessions': summary['confidence_histogram']},
+            index=[f"{i / CONFIDENCE_BINS:.1f}" for i in range(CONFIDENCE_BINS)],
+        ))
+    st.subheader("Sessions in range")
+    render_log_table(store.rows(start, end, limit=20).to_dict('records'), st.empty())
+
+# --- Drift View ---
+def render_drift():
+    """Per-feature drift of live traffic against the training data, as reported by the backend's monitor."""
+    window = st.sidebar.selectbox("Window", ["5m", "1h", "24h"], index=1)
+    try:
+        response = requests.get(DRIFT_URL, params={'window': window}, timeout=5)
+        response.raise_for_status()
+    except requests.RequestException as e:
+        st.warning(f"Could not fetch `{DRIFT_URL}` ({e}).")
+        return
+    report = response.json()
+    col_samples, col_psi, col_drifted = st.columns(3)
+    col_samples.metric("Samples in window", f"{report['samples']:,}")
+    col_psi.metric("Max PSI", "-" if report['max_psi'] is None else f"{report['max_psi']:.3f}")
+    col_drifted.metric("Drifted features", len(report['drifted']))
+    if report['drifted']:
+        st.error(f"Drift detected in: {', '.join(report['drifted'])}")
+    table = pd.DataFrame.from_dict(report['features'], orient='index')
+    if 'psi' in table:
+        st.subheader("PSI by feature")
+        st.bar_chart(table[['psi']].fillna(0))
+    st.dataframe(table, use_container_width=True)
+
+if view == "History":
+    render_history()
+    st.stop()
+if view == "Drift":
+    render_drift()
+    st.stop()
+
+# --- Main Application Loop ---
+if DATA_SOURCE == 'stream':
+    # Push mode: the backend aggregates in memory, so no viewer touches the disk
+    while True:
+        try:
+            for snapshot in stream_stats(STATS_STREAM_URL):
+                totals = snapshot['totals']
+                render_metrics(totals['requests'], totals['blocked'], totals['allowed'])
+                window = snapshot['windows']['1m']
+                latency = window['latency_ms']
+                window_placeholder.caption(
+                    f"Last minute: {window['requests']:,} requests ({window['requests_per_second']}/s), "
+                    f"block rate {window['block_rate']:.1%}, latency p50 {latency['p50']} ms / p99 {latency['p99']} ms"
+                )
+                recent = [dict(row, Timestamp=datetime.fromtimestamp(row['Timestamp'])) for row in snapshot['recent']]
+                render_log_table(recent[::-1])
+        except (requests.exceptions.RequestException, ValueError) as e:
+            window_placeholder.warning(f"Lost connection to `{STATS_STREAM_URL}` ({e}). Retrying...")
+            time.sleep(2)
+else:
+    tailer = get_log_tailer()
+    while True:
+        tailer.poll()
+        # Running metrics are maintained incrementally by the tailer
+        render_metrics(tailer.total_requests, tailer.bots_detected, tailer.humans_allowed)
+        render_log_table(tailer.latest(20)) # Show latest 20
 
-    # Refresh every 2 seconds
-    time.sleep(2)
+        # Refresh every 2 seconds
+        time.sleep(2)
@@ -0,0 +1,209 @@
+# Feature-drift Monitor for Astra
+# train_model.py saves a reference histogram of every feature over the
+# training data (bin edges at the training quantiles, so each bin holds a
+# similar share of training rows). The API bins live traffic with the same
+# edges into a ring of one-minute buckets and compares any recent window with
+# the reference: PSI (population stability index) and a binned KS distance
+# per feature, plus the mean shift. Memory is fixed by the number of features,
+# bins and buckets, whatever the traffic; the log is never read.
+
+import json
+import os
+import threading
+import time
+from datetime import datetime
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from src.engine import MODELS_DIR
+
+REFERENCE_PATH = os.path.join(MODELS_DIR, 'drift_reference.json')
+REFERENCE_BINS = 20
+REFERENCE_QUANTILES = [0.01, 0.05, 0.25, 0.5, 0.75, 0.95, 0.99]
+
+# Windows reported by `report_all`, in seconds
+WINDOWS = {"5m": 300, "1h": 3600, "24h": 86400}
+
+# Conventional PSI bands: < 0.1 stable, 0.1 - 0.25 moderate shift, >= 0.25 drift
+PSI_MODERATE = 0.1
+PSI_DRIFT = 0.25
+MIN_SAMPLES = 200
+
+# Floor for empty bins, so PSI stays finite
+_EPSILON = 1e-4
+
+
+def _bin_index(X: np.ndarray, edges: np.ndarray) -> np.ndarray:
+    """Bin of every value, per feature: `edges` is (n_features, n_edges) padded with +inf."""
+    return (X[:, :, None] > edges[None, :, :]).sum(axis=2)
+
+
+def build_reference(X: np.ndarray, feature_columns: List[str], bins: int = REFERENCE_BINS) -> dict:
+    """Reference bin edges, bin shares, mean and quantiles of every feature (columns of X)."""
+    X = np.asarray(X, dtype=np.float64)
+    features = {}
+    for j, column in enumerate(feature_columns):
+        values = X[:, j]
+        edges = np.unique(np.quantile(values, np.linspace(0, 1, bins + 1)[1:-1]))
+        counts = np.bincount(np.searchsorted(edges, values, side='left'), minlength=len(edges) + 1)
+        features[column] = {
+            'edges': edges.tolist(),
+            'proportions': (counts / len(values)).tolist(),
+            'mean': float(values.mean()),
+            'quantiles': dict(zip(map(str, REFERENCE_QUANTILES), np.quantile(values, REFERENCE_QUANTILES).tolist())),
+        }
+    return {'created_at': datetime.now().isoformat(), 'rows': int(len(X)), 'feature_columns': list(feature_columns),
+            'features': features}
+
+
+def save_reference(reference: dict, path: str = REFERENCE_PATH):
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(reference, f, indent=2)
+    os.replace(tmp_path, path)
+
+
+def load_reference(path: str = REFERENCE_PATH) -> dict:
+    with open(path) as f:
+        return json.load(f)
+
+
+def psi(live: np.ndarray, reference: np.ndarray) -> float:
+    """Population stability index between two sets of bin shares."""
+    live = np.maximum(live, _EPSILON)
+    reference = np.maximum(reference, _EPSILON)
+    return float(np.sum((live - reference) * np.log(live / reference)))
+
+
+def binned_ks(live: np.ndarray, reference: np.ndarray) -> float:
+    """Largest gap between the two cumulative distributions, evaluated at the bin edges."""
+    return float(np.max(np.abs(np.cumsum(live) - np.cumsum(reference))))
+
+
+class DriftMonitor:
+    """
+    Ring of `horizon` buckets of `bucket_seconds` each, holding per-feature
+    bin counts and sums of live traffic. `observe` is called from inference
+    worker threads, so recording takes a lock.
+    """
+
+    def __init__(self, reference: dict, bucket_seconds: int = 60, horizon: int = 1440, snapshot_ttl: float = 1.0):
+        self.reference = reference
+        self.columns = list(reference['feature_columns'])
+        self.bucket_seconds = int(bucket_seconds)
+        self.horizon = int(horizon)
+        self.snapshot_ttl = snapshot_ttl
+        features = [reference['features'][c] for c in self.columns]
+        self.n_bins = max(len(f['edges']) for f in features) + 1
+        # Edges padded with +inf: padded bins never receive a value
+        self._edges = np.full((len(self.columns), self.n_bins - 1), np.inf)
+        self._reference = np.zeros((len(self.columns), self.n_bins))
+        for j, feature in enumerate(features):
+            self._edges[j, :len(feature['edges'])] = feature['edges']
+            self._reference[j, :len(feature['proportions'])] = feature['proportions']
+        self._reference_mean = np.array([f['mean'] for f in features])
+        self._flat_offsets = np.arange(len(self.columns)) * self.n_bins
+
+        self._bucket_id = np.full(self.horizon, -1, dtype=np.int64)
+        self._counts = np.zeros((self.horizon, len(self.columns), self.n_bins), dtype=np.int32)
+        self._sums = np.zeros((self.horizon, len(self.columns)))
+        self._rows = np.zeros(self.horizon, dtype=np.int64)
+        self._orders: Dict[tuple, Optional[np.ndarray]] = {}
+        self._lock = threading.Lock()
+        self.observed = 0
+
+        self._cached: Optional[dict] = None
+        self._cached_at = 0.0
+
+    # --- Recording ---
+    def observe(self, X: np.ndarray, columns: List[str], now: Optional[float] = None):
+        """Counts raw feature rows `X` whose columns are in `columns` order."""
+        X = np.asarray(X, dtype=np.float64)
+        if not len(X):
+            return
+        order = self._order(columns)
+        if order is not None:
+            X = X[:, order]
+        flat = (_bin_index(X, self._edges) + self._flat_offsets).ravel()
+        counts = np.bincount(flat, minlength=len(self.columns) * self.n_bins).reshape(len(self.columns), self.n_bins)
+        sums = X.sum(axis=0)
+        bucket = int((time.time() if now is None else now) // self.bucket_seconds)
+        idx = bucket % self.horizon
+        with self._lock:
+            if self._bucket_id[idx] != bucket:
+                self._bucket_id[idx] = bucket
+                self._counts[idx] = 0
+                self._sums[idx] = 0
+                self._rows[idx] = 0
+            self._counts[idx] += counts
+            self._sums[idx] += sums
+            self._rows[idx] += len(X)
+            self.observed += len(X)
+
+    def _order(self, columns: List[str]) -> Optional[np.ndarray]:
+        key = tuple(columns)
+        if key not in self._orders:
+            order = np.array([list(columns).index(c) for c in self.columns])
+            self._orders[key] = None if np.array_equal(order, np.arange(len(columns))) else order
+        return self._orders[key]
+
+    # --- Queries ---
+    def report(self, window: int, now: Optional[float] = None) -> dict:
+        """Drift of the last `window` seconds of traffic against the training reference."""
+        now = time.time() if now is None else now
+        current = int(now // self.bucket_seconds)
+        with self._lock:
+            live = (self._bucket_id > current - int(np.ceil(window / self.bucket_seconds))) & \
+                   (self._bucket_id <= current)
+            counts = self._counts[live].sum(axis=0)
+            sums = self._sums[live].sum(axis=0)
+            rows = int(self._rows[live].sum())
+
+        features = {}
+        for j, column in enumerate(self.columns):
+            entry = {'reference_mean': round(float(self._reference_mean[j]), 4)}
+            if rows:
+                shares = counts[j] / rows
+                entry.update({
+                    'psi': round(psi(shares, self._reference[j]), 4),
+                    'ks': round(binned_ks(shares, self._reference[j]), 4),
+                    'live_mean': round(float(sums[j] / rows), 4),
+                })
+                entry['status'] = _status(entry['psi'], rows)
+            else:
+                entry['status'] = 'no_data'
+            features[column] = entry
+        scored = [f for f in features.values() if 'psi' in f]
+        return {
+            'window_seconds': window,
+            'samples': rows,
+            'max_psi': max((f['psi'] for f in scored), default=None),
+            'drifted': [c for c, f in features.items() if f['status'] == 'drift'],
+            'features': features,
+        }
+
+    def report_all(self) -> dict:
+        """All configured windows; cached briefly so pollers and scrapes share one computation."""
+        now = time.time()
+        if self._cached is not None and now - self._cached_at < self.snapshot_ttl:
+            return self._cached
+        self._cached = {
+            'timestamp': now,
+            'reference': {'created_at': self.reference.get('created_at'), 'rows': self.reference.get('rows')},
+            'observed': self.observed,
+            'windows': {name: self.report(seconds, now) for name, seconds in WINDOWS.items()},
+        }
+        self._cached_at = now
+        return self._cached
+
+
+def _status(value: float, samples: int) -> str:
+    if samples < MIN_SAMPLES:
+        return 'insufficient_data'
+    if value >= PSI_DRIFT:
+        return 'drift'
+    if value >= PSI_MODERATE:
+        return 'moderate'
+    return 'stable'
@@ -0,0 +1,349 @@
+# Compiled Inference Engine for Astra
+# Flattens the trained RandomForest + StandardScaler into contiguous NumPy arrays
+# and scores raw feature vectors with a vectorized, level-by-level traversal.
+# No pandas, no sklearn input validation on the hot path.
+#
+# The arrays are stored in a single versioned model bundle:
+#   MAGIC | uint32 header length | JSON header | zero padding | payload
+# The header carries metadata, the feature column order, each array's dtype,
+# shape and offset, and a SHA-256 of the payload. Every array starts on a
+# 64-byte boundary so the payload can be memory-mapped and used in place;
+# all API workers mapping the same file share its pages.
+
+import os
+import json
+import hashlib
+import logging
+from datetime import datetime
+from typing import List, Optional
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+MODELS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'models')
+BUNDLE_PATH = os.path.join(MODELS_DIR, 'astra_model.bundle')
+BUNDLE_MAGIC = b'ASTRAMDL'
+BUNDLE_VERSION = 1
+_ALIGN = 64
+
+# Bundle array name -> CompiledForest attribute
+_BUNDLE_ARRAYS = {
+    'feature': 'feature', 'threshold': 'threshold', 'left': 'left', 'right': 'right', 'value': 'value',
+    'roots': 'roots', 'classes': 'classes_', 'scaler_mean': 'scaler_mean', 'scaler_scale': 'scaler_scale',
+}
+
+
+def _aligned(offset: int) -> int:
+    return (offset + _ALIGN - 1) // _ALIGN * _ALIGN
+
+_SIGN_MASK = np.int64(0x7FFFFFFFFFFFFFFF)
+
+
+def _float_to_key(x: np.ndarray) -> np.ndarray:
+    """Maps float64 values to int64 keys with the same ordering."""
+    bits = np.ascontiguousarray(x, dtype=np.float64).view(np.int64)
+    return np.where(bits < 0, -(bits & _SIGN_MASK), bits)
+
+
+def _key_to_float(key: np.ndarray) -> np.ndarray:
+    """Inverse of `_float_to_key`."""
+    bits = np.where(key < 0, (-key) | ~_SIGN_MASK, key).astype(np.int64)
+    return bits.view(np.float64)
+
+
+def _fold_thresholds(thresholds: np.ndarray, mean: np.ndarray, scale: np.ndarray) -> np.ndarray:
+    """
+    Moves scaled-space split thresholds into raw feature space.
+
+    sklearn goes left when float32((x - mean) / scale) <= t. That predicate is
+    monotone in x, so for every split there is a largest float64 x for which it
+    holds; we find it by bisecting over the ordered float64 bit patterns. Using
+    it as the raw threshold reproduces sklearn's routing exactly, including
+    rounding, which the algebraic `t * scale + mean` would not.
+    """
+    def goes_left(x):
+        scaled = ((x - mean) / scale).astype(np.float32)
+        return scaled <= thresholds
+
+    lo = _float_to_key(np.full(thresholds.shape, -np.inf))  # always goes left
+    hi = _float_to_key(np.full(thresholds.shape, np.inf))   # never goes left for finite t
+    with np.errstate(invalid='ignore', over='ignore'):
+        while True:
+            # The key range spans more than int64, so measure it in uint64
+            gap = hi.astype(np.uint64) - lo.astype(np.uint64)
+            if not np.any(gap > 1):
+                break
+            mid = lo + (gap // np.uint64(2)).astype(np.int64)
+            left = goes_left(_key_to_float(mid))
+            lo = np.where(left, mid, lo)
+            hi = np.where(left, hi, mid)
+        # Thresholds so large that even +inf goes left
+        return np.where(goes_left(np.full(thresholds.shape, np.inf)), np.inf, _key_to_float(lo))
+
+
+class CompiledForest:
+    """
+    A RandomForestClassifier (and the StandardScaler in front of it) stored as
+    flat arrays. All trees share one node table; leaves point to themselves so
+    every row can take exactly `max_depth` steps without branching.
+    """
+
+    def __init__(self, feature: np.ndarray, threshold: np.ndarray, left: np.ndarray, right: np.ndarray,
+                 value: np.ndarray, roots: np.ndarray, max_depth: int, classes: np.ndarray,
+                 feature_columns: List[str], scaler_mean: Optional[np.ndarray] = None,
+                 scaler_scale: Optional[np.ndarray] = None, metadata: Optional[dict] = None):
+        # ascontiguousarray only copies on a dtype mismatch, so memory-mapped arrays stay mapped
+        self.feature = np.ascontiguousarray(feature, dtype=np.intp)
+        self.threshold = np.ascontiguousarray(threshold, dtype=np.float64)
+        self.left = np.ascontiguousarray(left, dtype=np.intp)
+        self.right = np.ascontiguousarray(right, dtype=np.intp)
+        self.value = np.ascontiguousarray(value, dtype=np.float64)
+        self.roots = np.ascontiguousarray(roots, dtype=np.intp)
+        self.max_depth = int(max_depth)
+        self.classes_ = np.asarray(classes)
+        self.feature_columns = list(feature_columns)
+        # Kept for reference only; already folded into `threshold`
+        n_features = len(self.feature_columns)
+        self.scaler_mean = np.zeros(n_features) if scaler_mean is None else np.asarray(scaler_mean, dtype=np.float64)
+        self.scaler_scale = np.ones(n_features) if scaler_scale is None else np.asarray(scaler_scale, dtype=np.float64)
+        self.metadata = dict(metadata or {})
+
+    @property
+    def n_trees(self) -> int:
+        return len(self.roots)
+
+    # --- Export ---
+    @classmethod
+    def from_sklearn(cls, model, scaler, feature_columns: List[str]) -> "CompiledForest":
+        """
+        Flattens a fitted RandomForestClassifier / ExtraTreesClassifier (or a
+        single DecisionTreeClassifier) and folds the StandardScaler into its thresholds.
+        """
+        estimators = getattr(model, 'estimators_', [model])
+        mean = np.zeros(len(feature_columns)) if scaler.mean_ is None else np.asarray(scaler.mean_, dtype=np.float64)
+        scale = np.ones(len(feature_columns)) if scaler.scale_ is None else np.asarray(scaler.scale_, dtype=np.float64)
+        n_classes = len(model.classes_)
+
+        features, thresholds, lefts, rights, values, roots = [], [], [], [], [], []
+        offset, max_depth = 0, 0
+        for estimator in estimators:
+            tree = estimator.tree_
+            n_nodes = tree.node_count
+            is_leaf = tree.children_left == -1
+            node_ids = np.arange(n_nodes)
+
+            feature = np.where(is_leaf, 0, tree.feature)
+            folded = _fold_thresholds(tree.threshold, mean[feature], scale[feature])
+            features.append(feature)
+            thresholds.append(np.where(is_leaf, np.inf, folded))
+            lefts.append(np.where(is_leaf, node_ids, tree.children_left) + offset)
+            rights.append(np.where(is_leaf, node_ids, tree.children_right) + offset)
+            values.append(tree.value[:, 0, :n_classes])
+            roots.append(offset)
+            offset += n_nodes
+            max_depth = max(max_depth, tree.max_depth)
+
+        return cls(
+            feature=np.concatenate(features),
+            threshold=np.concatenate(thresholds),
+            left=np.concatenate(lefts),
+            right=np.concatenate(rights),
+            value=np.concatenate(values),
+            roots=np.asarray(roots),
+            max_depth=max_depth,
+            classes=model.classes_,
+            feature_columns=feature_columns,
+            scaler_mean=mean,
+            scaler_scale=scale,
+            metadata={
+                'model_type': type(model).__name__,
+                'n_estimators': len(estimators),
+                'params': {k: v for k, v in model.get_params().items() if isinstance(v, (int, float, str, bool))},
+            },
+        )
+
+    # --- Model bundle ---
+    def save(self, path: str = BUNDLE_PATH, metadata: Optional[dict] = None) -> dict:
+        """
+        Writes the forest as a single versioned bundle and returns its header.
+        The file is written to a temporary name and renamed into place, so a
+        reader never sees a half-written bundle.
+        """
+        arrays = {name: np.ascontiguousarray(getattr(self, attr)) for name, attr in _BUNDLE_ARRAYS.items()}
+        layout, offset = {}, 0
+        for name, array in arrays.items():
+            offset = _aligned(offset)
+            layout[name] = {'dtype': array.dtype.str, 'shape': list(array.shape), 'offset': offset}
+            offset += array.nbytes
+        payload = bytearray(offset)
+        for name, array in arrays.items():
+            start = layout[name]['offset']
+            payload[start:start + array.nbytes] = array.tobytes()
+
+        checksum = hashlib.sha256(payload).hexdigest()
+        header = {
+            'format_version': BUNDLE_VERSION,
+            'model_version': checksum[:12],
+            'metadata': {
+                **self.metadata,
+                **(metadata or {}),
+                'created_at': datetime.now().isoformat(),
+                'n_trees': self.n_trees,
+                'n_nodes': int(len(self.feature)),
+                'max_depth': self.max_depth,
+            },
+            'max_depth': self.max_depth,
+            'feature_columns': self.feature_columns,
+            'arrays': layout,
+            'payload_bytes': len(payload),
+            'checksum': {'algorithm': 'sha256', 'payload': checksum},
+        }
+        header_bytes = json.dumps(header).encode('utf-8')
+        prefix = BUNDLE_MAGIC + len(header_bytes).to_bytes(4, 'little') + header_bytes
+        padding = b'\0' * (_aligned(len(prefix)) - len(prefix))
+
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(prefix + padding)
+            f.write(payload)
+        os.replace(tmp_path, path)
+        return header
+
+    @classmethod
+    def load(cls, path: str = BUNDLE_PATH, mmap: bool = True, verify: bool = True) -> "CompiledForest":
+        """
+        Opens a model bundle. With `mmap` the arrays are used straight from
+        the page cache rather than copied; `verify` checks the payload checksum.
+        """
+        with open(path, 'rb') as f:
+            prefix = f.read(len(BUNDLE_MAGIC) + 4)
+            if prefix[:len(BUNDLE_MAGIC)] != BUNDLE_MAGIC:
+                raise ValueError(f"'{path}' is not an Astra model bundle.")
+            header_len = int.from_bytes(prefix[len(BUNDLE_MAGIC):], 'little')
+            header = json.loads(f.read(header_len).decode('utf-8'))
+        if header.get('format_version') != BUNDLE_VERSION:
+            raise ValueError(f"Unsupported model bundle format {header.get('format_version')} in '{path}'.")
+
+        data = np.memmap(path, dtype=np.uint8, mode='r') if mmap else np.fromfile(path, dtype=np.uint8)
+        start = _aligned(len(BUNDLE_MAGIC) + 4 + header_len)
+        payload = data[start:start + header['payload_bytes']]
+        if verify and hashlib.sha256(payload).hexdigest() != header['checksum']['payload']:
+            raise ValueError(f"Model bundle '{path}' failed its checksum; refusing to load it.")
+
+        arrays = {}
+        for name, spec in header['arrays'].items():
+            dtype = np.dtype(spec['dtype'])
+            count = int(np.prod(spec['shape'], dtype=np.int64))
+            arrays[name] = payload[spec['offset']:spec['offset'] + count * dtype.itemsize].view(dtype).reshape(spec['shape'])
+        return cls(
+            feature=arrays['feature'], threshold=arrays['threshold'], left=arrays['left'], right=arrays['right'],
+            value=arrays['value'], roots=arrays['roots'], max_depth=header['max_depth'], classes=arrays['classes'],
+            feature_columns=header['feature_columns'], scaler_mean=arrays['scaler_mean'],
+            scaler_scale=arrays['scaler_scale'],
+            metadata={**header['metadata'], 'model_version': header['model_version'], 'bundle_path': path},
+        )
+
+    # --- Scoring ---
+    def rows_to_matrix(self, rows: List[dict]) -> np.ndarray:
+        """Builds the raw float64 feature matrix from feature dicts in model column order."""
+        columns = self.feature_columns
+        return np.array([[row[c] for c in columns] for row in rows], dtype=np.float64)
+
+    def raw_to_matrix(self, X: np.ndarray) -> np.ndarray:
+        """Model input for a raw feature matrix in model column order: the matrix itself (scaling is folded in)."""
+        return np.asarray(X, dtype=np.float64)
+
+    def predict_rows(self, rows: List[dict]) -> np.ndarray:
+        """Class probabilities straight from feature dicts."""
+        return self.predict_proba(self.rows_to_matrix(rows))
+
+    def leaf_indices(self, X: np.ndarray) -> np.ndarray:
+        """Returns the global leaf index reached in every tree, shape (n_rows, n_trees)."""
+        X = np.asarray(X, dtype=np.float64)
+        node = np.broadcast_to(self.roots, (X.shape[0], self.n_trees)).copy()
+        rows = np.arange(X.shape[0])[:, None]
+        for _ in range(self.max_depth):
+            go_left = X[rows, self.feature[node]] <= self.threshold[node]
+            node = np.where(go_left, self.left[node], self.right[node])
+        return node
+
+    def predict_proba(self, X: np.ndarray) -> np.ndarray:
+        """
+        Mean of the per-tree leaf distributions. Trees are summed in order with
+        a sequential cumulative sum, matching sklearn's accumulation bit for bit.
+        """
+        leaf_values = self.value[self.leaf_indices(X)]  # (n_rows, n_trees, n_classes)
+        proba = np.cumsum(leaf_values, axis=1)[:, -1, :]
+        proba /= self.n_trees
+        return proba
+
+    def predict(self, X: np.ndarray) -> np.ndarray:
+        return self.classes_.take(np.argmax(self.predict_proba(X), axis=1))
+
+
+def to_verdicts(proba: np.ndarray, classes: np.ndarray) -> List[dict]:
+    """
+    API-shaped verdicts from class probabilities. The label is the argmax of
+    the probabilities, which is exactly what RandomForestClassifier.predict
+    does internally.
+    """
+    best = proba.argmax(axis=1)
+    labels = classes[best]
+    confidences = proba[np.arange(len(proba)), best]
+    verdicts = []
+    for label, confidence in zip(labels, confidences):
+        is_bot = int(label)
+        verdicts.append({"is_bot": is_bot, "decision": "BLOCK" if is_bot == 1 else "ALLOW",
+                         "confidence_score": float(confidence)})
+    return verdicts
+
+
+def bundle_is_current(path: str = BUNDLE_PATH, source_path: Optional[str] = None) -> bool:
+    """True if the bundle exists and is not older than the pickled model it was exported from."""
+    if not os.path.exists(path):
+        return False
+    return source_path is None or not os.path.exists(source_path) \
+        or os.path.getmtime(path) >= os.path.getmtime(source_path)
+
+
+def load_or_compile(model, scaler, feature_columns: List[str], path: str = BUNDLE_PATH,
+                    source_path: Optional[str] = None) -> CompiledForest:
+    """
+    Loads the compiled forest from the bundle at `path`, or builds it from the
+    sklearn artifacts when the bundle is missing, stale (older than
+    `source_path`) or was exported for a different feature order. A rebuilt
+    forest is written back to `path` and mapped from there, so the next start
+    skips compilation.
+    """
+    if bundle_is_current(path, source_path):
+        engine = CompiledForest.load(path)
+        if engine.feature_columns == list(feature_columns):
+            return engine
+    logger.info("Compiling RandomForest into flat inference arrays...")
+    engine = CompiledForest.from_sklearn(model, scaler, feature_columns)
+    metadata = {'exported_from': os.path.basename(source_path)} if source_path else None
+    try:
+        engine.save(path, metadata=metadata)
+    except OSError as e:
+        logger.warning(f"Could not write the compiled bundle to '{path}' ({e}); it will be recompiled next start.")
+        return engine
+    logger.info(f"Compiled bundle saved to '{path}'.")
+    return CompiledForest.load(path)
+
+
+# To export: python -m src.engine
+if __name__ == "__main__":
+    import joblib
+    import sklearn
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    model = joblib.load(os.path.join(MODELS_DIR, 'astra_model.joblib'))
+    scaler = joblib.load(os.path.join(MODELS_DIR, 'astra_scaler.joblib'))
+    feature_columns = joblib.load(os.path.join(MODELS_DIR, 'feature_columns.joblib'))
+    engine = CompiledForest.from_sklearn(model, scaler, feature_columns)
+    header = engine.save(BUNDLE_PATH, metadata={'exported_from': 'astra_model.joblib',
+                                                'sklearn_version': sklearn.__version__})
+    logger.info(f"Exported {engine.n_trees} trees ({len(engine.feature)} nodes, depth {engine.max_depth}) "
+                f"to '{BUNDLE_PATH}' (model version {header['model_version']}).")
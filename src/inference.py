@@ -0,0 +1,208 @@
+# Micro-batching Inference Scheduler for Astra
+# Queues single-session scoring requests, coalesces them into small batches and
+# runs each batch on a worker thread so the event loop is never blocked by
+# pandas/sklearn work. Items may carry a deadline; one that is still queued
+# when it passes is dropped unscored, so an overloaded server does not spend
+# work on answers the client has already given up on.
+
+import asyncio
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Batch-size histogram buckets (upper bounds, inclusive)
+BATCH_SIZE_BUCKETS = [1, 2, 4, 8, 16, 32, 64, 128, 256, 512]
+
+
+class DeadlineExceeded(Exception):
+    """A queued item's deadline passed before a worker was free to score it."""
+
+
+class InferenceScheduler:
+    """
+    Coalesces concurrent scoring requests into micro-batches.
+
+    A batch is dispatched as soon as it reaches `max_batch_size`, or when
+    `max_wait_us` microseconds have passed since its first item arrived. The
+    wait is adaptive: if no batch is currently running, whatever is queued is
+    dispatched immediately, so an idle server adds no latency and batching
+    only kicks in once the workers are busy.
+    """
+
+    def __init__(self, score_fn: Callable[[List[dict]], List[dict]], max_batch_size: int = 64,
+                 max_wait_us: int = 500, workers: int = 2,
+                 observer: Optional[Callable[[List[float], float], None]] = None):
+        self.score_fn = score_fn
+        # Called after every queued batch with each item's queue wait and the batch's scoring time (seconds)
+        self.observer = observer
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.max_wait_us = max(0, int(max_wait_us))
+        self.workers = max(1, int(workers))
+
+        self._queue: Optional[asyncio.Queue] = None
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._runner: Optional[asyncio.Task] = None
+        self._in_flight = 0
+
+        # Statistics
+        self.requests = 0
+        self.expired = 0
+        self.batches = 0
+        self.batched_items = 0
+        self.max_batch_seen = 0
+        self.last_batch_size = 0
+        self.busy_seconds = 0.0
+        self.batch_size_counts = [0] * (len(BATCH_SIZE_BUCKETS) + 1)
+
+    # --- Lifecycle ---
+    async def start(self):
+        """Creates the queue, the worker pool and the batching loop on the running event loop."""
+        self._queue = asyncio.Queue()
+        self._slots = asyncio.Semaphore(self.workers)
+        self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="astra-infer")
+        self._runner = asyncio.create_task(self._run())
+        logger.info(f"Inference scheduler started (max_batch_size={self.max_batch_size}, "
+                    f"max_wait_us={self.max_wait_us}, workers={self.workers}).")
+
+    async def stop(self):
+        """Stops the batching loop and waits for running batches to finish."""
+        if self._runner:
+            self._runner.cancel()
+            try:
+                await self._runner
+            except asyncio.CancelledError:
+                pass
+        if self._executor:
+            self._executor.shutdown(wait=True)
+        # Anything still queued will never be scored
+        while self._queue is not None and not self._queue.empty():
+            _, future, _, _ = self._queue.get_nowait()
+            if not future.done():
+                future.set_exception(RuntimeError("Inference scheduler stopped."))
+        logger.info("Inference scheduler stopped.")
+
+    @property
+    def running(self) -> bool:
+        return self._runner is not None and not self._runner.done()
+
+    @property
+    def queue_depth(self) -> int:
+        return self._queue.qsize() if self._queue is not None else 0
+
+    # --- Public API ---
+    async def submit(self, row: dict, deadline: Optional[float] = None) -> dict:
+        """
+        Queues one feature dict and waits for its prediction. With a
+        `deadline` (a time.perf_counter() value), the item is dropped with
+        DeadlineExceeded instead of being scored if no worker reaches it in time.
+        """
+        future = asyncio.get_running_loop().create_future()
+        self.requests += 1
+        self._queue.put_nowait((row, future, time.perf_counter(), deadline))
+        return await future
+
+    async def run_batch(self, rows: List[dict]) -> List[dict]:
+        """Scores an already-formed batch on the worker pool, bypassing the queue."""
+        if not rows:
+            return []
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, self.score_fn, rows)
+
+    async def run_in_worker(self, fn: Callable, *args):
+        """Runs `fn(*args)` on the worker pool, for work already shaped as a batch that is not feature dicts."""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, fn, *args)
+
+    def stats(self) -> Dict[str, Any]:
+        """Returns queue-depth and batch-size statistics."""
+        histogram = {f"le_{bound}": count for bound, count in zip(BATCH_SIZE_BUCKETS, self.batch_size_counts)}
+        histogram["gt_" + str(BATCH_SIZE_BUCKETS[-1])] = self.batch_size_counts[-1]
+        return {
+            "max_batch_size": self.max_batch_size,
+            "max_wait_us": self.max_wait_us,
+            "workers": self.workers,
+            "queue_depth": self.queue_depth,
+            "in_flight_batches": self._in_flight,
+            "requests": self.requests,
+            "expired": self.expired,
+            "batches": self.batches,
+            "mean_batch_size": round(self.batched_items / self.batches, 2) if self.batches else 0.0,
+            "last_batch_size": self.last_batch_size,
+            "max_batch_size_seen": self.max_batch_seen,
+            "worker_busy_seconds": round(self.busy_seconds, 4),
+            "batch_size_histogram": histogram,
+        }
+
+    # --- Internals ---
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            deadline = loop.time() + self.max_wait_us / 1_000_000
+            while len(batch) < self.max_batch_size:
+                if not self._queue.empty():
+                    batch.append(self._queue.get_nowait())
+                    continue
+                remaining = deadline - loop.time()
+                # Idle workers: dispatching now beats waiting for company
+                if self._in_flight == 0 or remaining <= 0:
+                    break
+                await asyncio.sleep(remaining)
+                if self._queue.empty():
+                    break
+
+            await self._slots.acquire()
+            self._in_flight += 1
+            asyncio.create_task(self._dispatch(batch))
+
+    async def _dispatch(self, batch: list):
+        loop = asyncio.get_running_loop()
+        start = time.perf_counter()
+        live = []
+        for item in batch:
+            _, future, _, deadline = item
+            if deadline is None or deadline >= start:
+                live.append(item)
+                continue
+            self.expired += 1
+            if not future.done():
+                future.set_exception(DeadlineExceeded("Deadline passed while queued."))
+        batch = live
+        if not batch:
+            self._in_flight -= 1
+            self._slots.release()
+            return
+        rows = [row for row, _, _, _ in batch]
+        try:
+            results = await loop.run_in_executor(self._executor, self.score_fn, rows)
+        except Exception as e:
+            for _, future, _, _ in batch:
+                if not future.done():
+                    future.set_exception(e)
+        else:
+            for (_, future, _, _), result in zip(batch, results):
+                if not future.done():
+                    future.set_result(result)
+        finally:
+            elapsed = time.perf_counter() - start
+            self.busy_seconds += elapsed
+            if self.observer is not None:
+                self.observer([start - enqueued for _, _, enqueued, _ in batch], elapsed)
+            self._record_batch(len(batch))
+            self._in_flight -= 1
+            self._slots.release()
+
+    def _record_batch(self, size: int):
+        self.batches += 1
+        self.batched_items += size
+        self.last_batch_size = size
+        self.max_batch_seen = max(self.max_batch_seen, size)
+        for i, bound in enumerate(BATCH_SIZE_BUCKETS):
+            if size <= bound:
+                self.batch_size_counts[i] += 1
+                return
+        self.batch_size_counts[-1] += 1
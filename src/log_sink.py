@@ -0,0 +1,344 @@
+# Buffered Prediction Log Sink for Astra
+# Request handlers hand prediction records to a bounded in-memory queue; a
+# background thread writes them out in batches and rotates the log into
+# time-partitioned segment files. Requests never wait on disk.
+
+import csv
+import glob
+import logging
+import os
+import queue
+import struct
+import threading
+import time
+from datetime import datetime
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+LOG_HEADER_PREFIX = ['Timestamp', 'is_bot', 'decision', 'confidence_score']
+
+# --- Columnar segment format ---
+# File:  MAGIC | uint16 version | uint32 header length | header (column names, '\n'-joined)
+# Block: uint32 n_rows | one contiguous little-endian array per column
+COLUMNAR_MAGIC = b'ASTRALOG'
+COLUMNAR_VERSION = 1
+COLUMNAR_SUFFIX = '.alog'
+
+
+def _columnar_dtypes(feature_columns: List[str]) -> Dict[str, np.dtype]:
+    dtypes = {'Timestamp': np.dtype('<f8'), 'is_bot': np.dtype('u1'), 'confidence_score': np.dtype('<f8')}
+    for column in feature_columns:
+        dtypes[column] = np.dtype('<f8')
+    return dtypes
+
+
+def _timestamp_to_epoch(value) -> float:
+    if isinstance(value, (int, float)):
+        return float(value)
+    return datetime.fromisoformat(value).timestamp()
+
+
+def read_columnar_header(data) -> tuple:
+    """Parses a columnar segment's file header: returns (columns, dtypes, offset of the first block)."""
+    if bytes(data[:len(COLUMNAR_MAGIC)]) != COLUMNAR_MAGIC:
+        raise ValueError("Not an Astra columnar log segment.")
+    offset = len(COLUMNAR_MAGIC)
+    version, header_len = struct.unpack_from('<HI', data, offset)
+    if version != COLUMNAR_VERSION:
+        raise ValueError(f"Unsupported columnar log version {version}.")
+    offset += struct.calcsize('<HI')
+    columns = bytes(data[offset:offset + header_len]).decode('utf-8').split('\n')
+    dtypes = _columnar_dtypes([c for c in columns if c not in ('Timestamp', 'is_bot', 'confidence_score')])
+    return columns, dtypes, offset + header_len
+
+
+def iter_columnar_blocks(data, offset: int, columns: List[str], dtypes: Dict[str, np.dtype]):
+    """
+    Yields (block offset, end offset, {column: array}) for every complete
+    block from `offset` on; a torn final block (unclean shutdown, or a write
+    in progress) is left out.
+    """
+    row_size = sum(dtypes[c].itemsize for c in columns)
+    while offset + 4 <= len(data):
+        (n_rows,) = struct.unpack_from('<I', data, offset)
+        end = offset + 4 + row_size * n_rows
+        if end > len(data):
+            return
+        arrays, position = {}, offset + 4
+        for column in columns:
+            dtype = dtypes[column]
+            arrays[column] = np.frombuffer(data, dtype=dtype, count=n_rows, offset=position)
+            position += dtype.itemsize * n_rows
+        yield offset, end, arrays
+        offset = end
+
+
+def encode_columnar_header(columns: List[str]) -> bytes:
+    names = '\n'.join(columns).encode('utf-8')
+    return COLUMNAR_MAGIC + struct.pack('<HI', COLUMNAR_VERSION, len(names)) + names
+
+
+def encode_columnar_block(columns: List[str], dtypes: Dict[str, np.dtype], arrays: Dict[str, np.ndarray]) -> bytes:
+    n_rows = len(arrays[columns[0]])
+    return struct.pack('<I', n_rows) + b''.join(np.asarray(arrays[c], dtype=dtypes[c]).tobytes() for c in columns)
+
+
+def read_columnar_segment(path: str) -> pd.DataFrame:
+    """Reads a columnar `.alog` segment back into the same columns as the CSV log."""
+    with open(path, 'rb') as f:
+        data = f.read()
+    try:
+        columns, dtypes, offset = read_columnar_header(data)
+    except ValueError as e:
+        raise ValueError(f"'{path}': {e}")
+
+    chunks: Dict[str, list] = {column: [] for column in columns}
+    for _, _, arrays in iter_columnar_blocks(data, offset, columns, dtypes):
+        for column in columns:
+            chunks[column].append(arrays[column])
+
+    frame = pd.DataFrame({
+        column: np.concatenate(parts) if parts else np.empty(0, dtype=dtypes[column])
+        for column, parts in chunks.items()
+    })
+    frame['Timestamp'] = pd.to_datetime(frame['Timestamp'], unit='s', utc=True).dt.tz_convert(None)
+    frame.insert(2, 'decision', np.where(frame['is_bot'] == 1, 'BLOCK', 'ALLOW'))
+    return frame
+
+
+class PredictionLogSink:
+    """
+    Background writer for prediction records.
+
+    `submit` never blocks: when the bounded queue is full the record is
+    dropped and counted. The writer thread flushes whenever `flush_size`
+    records are pending or `flush_interval` seconds have passed.
+
+    Formats:
+      'csv'       compatibility mode - the live file stays at `log_file` (the
+                  path the dashboard reads) and is renamed to
+                  `<name>.<partition>.csv` when its time partition ends.
+      'columnar'  rows are appended in column blocks to
+                  `<name>.<partition>.alog` segment files.
+
+    `on_rotate`, if given, is called on the writer thread with the path of
+    each segment as it is closed.
+    """
+
+    def __init__(self, log_file: str, feature_columns: List[str], log_format: str = 'csv',
+                 max_queue: int = 100_000, flush_size: int = 1000, flush_interval: float = 1.0,
+                 segment_seconds: int = 3600, on_rotate: Optional[Callable[[str], None]] = None):
+        if log_format not in ('csv', 'columnar'):
+            raise ValueError(f"Unknown log format '{log_format}'. Use 'csv' or 'columnar'.")
+        self.log_file = log_file
+        self.feature_columns = list(feature_columns)
+        self.header = LOG_HEADER_PREFIX + self.feature_columns
+        self.log_format = log_format
+        self.flush_size = max(1, int(flush_size))
+        self.flush_interval = float(flush_interval)
+        self.segment_seconds = max(1, int(segment_seconds))
+        self.on_rotate = on_rotate
+
+        self._queue: queue.Queue = queue.Queue(maxsize=max_queue)
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._partition: Optional[int] = None
+        self._file = None
+
+        # Statistics
+        self.enqueued = 0
+        self.written = 0
+        self.dropped = 0
+        self.flushes = 0
+        self.rotations = 0
+        self.write_errors = 0
+        self._reported_drops = 0
+
+    # --- Lifecycle ---
+    def start(self):
+        os.makedirs(os.path.dirname(self.log_file) or '.', exist_ok=True)
+        self._thread = threading.Thread(target=self._run, name="astra-log-sink", daemon=True)
+        self._thread.start()
+        logger.info(f"Prediction log sink started ({self.log_format}, flush_size={self.flush_size}, "
+                    f"flush_interval={self.flush_interval}s, segment={self.segment_seconds}s).")
+
+    def stop(self, timeout: float = 10.0):
+        """Flushes everything still queued and closes the active segment."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+        logger.info(f"Prediction log sink stopped. {self.stats()}")
+
+    # --- Hot path ---
+    def submit(self, record: dict) -> bool:
+        """Queues a record for writing; returns False (and counts a drop) if the queue is full."""
+        try:
+            self._queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+            return False
+        self.enqueued += 1
+        return True
+
+    def submit_many(self, records: List[dict]) -> int:
+        """Queues several records; returns how many were accepted."""
+        return sum(self.submit(record) for record in records)
+
+    def stats(self) -> dict:
+        return {
+            "format": self.log_format,
+            "queue_depth": self._queue.qsize(),
+            "queue_capacity": self._queue.maxsize,
+            "enqueued": self.enqueued,
+            "written": self.written,
+            "dropped": self.dropped,
+            "flushes": self.flushes,
+            "rotations": self.rotations,
+            "write_errors": self.write_errors,
+            "active_segment": self._active_path(),
+        }
+
+    # --- Writer thread ---
+    def _run(self):
+        pending: List[dict] = []
+        next_flush = time.monotonic() + self.flush_interval
+        while True:
+            timeout = max(0.0, next_flush - time.monotonic())
+            try:
+                pending.append(self._queue.get(timeout=timeout))
+                # Drain whatever else is already waiting without blocking
+                while len(pending) < self.flush_size:
+                    pending.append(self._queue.get_nowait())
+            except queue.Empty:
+                pass
+
+            stopping = self._stop.is_set()
+            if len(pending) >= self.flush_size or time.monotonic() >= next_flush or stopping:
+                if stopping:
+                    while True:
+                        try:
+                            pending.append(self._queue.get_nowait())
+                        except queue.Empty:
+                            break
+                if pending:
+                    self._flush(pending)
+                    pending = []
+                self._report_drops()
+                next_flush = time.monotonic() + self.flush_interval
+                if stopping:
+                    self._close()
+                    return
+
+    def _flush(self, records: List[dict]):
+        try:
+            # Records can straddle a partition boundary; split them by partition
+            start = 0
+            partitions = [self._partition_of(r) for r in records]
+            for i in range(1, len(records) + 1):
+                if i == len(records) or partitions[i] != partitions[start]:
+                    self._ensure_segment(partitions[start])
+                    self._write(records[start:i])
+                    start = i
+            self._file.flush()
+            self.written += len(records)
+            self.flushes += 1
+        except Exception as e:
+            self.write_errors += 1
+            logger.error(f"Error writing to log file: {e}")
+
+    def _report_drops(self):
+        if self.dropped > self._reported_drops:
+            logger.warning(f"Prediction log queue full: dropped {self.dropped - self._reported_drops} "
+                           f"records ({self.dropped} total).")
+            self._reported_drops = self.dropped
+
+    # --- Segments ---
+    def _partition_of(self, record: dict) -> int:
+        epoch = _timestamp_to_epoch(record.get('Timestamp', time.time()))
+        return int(epoch // self.segment_seconds) * self.segment_seconds
+
+    def _segment_path(self, partition: int, suffix: str) -> str:
+        base, _ = os.path.splitext(self.log_file)
+        stamp = datetime.fromtimestamp(partition).strftime('%Y%m%d-%H%M%S')
+        return f"{base}.{stamp}{suffix}"
+
+    def _active_path(self) -> Optional[str]:
+        if self._partition is None:
+            return None
+        if self.log_format == 'csv':
+            return self.log_file
+        return self._segment_path(self._partition, COLUMNAR_SUFFIX)
+
+    def _ensure_segment(self, partition: int):
+        if self._file is not None and partition <= self._partition:
+            return  # Late records stay in the current segment
+        self._close()
+        if self.log_format == 'csv':
+            self._open_csv(partition)
+        else:
+            self._open_columnar(partition)
+        self._partition = partition
+
+    def _open_csv(self, partition: int):
+        if os.path.exists(self.log_file) and os.path.getsize(self.log_file) > 0:
+            existing = self._partition
+            if existing is None:
+                # Live file left by a previous run: its last write tells us its partition
+                existing = int(os.path.getmtime(self.log_file) // self.segment_seconds) * self.segment_seconds
+            if existing < partition:
+                target = self._segment_path(existing, '.csv')
+                suffix = 1
+                while os.path.exists(target):
+                    target = self._segment_path(existing, f'-{suffix}.csv')
+                    suffix += 1
+                os.replace(self.log_file, target)
+                self.rotations += 1
+                self._rotated(target)
+        new_file = not os.path.exists(self.log_file) or os.path.getsize(self.log_file) == 0
+        self._file = open(self.log_file, 'a', newline='')
+        self._csv_writer = csv.DictWriter(self._file, fieldnames=self.header, extrasaction='ignore')
+        if new_file:
+            self._csv_writer.writeheader()
+
+    def _open_columnar(self, partition: int):
+        path = self._segment_path(partition, COLUMNAR_SUFFIX)
+        new_file = not os.path.exists(path) or os.path.getsize(path) == 0
+        self._file = open(path, 'ab')
+        if new_file:
+            self._file.write(encode_columnar_header(['Timestamp', 'is_bot', 'confidence_score'] + self.feature_columns))
+        if self._partition is not None:
+            self.rotations += 1
+            self._rotated(self._segment_path(self._partition, COLUMNAR_SUFFIX))
+
+    def _rotated(self, path: str):
+        if self.on_rotate is None:
+            return
+        try:
+            self.on_rotate(path)
+        except Exception as e:
+            logger.error(f"Segment rotation hook failed for '{path}': {e}")
+
+    def _write(self, records: List[dict]):
+        if self.log_format == 'csv':
+            self._csv_writer.writerows(records)
+            return
+        columns = ['Timestamp', 'is_bot', 'confidence_score'] + self.feature_columns
+        arrays = {column: [_timestamp_to_epoch(r['Timestamp']) for r in records] if column == 'Timestamp'
+                  else [r.get(column, 0) for r in records] for column in columns}
+        self._file.write(encode_columnar_block(columns, _columnar_dtypes(self.feature_columns), arrays))
+
+    def _close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+def list_segments(log_file: str) -> List[str]:
+    """Lists rotated segment files for `log_file`, oldest first (the live CSV is not included)."""
+    base, _ = os.path.splitext(log_file)
+    paths = glob.glob(f"{base}.*.csv") + glob.glob(f"{base}.*{COLUMNAR_SUFFIX}")
+    return sorted(paths)
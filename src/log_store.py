@@ -0,0 +1,547 @@
+# Time-indexed Prediction Log Store for Astra
+# Answers time-range questions ("what was the bot rate between 10:00 and
+# 10:05 yesterday?") over the segmented prediction log without reading all of
+# it. Every segment gets a small sidecar index (`<segment>.idx`): the segment
+# is cut into chunks of about CHUNK_ROWS rows, and each chunk records its byte
+# range, its first and last timestamp and a summary (rows, BLOCKs, confidence
+# histogram). A query skips segments whose time span cannot overlap the range,
+# answers segments and chunks that lie entirely inside it from their
+# summaries, and only reads and parses the chunks straddling its edges.
+#
+# Indexes are built the first time a segment is queried and extended
+# incrementally as it grows, so the live segment is only indexed from where
+# the previous query stopped. `apply_retention` compacts old segments into
+# one columnar file per day and deletes segments past the retention period.
+
+import io
+import json
+import logging
+import mmap
+import os
+import re
+import threading
+import time
+from bisect import bisect_right
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from src.log_sink import (COLUMNAR_SUFFIX, LOG_HEADER_PREFIX, _columnar_dtypes, encode_columnar_block,
+                          encode_columnar_header, iter_columnar_blocks, list_segments, read_columnar_header)
+
+logger = logging.getLogger(__name__)
+
+INDEX_SUFFIX = '.idx'
+INDEX_VERSION = 1
+CHUNK_ROWS = 4096
+CSV_READ_BYTES = 16 << 20
+
+# Ten equal-width confidence bins over [0, 1], as in RollingStats
+CONFIDENCE_BINS = 10
+
+# Records can land in a segment slightly before its partition starts (flush delay)
+LATE_SLACK_SECONDS = 600
+
+# Chunk slots
+_OFFSET, _END, _ROWS, _T_MIN, _T_MAX, _BLOCKED, _HIST = range(7)
+
+_SEGMENT_NAME = re.compile(r'\.(\d{8})-(\d{6}|daily)(?:-\d+)?\.(?:csv|alog)$')
+
+
+def _segment_start(path: str) -> Optional[float]:
+    """Start of a segment's time partition (local time in its file name) as an epoch, if it has one."""
+    match = _SEGMENT_NAME.search(path)
+    if match is None:
+        return None
+    day, clock = match.groups()
+    return datetime.strptime(day + ('000000' if clock == 'daily' else clock), '%Y%m%d%H%M%S').timestamp()
+
+
+def _iso_to_epoch(values: pd.Series) -> np.ndarray:
+    """Naive local ISO timestamps (as the CSV log stores them) to epoch seconds; unparseable ones become NaN."""
+    naive = pd.to_datetime(values, format='ISO8601', errors='coerce')
+    local = (naive - pd.Timestamp(0)).dt.total_seconds().to_numpy()
+    # Shift by each distinct hour's UTC offset rather than converting row by row
+    hours = np.floor(local / 3600)
+    valid = ~np.isnan(hours)
+    epoch = np.full(len(local), np.nan)
+    if valid.any():
+        unique, inverse = np.unique(hours[valid], return_inverse=True)
+        offsets = np.array([h * 3600 - time.mktime(time.gmtime(h * 3600)[:8] + (-1,)) for h in unique])
+        epoch[valid] = local[valid] - offsets[inverse]
+    return epoch
+
+
+def _summarize(offset: int, end: int, epoch: np.ndarray, blocked: np.ndarray, confidence: np.ndarray) -> list:
+    valid = ~np.isnan(epoch)
+    epoch, blocked, confidence = epoch[valid], blocked[valid], confidence[valid]
+    bins = np.minimum((confidence * CONFIDENCE_BINS).astype(np.int64), CONFIDENCE_BINS - 1)
+    return [offset, end, int(len(epoch)),
+            float(epoch.min()) if len(epoch) else None, float(epoch.max()) if len(epoch) else None,
+            int(blocked.sum()), np.bincount(bins, minlength=CONFIDENCE_BINS).tolist()]
+
+
+class SegmentIndex:
+    """Sparse chunk index and summary of one log segment."""
+
+    def __init__(self, path: str, log_format: str, inode: int, columns: List[str], data_offset: int,
+                 indexed_bytes: Optional[int] = None, chunks: Optional[list] = None):
+        self.path = path
+        self.log_format = log_format
+        self.inode = inode
+        self.columns = columns
+        self.data_offset = data_offset
+        self.indexed_bytes = data_offset if indexed_bytes is None else indexed_bytes
+        self.chunks = chunks or []
+        self._summary = None
+
+    @classmethod
+    def open(cls, path: str) -> Optional["SegmentIndex"]:
+        """An empty index for `path`, or None if its file header is not complete yet."""
+        inode = os.stat(path).st_ino
+        with open(path, 'rb') as f:
+            if path.endswith(COLUMNAR_SUFFIX):
+                try:
+                    columns, _, data_offset = read_columnar_header(f.read(64 << 10))
+                except Exception:
+                    return None
+                return cls(path, 'columnar', inode, columns, data_offset)
+            header = f.readline()
+        if not header.endswith(b'\n'):
+            return None
+        return cls(path, 'csv', inode, header.decode('utf-8').strip().split(','), len(header))
+
+    @property
+    def feature_columns(self) -> List[str]:
+        fixed = LOG_HEADER_PREFIX if self.log_format == 'csv' else ['Timestamp', 'is_bot', 'confidence_score']
+        return [c for c in self.columns if c not in fixed]
+
+    def summary(self) -> dict:
+        if self._summary is None:
+            rows = [c for c in self.chunks if c[_ROWS]]
+            self._summary = {
+                'rows': sum(c[_ROWS] for c in rows),
+                'blocked': sum(c[_BLOCKED] for c in rows),
+                't_min': min((c[_T_MIN] for c in rows), default=None),
+                't_max': max((c[_T_MAX] for c in rows), default=None),
+                'confidence_histogram': np.sum([c[_HIST] for c in rows], axis=0).tolist() if rows
+                else [0] * CONFIDENCE_BINS,
+            }
+        return self._summary
+
+    # --- Building ---
+    def extend(self, size: int):
+        """Indexes the complete rows between `indexed_bytes` and `size`."""
+        # Reopen a short last chunk so appended rows merge into it instead of piling up tiny chunks
+        if self.chunks and self.chunks[-1][_ROWS] < CHUNK_ROWS:
+            self.indexed_bytes = self.chunks.pop()[_OFFSET]
+        if self.log_format == 'csv':
+            self._extend_csv(size)
+        else:
+            self._extend_columnar(size)
+        self._summary = None
+
+    def _extend_csv(self, size: int):
+        with open(self.path, 'rb') as f:
+            offset = self.indexed_bytes
+            f.seek(offset)
+            while offset < size:
+                data = f.read(min(CSV_READ_BYTES, size - offset))
+                cut = data.rfind(b'\n') + 1
+                if not data or cut == 0:
+                    break  # Only a partial line left: a write in progress
+                data = data[:cut]
+                frame = pd.read_csv(io.BytesIO(data), header=None, names=self.columns,
+                                    usecols=['Timestamp', 'decision', 'confidence_score'], skip_blank_lines=False)
+                ends = np.flatnonzero(np.frombuffer(data, dtype=np.uint8) == ord('\n')) + 1
+                epoch = _iso_to_epoch(frame['Timestamp'])
+                blocked = (frame['decision'] == 'BLOCK').to_numpy()
+                confidence = pd.to_numeric(frame['confidence_score'], errors='coerce').fillna(0).to_numpy()
+                for first in range(0, len(ends), CHUNK_ROWS):
+                    last = min(first + CHUNK_ROWS, len(ends))
+                    start = offset + (ends[first - 1] if first else 0)
+                    self.chunks.append(_summarize(int(start), int(offset + ends[last - 1]), epoch[first:last],
+                                                  blocked[first:last], confidence[first:last]))
+                offset += cut
+                f.seek(offset)
+            self.indexed_bytes = offset
+
+    def _extend_columnar(self, size: int):
+        with open(self.path, 'rb') as f, mmap.mmap(f.fileno(), size, access=mmap.ACCESS_READ) as data:
+            dtypes = _columnar_dtypes(self.feature_columns)
+            parts, start, arrays = [], self.indexed_bytes, None
+            for _, end, arrays in iter_columnar_blocks(data, self.indexed_bytes, self.columns, dtypes):
+                parts.append(arrays)
+                self.indexed_bytes = end
+                if sum(len(p['Timestamp']) for p in parts) >= CHUNK_ROWS:
+                    self.chunks.append(self._columnar_chunk(start, end, parts))
+                    parts, start = [], end
+            if parts:
+                self.chunks.append(self._columnar_chunk(start, self.indexed_bytes, parts))
+            parts = arrays = None  # Release views into the map before it closes
+
+    @staticmethod
+    def _columnar_chunk(start: int, end: int, parts: List[dict]) -> list:
+        return _summarize(start, end, np.concatenate([p['Timestamp'] for p in parts]),
+                          np.concatenate([p['is_bot'] for p in parts]) == 1,
+                          np.concatenate([p['confidence_score'] for p in parts]))
+
+    # --- Reading ---
+    def read(self, offset: int, end: int, columns: Optional[List[str]] = None) -> pd.DataFrame:
+        """
+        Rows stored in bytes [offset, end), with `epoch` and `blocked` columns
+        added; `columns` limits which log columns are parsed.
+        """
+        if self.log_format == 'csv':
+            with open(self.path, 'rb') as f:
+                f.seek(offset)
+                data = f.read(end - offset)
+            usecols = None if columns is None else sorted(set(columns) | {'Timestamp', 'decision'},
+                                                          key=self.columns.index)
+            frame = pd.read_csv(io.BytesIO(data), header=None, names=self.columns, usecols=usecols)
+            frame['epoch'] = _iso_to_epoch(frame['Timestamp'])
+            frame['blocked'] = (frame['decision'] == 'BLOCK').to_numpy()
+            return frame
+
+        wanted = self.columns if columns is None else [c for c in self.columns if c in set(columns) | {'Timestamp', 'is_bot'}]
+        dtypes = _columnar_dtypes(self.feature_columns)
+        with open(self.path, 'rb') as f, mmap.mmap(f.fileno(), end, access=mmap.ACCESS_READ) as data:
+            parts, arrays = {c: [] for c in wanted}, None
+            for _, _, arrays in iter_columnar_blocks(data, offset, self.columns, dtypes):
+                for c in wanted:
+                    parts[c].append(arrays[c].copy())
+            arrays = None  # Release views into the map before it closes
+        frame = pd.DataFrame({c: np.concatenate(p) if p else np.empty(0, dtype=dtypes[c]) for c, p in parts.items()})
+        frame['epoch'] = frame['Timestamp']
+        frame['blocked'] = (frame['is_bot'] == 1).to_numpy()
+        frame['decision'] = np.where(frame['blocked'], 'BLOCK', 'ALLOW')
+        return frame
+
+    # --- Sidecar ---
+    def to_json(self) -> dict:
+        return {'version': INDEX_VERSION, 'format': self.log_format, 'inode': self.inode, 'columns': self.columns,
+                'data_offset': self.data_offset, 'indexed_bytes': self.indexed_bytes, 'summary': self.summary(),
+                'chunks': self.chunks}
+
+    @classmethod
+    def from_json(cls, path: str, data: dict) -> "SegmentIndex":
+        index = cls(path, data['format'], data['inode'], data['columns'], data['data_offset'],
+                    data['indexed_bytes'], data['chunks'])
+        index._summary = data.get('summary')
+        return index
+
+
+class LogStore:
+    """
+    Range queries, time series and retention over the segments of one
+    prediction log (`log_file` plus its rotated `.csv`/`.alog` segments).
+    """
+
+    def __init__(self, log_file: str, retention_days: float = 0, compact_after_days: float = 0):
+        self.log_file = log_file
+        self.retention_days = retention_days
+        self.compact_after_days = compact_after_days
+        self._indexes: Dict[str, SegmentIndex] = {}
+        self._lock = threading.RLock()
+        self._maintenance: Optional[threading.Thread] = None
+
+    # --- Segments ---
+    def segments(self) -> List[Tuple[str, float, float]]:
+        """(path, earliest possible timestamp, latest possible timestamp) for every segment, oldest first."""
+        paths = list_segments(self.log_file)
+        starts = [_segment_start(p) for p in paths]
+        order = sorted(range(len(paths)), key=lambda i: (starts[i] is not None, starts[i] or 0, paths[i]))
+        known = sorted(start for start in starts if start is not None)
+        segments = []
+        for i in order:
+            if starts[i] is None:
+                segments.append((paths[i], float('-inf'), float('inf')))
+                continue
+            # A segment is closed once a later partition starts, so nothing in it is newer than that
+            later = bisect_right(known, starts[i])
+            upper = known[later] if later < len(known) else float('inf')
+            segments.append((paths[i], starts[i] - LATE_SLACK_SECONDS, upper))
+        if os.path.exists(self.log_file):
+            lower = known[-1] - LATE_SLACK_SECONDS if known else float('-inf')
+            segments.append((self.log_file, lower, float('inf')))
+        return segments
+
+    def index(self, path: str) -> Optional[SegmentIndex]:
+        """The up-to-date index of `path` (None if it is gone or empty), saving it next to rotated segments."""
+        with self._lock:
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                self._indexes.pop(path, None)
+                return None
+            index = self._indexes.get(path) or self._load_sidecar(path) or self._find_renamed(path, stat.st_ino)
+            if index is not None and (index.inode != stat.st_ino or stat.st_size < index.indexed_bytes):
+                index = None  # Replaced or truncated: start over
+            if index is None:
+                index = SegmentIndex.open(path)
+                if index is None:
+                    return None
+            if stat.st_size > index.indexed_bytes:
+                index.extend(stat.st_size)
+                if path != self.log_file:
+                    self._save_sidecar(index)
+            self._indexes[path] = index
+            return index
+
+    def _load_sidecar(self, path: str) -> Optional[SegmentIndex]:
+        try:
+            with open(path + INDEX_SUFFIX) as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if data.get('version') != INDEX_VERSION:
+            return None
+        return SegmentIndex.from_json(path, data)
+
+    def _find_renamed(self, path: str, inode: int) -> Optional[SegmentIndex]:
+        """Reuses the index built for the live CSV when it is rotated (renamed) into `path`."""
+        live = self._indexes.get(self.log_file)
+        if live is None or live.inode != inode:
+            return None
+        del self._indexes[self.log_file]
+        live.path = path
+        return live
+
+    def _save_sidecar(self, index: SegmentIndex):
+        tmp_path = f"{index.path}{INDEX_SUFFIX}.{os.getpid()}.tmp"
+        try:
+            with open(tmp_path, 'w') as f:
+                json.dump(index.to_json(), f, separators=(',', ':'))
+            os.replace(tmp_path, index.path + INDEX_SUFFIX)
+        except OSError as e:
+            logger.warning(f"Could not save the log index for '{index.path}': {e}")
+
+    # --- Queries ---
+    def _scan(self, start: float, end: float, on_summary, on_rows, columns=('confidence_score',)) -> dict:
+        """
+        Feeds every segment or chunk entirely inside [start, end) to
+        `on_summary(summary, t_min, t_max)` and the in-range rows of every
+        straddling chunk to `on_rows(frame)`. Returns what was touched.
+        """
+        touched = {'segments_scanned': 0, 'segments_from_summary': 0, 'chunks_from_summary': 0,
+                   'chunks_read': 0, 'rows_read': 0}
+        for path, lower, upper in self.segments():
+            if upper <= start or lower >= end:
+                continue
+            index = self.index(path)
+            if index is None:
+                continue
+            summary = index.summary()
+            if not summary['rows'] or summary['t_max'] < start or summary['t_min'] >= end:
+                continue
+            touched['segments_scanned'] += 1
+            if summary['t_min'] >= start and summary['t_max'] < end and on_summary(summary):
+                touched['segments_from_summary'] += 1
+                continue
+            for chunk in index.chunks:
+                if not chunk[_ROWS] or chunk[_T_MAX] < start or chunk[_T_MIN] >= end:
+                    continue
+                if chunk[_T_MIN] >= start and chunk[_T_MAX] < end and on_summary(
+                        {'rows': chunk[_ROWS], 'blocked': chunk[_BLOCKED], 't_min': chunk[_T_MIN],
+                         't_max': chunk[_T_MAX], 'confidence_histogram': chunk[_HIST]}):
+                    touched['chunks_from_summary'] += 1
+                    continue
+                frame = index.read(chunk[_OFFSET], chunk[_END], list(columns))
+                touched['chunks_read'] += 1
+                touched['rows_read'] += len(frame)
+                on_rows(frame[(frame['epoch'] >= start) & (frame['epoch'] < end)])
+        return touched
+
+    def query(self, start: float, end: float) -> dict:
+        """Requests, BLOCKs, block rate and confidence histogram for [start, end) (epoch seconds)."""
+        totals = {'requests': 0, 'blocked': 0, 'hist': np.zeros(CONFIDENCE_BINS, dtype=np.int64)}
+
+        def add_summary(summary):
+            totals['requests'] += summary['rows']
+            totals['blocked'] += summary['blocked']
+            totals['hist'] += summary['confidence_histogram']
+            return True
+
+        def add_rows(frame):
+            bins = np.minimum((frame['confidence_score'].to_numpy() * CONFIDENCE_BINS).astype(np.int64),
+                              CONFIDENCE_BINS - 1)
+            totals['requests'] += len(frame)
+            totals['blocked'] += int(frame['blocked'].sum())
+            totals['hist'] += np.bincount(bins, minlength=CONFIDENCE_BINS)
+
+        touched = self._scan(start, end, add_summary, add_rows)
+        requests, blocked = totals['requests'], totals['blocked']
+        return {
+            'start': start,
+            'end': end,
+            'requests': requests,
+            'blocked': blocked,
+            'allowed': requests - blocked,
+            'block_rate': round(blocked / requests, 4) if requests else 0.0,
+            'confidence_histogram': totals['hist'].tolist(),
+            **touched,
+        }
+
+    def timeseries(self, start: float, end: float, bucket_seconds: float) -> List[dict]:
+        """Requests and block rate per `bucket_seconds` bucket over [start, end)."""
+        n_buckets = int(np.ceil((end - start) / bucket_seconds))
+        if n_buckets <= 0:
+            return []
+        if n_buckets > 10_000:
+            raise ValueError(f"{n_buckets} buckets requested; use a larger bucket (at most 10000 per query).")
+        requests = np.zeros(n_buckets, dtype=np.int64)
+        blocked = np.zeros(n_buckets, dtype=np.int64)
+
+        def add_summary(summary):
+            first = int((summary['t_min'] - start) // bucket_seconds)
+            if first != int((summary['t_max'] - start) // bucket_seconds):
+                return False  # Spans buckets: fall back to its rows
+            requests[first] += summary['rows']
+            blocked[first] += summary['blocked']
+            return True
+
+        def add_rows(frame):
+            buckets = ((frame['epoch'].to_numpy() - start) // bucket_seconds).astype(np.int64)
+            requests[:] += np.bincount(buckets, minlength=n_buckets)[:n_buckets]
+            blocked[:] += np.bincount(buckets, weights=frame['blocked'].to_numpy(), minlength=n_buckets)[
+                :n_buckets].astype(np.int64)
+
+        self._scan(start, end, add_summary, add_rows, columns=())
+        return [{'start': start + i * bucket_seconds, 'requests': int(r), 'blocked': int(b),
+                 'block_rate': round(b / r, 4) if r else 0.0} for i, (r, b) in enumerate(zip(requests, blocked))]
+
+    def rows(self, start: float, end: float, limit: int = 100) -> pd.DataFrame:
+        """The newest `limit` logged rows in [start, end), newest first, with local `Timestamp`s."""
+        frames, found = [], 0
+        for path, lower, upper in reversed(self.segments()):
+            if found >= limit:
+                break
+            if upper <= start or lower >= end:
+                continue
+            index = self.index(path)
+            if index is None:
+                continue
+            for chunk in reversed(index.chunks):
+                if found >= limit:
+                    break
+                if not chunk[_ROWS] or chunk[_T_MAX] < start or chunk[_T_MIN] >= end:
+                    continue
+                frame = index.read(chunk[_OFFSET], chunk[_END])
+                frame = frame[(frame['epoch'] >= start) & (frame['epoch'] < end)]
+                frames.append(frame)
+                found += len(frame)
+        if not frames:
+            return pd.DataFrame()
+        result = pd.concat(frames, ignore_index=True).sort_values('epoch', ascending=False).head(limit)
+        result['Timestamp'] = [datetime.fromtimestamp(e) for e in result['epoch']]
+        return result.reset_index(drop=True)
+
+    # --- Retention ---
+    def maintain_async(self, closed_path: Optional[str] = None):
+        """Indexes a just-closed segment and applies retention on a background thread (skipped if one is running)."""
+        if self._maintenance is not None and self._maintenance.is_alive():
+            return
+
+        def run():
+            try:
+                if closed_path:
+                    self.index(closed_path)
+                if self.retention_days or self.compact_after_days:
+                    self.apply_retention()
+            except Exception as e:
+                logger.error(f"Prediction log maintenance failed: {e}")
+
+        self._maintenance = threading.Thread(target=run, name="astra-log-maintenance", daemon=True)
+        self._maintenance.start()
+
+    def apply_retention(self, now: Optional[float] = None) -> dict:
+        """
+        Deletes segments whose newest row is older than `retention_days`, then
+        rewrites segments older than `compact_after_days` as one columnar
+        segment per day. The live file and the newest segment are never touched.
+        """
+        now = time.time() if now is None else now
+        result = {'deleted_segments': 0, 'compacted_days': 0, 'compacted_segments': 0}
+        with self._lock:
+            closed = [path for path, _, _ in self.segments() if path != self.log_file][:-1]
+
+            if self.retention_days:
+                cutoff = now - self.retention_days * 86400
+                for path in closed:
+                    index = self.index(path)
+                    t_max = index.summary()['t_max'] if index is not None else None
+                    if t_max is not None and t_max < cutoff:
+                        self._remove(path)
+                        result['deleted_segments'] += 1
+                closed = [path for path in closed if os.path.exists(path)]
+
+            if self.compact_after_days:
+                cutoff = now - self.compact_after_days * 86400
+                days: Dict[str, List[str]] = {}
+                for path in closed:
+                    index = self.index(path)
+                    match = _SEGMENT_NAME.search(path)
+                    if index is not None and match and index.summary()['t_max'] is not None \
+                            and index.summary()['t_max'] < cutoff:
+                        days.setdefault(match.group(1), []).append(path)
+                for day, paths in sorted(days.items()):
+                    if len(paths) == 1 and paths[0].endswith(f'-daily{COLUMNAR_SUFFIX}'):
+                        continue  # Already compacted
+                    if self._compact_day(day, paths):
+                        result['compacted_days'] += 1
+                        result['compacted_segments'] += len(paths)
+        if any(result.values()):
+            logger.info(f"Prediction log retention: {result}")
+        return result
+
+    def _compact_day(self, day: str, paths: List[str]) -> bool:
+        indexes = [self.index(path) for path in paths]
+        features = indexes[0].feature_columns
+        if any(index.feature_columns != features for index in indexes):
+            logger.warning(f"Not compacting {day}: its segments were logged with different feature columns.")
+            return False
+        frame = pd.concat([index.read(index.data_offset, index.indexed_bytes) for index in indexes],
+                          ignore_index=True).sort_values('epoch', kind='stable')
+        frame['Timestamp'] = frame['epoch']
+        frame['is_bot'] = frame['blocked'].astype(np.uint8)
+
+        base, _ = os.path.splitext(self.log_file)
+        target = f"{base}.{day}-daily{COLUMNAR_SUFFIX}"
+        columns = ['Timestamp', 'is_bot', 'confidence_score'] + features
+        dtypes = _columnar_dtypes(features)
+        tmp_path = f"{target}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(encode_columnar_header(columns))
+            for first in range(0, len(frame), CHUNK_ROWS):
+                part = frame.iloc[first:first + CHUNK_ROWS]
+                f.write(encode_columnar_block(columns, dtypes, {c: part[c].to_numpy() for c in columns}))
+        os.replace(tmp_path, target)
+        for path in paths:
+            if path != target:
+                self._remove(path)
+        self._indexes.pop(target, None)
+        self.index(target)
+        return True
+
+    def _remove(self, path: str):
+        for file_path in (path, path + INDEX_SUFFIX):
+            try:
+                os.remove(file_path)
+            except FileNotFoundError:
+                pass
+        self._indexes.pop(path, None)
+
+
+def parse_time(value: str) -> float:
+    """Epoch seconds from an epoch number, an ISO timestamp (local time if naive) or a relative '-15m'/'-2h'/'-7d'."""
+    value = value.strip()
+    match = re.fullmatch(r'-(\d+(?:\.\d+)?)([smhd])', value)
+    if match:
+        seconds = float(match.group(1)) * {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}[match.group(2)]
+        return (datetime.now() - timedelta(seconds=seconds)).timestamp()
+    try:
+        return float(value)
+    except ValueError:
+        return datetime.fromisoformat(value).timestamp()
@@ -0,0 +1,187 @@
+# Incremental Prediction Log Reader for the Astra Dashboard
+# Tails the prediction log from a remembered byte offset, so each refresh only
+# parses rows appended since the last one. Follows rotation (the live file
+# being renamed and recreated) and truncation. In the columnar format there is
+# no fixed live file: the newest `.alog` segment is followed block by block.
+
+import csv
+import io
+import os
+import struct
+from collections import deque
+from datetime import datetime
+from typing import List, Optional
+
+import numpy as np
+
+from src.log_sink import COLUMNAR_SUFFIX, iter_columnar_blocks, list_segments, read_columnar_header
+
+
+class LogTailer:
+    """
+    Keeps running counters over every row ever read and a bounded ring
+    buffer of the most recent rows for display.
+    """
+
+    def __init__(self, path: str, max_rows: int = 1000, log_format: str = 'csv'):
+        if log_format not in ('csv', 'columnar'):
+            raise ValueError(f"Unknown log format '{log_format}'. Use 'csv' or 'columnar'.")
+        self.path = path
+        self.log_format = log_format
+        self.recent = deque(maxlen=max_rows)
+
+        # Running aggregates
+        self.total_requests = 0
+        self.bots_detected = 0
+        self.humans_allowed = 0
+        self.bad_rows = 0
+        self.rotations = 0
+
+        self._file = None
+        self._inode: Optional[int] = None
+        self._offset = 0
+        self._header: Optional[List[str]] = None
+        self._partial = b''
+        self._columns: Optional[List[str]] = None
+        self._dtypes = None
+
+    @property
+    def bot_percentage(self) -> float:
+        return (self.bots_detected / self.total_requests) * 100 if self.total_requests > 0 else 0.0
+
+    def poll(self) -> int:
+        """Reads rows appended since the last call; returns how many were added."""
+        path = self._live_path()
+        if path is None:
+            return 0
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            return 0
+
+        added = 0
+        if self._file is not None and stat.st_ino != self._inode:
+            # Rotated: finish the old file through the handle we still hold
+            added += self._read_new()
+            self._close()
+            self.rotations += 1
+        if self._file is not None and stat.st_size < self._offset:
+            # Truncated in place: start over from the top
+            self._close()
+        if self._file is None:
+            try:
+                self._file = open(path, 'rb')
+            except FileNotFoundError:
+                return added
+            self._inode = os.fstat(self._file.fileno()).st_ino
+            self._offset = 0
+            self._header = None
+            self._partial = b''
+            self._columns = None
+        return added + self._read_new()
+
+    def latest(self, n: int = 20) -> List[dict]:
+        """Most recent `n` rows, newest first."""
+        rows = list(self.recent)[-n:]
+        rows.sort(key=lambda row: row['Timestamp'], reverse=True)
+        return rows
+
+    def close(self):
+        self._close()
+
+    # --- Internals ---
+    def _live_path(self) -> Optional[str]:
+        if self.log_format == 'csv':
+            return self.path
+        # Segment names carry their start time, so the newest sorts last; compacted days are never live
+        segments = [p for p in list_segments(self.path)
+                    if p.endswith(COLUMNAR_SUFFIX) and not p.endswith(f'-daily{COLUMNAR_SUFFIX}')]
+        return segments[-1] if segments else None
+
+    def _read_new(self) -> int:
+        if self.log_format == 'columnar':
+            return self._read_blocks()
+        self._file.seek(self._offset)
+        chunk = self._file.read()
+        if not chunk:
+            return 0
+        self._offset += len(chunk)
+        data = self._partial + chunk
+        # Keep an unterminated last line for the next poll
+        cut = data.rfind(b'\n') + 1
+        self._partial = data[cut:]
+        if cut == 0:
+            return 0
+
+        lines = io.StringIO(data[:cut].decode('utf-8', errors='replace'), newline='')
+        reader = csv.reader(lines)
+        if self._header is None:
+            self._header = next(reader, None)
+        added = 0
+        for values in reader:
+            if values and self._add_row(values):
+                added += 1
+        return added
+
+    def _read_blocks(self) -> int:
+        self._file.seek(self._offset)
+        data = self._file.read()
+        start = 0
+        if self._columns is None:
+            try:
+                columns, dtypes, start = read_columnar_header(data)
+            except (ValueError, struct.error):
+                return 0  # Header not fully written yet
+            if start > len(data):
+                return 0
+            self._columns, self._dtypes = columns, dtypes
+        added, end = 0, start
+        # A torn final block is left for the next poll
+        for _, end, arrays in iter_columnar_blocks(data, start, self._columns, self._dtypes):
+            added += self._add_block(arrays)
+        self._offset += end
+        return added
+
+    def _add_block(self, arrays: dict) -> int:
+        n_rows = len(arrays['is_bot'])
+        blocked = int(np.count_nonzero(arrays['is_bot'] == 1))
+        self.total_requests += n_rows
+        self.bots_detected += blocked
+        self.humans_allowed += n_rows - blocked
+
+        # Only the rows the ring buffer can still hold are turned into dicts
+        keep = min(n_rows, self.recent.maxlen)
+        values = {column: arrays[column][n_rows - keep:].tolist() for column in self._columns}
+        for i in range(keep):
+            row = {column: values[column][i] for column in self._columns}
+            row['Timestamp'] = datetime.fromtimestamp(row['Timestamp'])
+            row['decision'] = 'BLOCK' if row['is_bot'] == 1 else 'ALLOW'
+            self.recent.append(row)
+        return n_rows
+
+    def _add_row(self, values: List[str]) -> bool:
+        if len(values) != len(self._header):
+            self.bad_rows += 1
+            return False
+        row = dict(zip(self._header, values))
+        try:
+            row['Timestamp'] = datetime.fromisoformat(row['Timestamp'])
+            row['is_bot'] = int(row['is_bot'])
+            row['confidence_score'] = float(row['confidence_score'])
+        except (KeyError, ValueError):
+            self.bad_rows += 1
+            return False
+
+        self.total_requests += 1
+        if row.get('decision') == 'BLOCK':
+            self.bots_detected += 1
+        else:
+            self.humans_allowed += 1
+        self.recent.append(row)
+        return True
+
+    def _close(self):
+        if self._file is not None:
+            self._file.close()
+        self._file = None
+        self._inode = None
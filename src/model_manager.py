@@ -0,0 +1,324 @@
+# Hot Model Reload and Shadow Scoring for Astra
+# Holds the active scorer behind a single reference that is swapped atomically:
+# a batch captures the reference once when it starts, so in-flight requests
+# finish on the model they began with while new batches see the new one.
+# Replacement models are loaded and warmed on a background thread, either on
+# request or when the watched model file changes. A candidate can instead be
+# run in shadow on a sampled fraction of traffic; shadow batches are queued to
+# their own thread and never slow down or alter live responses.
+
+import asyncio
+import logging
+import os
+import queue
+import random
+import threading
+import time
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+
+class SklearnScorer:
+    """Pickled StandardScaler + RandomForest behind the same interface as CompiledForest."""
+
+    def __init__(self, model, scaler, feature_columns: List[str], metadata: Optional[dict] = None):
+        self.model = model
+        self.scaler = scaler
+        self.feature_columns = list(feature_columns)
+        self.classes_ = model.classes_
+        self.metadata = dict(metadata or {})
+
+    def rows_to_matrix(self, rows: List[dict]) -> np.ndarray:
+        """Scaled feature matrix, built through a DataFrame so the scaler sees its fitted column names."""
+        return self.scaler.transform(pd.DataFrame(rows, columns=self.feature_columns))
+
+    def raw_to_matrix(self, X: np.ndarray) -> np.ndarray:
+        """Scaled feature matrix from a raw one in model column order."""
+        return self.scaler.transform(pd.DataFrame(X, columns=self.feature_columns))
+
+    def predict_proba(self, X: np.ndarray) -> np.ndarray:
+        return self.model.predict_proba(X)
+
+    def predict_rows(self, rows: List[dict]) -> np.ndarray:
+        return self.predict_proba(self.rows_to_matrix(rows))
+
+
+def _file_signature(path: str):
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return stat.st_ino, stat.st_size, stat.st_mtime_ns
+
+
+def _labels(scorer, proba: np.ndarray) -> np.ndarray:
+    return scorer.classes_[proba.argmax(axis=1)]
+
+
+class ModelManager:
+    """
+    Active model, optional shadow candidate, and the file watcher that reloads them.
+
+    `load_fn(path)` returns a scorer (an object with `rows_to_matrix`,
+    `raw_to_matrix`, `predict_proba`, `predict_rows`, `classes_`, `feature_columns` and
+    `metadata`); `path=None` means the default model location.
+    """
+
+    def __init__(self, load_fn: Callable[[Optional[str]], Any], watch_path: Optional[str] = None,
+                 poll_interval: float = 2.0, shadow_fraction: float = 0.0, shadow_queue: int = 1000,
+                 required_columns: Optional[List[str]] = None):
+        self.load_fn = load_fn
+        self.watch_path = watch_path
+        self.poll_interval = poll_interval
+        self.shadow_fraction = min(max(float(shadow_fraction), 0.0), 1.0)
+        self.required_columns = set(required_columns) if required_columns is not None else None
+
+        self.active = None
+        self.active_info: Dict[str, Any] = {}
+        self.candidate = None
+        self.candidate_info: Dict[str, Any] = {}
+
+        self._reload_lock: Optional[asyncio.Lock] = None
+        self._watcher: Optional[asyncio.Task] = None
+        self._signature = None
+        self._shadow_queue: "queue.Queue" = queue.Queue(maxsize=shadow_queue)
+        self._shadow_thread: Optional[threading.Thread] = None
+        self._stats_lock = threading.Lock()
+
+        # Statistics
+        self.generation = 0
+        self.reloads = 0
+        self.reload_failures = 0
+        self.last_error: Optional[str] = None
+        self._reset_shadow_stats()
+
+    # --- Lifecycle ---
+    def load(self, scorer=None):
+        """
+        Loads and warms the initial model synchronously (startup). `scorer`
+        is an already loaded one to start with instead, e.g. the model a
+        pre-fork parent loaded once for all its workers.
+        """
+        scorer = self._prepare(None, scorer)
+        self._note_loaded(None)
+        self._activate(scorer, source='startup')
+
+    async def start(self):
+        """Starts the shadow worker and, if enabled, the model file watcher."""
+        self._reload_lock = asyncio.Lock()
+        self._shadow_thread = threading.Thread(target=self._run_shadow, name="astra-shadow", daemon=True)
+        self._shadow_thread.start()
+        if self.watch_path and self.poll_interval > 0:
+            self._watcher = asyncio.create_task(self._watch())
+            logger.info(f"Watching '{self.watch_path}' for new models every {self.poll_interval}s "
+                        f"({'shadow' if self.shadow_fraction > 0 else 'swap'} on change).")
+
+    async def stop(self):
+        if self._watcher:
+            self._watcher.cancel()
+            try:
+                await self._watcher
+            except asyncio.CancelledError:
+                pass
+        if self._shadow_thread:
+            try:
+                self._shadow_queue.put(None, timeout=1.0)
+            except queue.Full:
+                pass  # Daemon thread; it goes away with the process
+            self._shadow_thread.join(timeout=5.0)
+
+    # --- Reload / promotion ---
+    async def reload(self, path: Optional[str] = None, shadow: bool = False) -> dict:
+        """
+        Loads and warms the model at `path` off the event loop, then either
+        swaps it in or (with `shadow`) installs it as the shadow candidate.
+        On failure the active model is left untouched and the error re-raised.
+        """
+        async with self._reload_lock:
+            try:
+                scorer = await asyncio.to_thread(self._prepare, path)
+            except Exception as e:
+                self.reload_failures += 1
+                self.last_error = f"{type(e).__name__}: {e}"
+                logger.error(f"Model reload from '{path or self.watch_path}' failed: {e}")
+                raise
+            self._note_loaded(path)
+            if shadow:
+                self._set_candidate(scorer, source=path or self.watch_path)
+            else:
+                self._activate(scorer, source=path or self.watch_path)
+        return self.stats()
+
+    def promote(self) -> dict:
+        """Makes the shadow candidate the active model."""
+        if self.candidate is None:
+            raise ValueError("There is no shadow candidate to promote.")
+        scorer, info = self.candidate, self.candidate_info
+        self.candidate, self.candidate_info = None, {}
+        self._activate(scorer, source=info.get('source'))
+        return self.stats()
+
+    def clear_shadow(self):
+        self.candidate, self.candidate_info = None, {}
+
+    # --- Shadow scoring (called from inference worker threads) ---
+    def shadow(self, rows: List[dict], live_scorer):
+        """
+        Queues a sample of a scored batch for the candidate; never blocks.
+        Agreement is measured against `live_scorer` itself, not against
+        whatever answered the live request (a cache or pre-filter, say).
+        """
+        if self.candidate is None or self.shadow_fraction <= 0 or not rows:
+            return
+        picked = [i for i in range(len(rows)) if random.random() < self.shadow_fraction]
+        if not picked:
+            return
+        try:
+            self._shadow_queue.put_nowait(([rows[i] for i in picked], live_scorer))
+            with self._stats_lock:
+                self.shadow_sampled += len(picked)
+        except queue.Full:
+            with self._stats_lock:
+                self.shadow_dropped += len(picked)
+
+    def stats(self) -> dict:
+        with self._stats_lock:
+            scored = self.shadow_scored
+            shadow = {
+                'candidate': self.candidate_info or None,
+                'fraction': self.shadow_fraction,
+                'sampled': self.shadow_sampled,
+                'scored': scored,
+                'dropped': self.shadow_dropped,
+                'errors': self.shadow_errors,
+                'agreement_rate': round(self.shadow_agreements / scored, 4) if scored else None,
+                'mean_abs_confidence_delta': round(self.shadow_confidence_delta / scored, 4) if scored else None,
+                'live_us_per_row': round(self.shadow_live_seconds / scored * 1e6, 2) if scored else None,
+                'candidate_us_per_row': round(self.shadow_candidate_seconds / scored * 1e6, 2) if scored else None,
+                'latency_delta_us_per_row': round(
+                    (self.shadow_candidate_seconds - self.shadow_live_seconds) / scored * 1e6, 2) if scored else None,
+            }
+        return {
+            'active': self.active_info,
+            'generation': self.generation,
+            'reloads': self.reloads,
+            'reload_failures': self.reload_failures,
+            'last_error': self.last_error,
+            'watching': self.watch_path if self._watcher is not None and not self._watcher.done() else None,
+            'shadow': shadow,
+        }
+
+    # --- Internals ---
+    def _prepare(self, path: Optional[str], scorer=None):
+        """Loads (unless given `scorer`), validates and warms a scorer; runs off the event loop."""
+        start = time.perf_counter()
+        if scorer is None:
+            scorer = self.load_fn(path)
+        if self.required_columns is not None and not set(scorer.feature_columns) <= self.required_columns:
+            missing = sorted(set(scorer.feature_columns) - self.required_columns)
+            raise ValueError(f"Model expects features the API does not accept: {missing}")
+        scorer.predict_rows([dict.fromkeys(scorer.feature_columns, 0.0)])
+        scorer.metadata.setdefault('load_ms', round((time.perf_counter() - start) * 1000, 2))
+        return scorer
+
+    def _note_loaded(self, path: Optional[str]):
+        """
+        Records the watched file as it is after a load from it. Loading may
+        rewrite it (load_or_compile refreshing a stale bundle), and the
+        watcher must not take that write for a new model.
+        """
+        if self.watch_path and (path is None or path == self.watch_path):
+            self._signature = _file_signature(self.watch_path)
+
+    def _describe(self, scorer, source: Optional[str]) -> dict:
+        return {
+            'model_version': scorer.metadata.get('model_version'),
+            'type': type(scorer).__name__,
+            'source': source,
+            'loaded_at': datetime.now().isoformat(),
+            'load_ms': scorer.metadata.get('load_ms'),
+        }
+
+    def _activate(self, scorer, source: Optional[str]):
+        info = self._describe(scorer, source)
+        # A single reference assignment: batches already running keep the old scorer
+        self.active, self.active_info = scorer, info
+        self.generation += 1
+        if source != 'startup':
+            self.reloads += 1
+        logger.info(f"Active model is now generation {self.generation} "
+                    f"(version {info['model_version']}, from {source}).")
+
+    def _set_candidate(self, scorer, source: Optional[str]):
+        with self._stats_lock:
+            self._reset_shadow_stats()
+        self.candidate, self.candidate_info = scorer, self._describe(scorer, source)
+        logger.info(f"Shadow candidate version {self.candidate_info['model_version']} installed "
+                    f"on {self.shadow_fraction:.0%} of traffic.")
+
+    def _reset_shadow_stats(self):
+        self.shadow_sampled = 0
+        self.shadow_scored = 0
+        self.shadow_dropped = 0
+        self.shadow_errors = 0
+        self.shadow_agreements = 0
+        self.shadow_confidence_delta = 0.0
+        self.shadow_live_seconds = 0.0
+        self.shadow_candidate_seconds = 0.0
+
+    async def _watch(self):
+        """Polls the model file; a change is loaded once the file has stopped changing for one interval."""
+        pending = None
+        while True:
+            await asyncio.sleep(self.poll_interval)
+            signature = _file_signature(self.watch_path)
+            if signature is None or signature == self._signature:
+                pending = None
+                continue
+            if signature != pending:
+                pending = signature  # Still being written, or just appeared: wait for it to settle
+                continue
+            self._signature, pending = signature, None
+            logger.info(f"Detected a new model at '{self.watch_path}'.")
+            try:
+                await self.reload(shadow=self.shadow_fraction > 0)
+            except Exception:
+                pass  # Logged and counted by reload(); the active model keeps serving
+
+    def _run_shadow(self):
+        while True:
+            item = self._shadow_queue.get()
+            if item is None:
+                return
+            candidate = self.candidate
+            if candidate is None:
+                continue
+            rows, live_scorer = item
+            try:
+                # Both models score the same rows on this thread so the latencies are comparable
+                start = time.perf_counter()
+                live_proba = live_scorer.predict_rows(rows)
+                live_seconds = time.perf_counter() - start
+                start = time.perf_counter()
+                candidate_proba = candidate.predict_rows(rows)
+                candidate_seconds = time.perf_counter() - start
+                agreements = int((_labels(candidate, candidate_proba) == _labels(live_scorer, live_proba)).sum())
+                confidence_delta = float(np.abs(candidate_proba.max(axis=1) - live_proba.max(axis=1)).sum())
+            except Exception as e:
+                with self._stats_lock:
+                    self.shadow_errors += len(rows)
+                logger.error(f"Shadow scoring failed: {e}")
+                continue
+            with self._stats_lock:
+                if candidate is not self.candidate:
+                    continue  # Candidate replaced while scoring; these numbers belong to the old one
+                self.shadow_scored += len(rows)
+                self.shadow_agreements += agreements
+                self.shadow_confidence_delta += confidence_delta
+                self.shadow_live_seconds += live_seconds
+                self.shadow_candidate_seconds += candidate_seconds
@@ -0,0 +1,444 @@
+# Pre-fork Multi-worker Server for Astra
+# One uvicorn process is one GIL, so a single process serves all Tatkal traffic
+# on one core. Here the parent imports the API, loads the model once and binds
+# the listening socket, then forks N workers that inherit all of it
+# copy-on-write (gc.freeze keeps the collector from dirtying the shared pages;
+# the compiled bundle is a read-only file mapping in every worker anyway).
+# The kernel spreads connections over the workers accepting on that socket.
+#
+# The parent stays single-threaded and only supervises: a worker that dies is
+# forked again into its slot, with exponential backoff if it keeps crashing.
+# Each slot owns a region of an anonymous shared-memory arena. The worker
+# records its rolling traffic statistics there directly and publishes its
+# Prometheus counters and histograms there every second, so /stats and
+# /metrics served by any worker cover the whole server. The counters behind
+# /watchdog/stats and /logging/stats are published the same way, into a small
+# table after the slots. The watchdog's per-IP counters have their own region
+# after that, written the same way, so rate limits apply to the server rather
+# than to each worker.
+# Prediction records are forwarded over a queue to one log-writer child, which
+# keeps the log file single-writer (rotation, indexes and retention work as
+# with one process).
+#
+# Run from the repository root:
+#   python -m src.prefork --workers 4 --port 3000
+
+import argparse
+import gc
+import json
+import logging
+import mmap
+import multiprocessing
+import os
+import queue
+import signal
+import socket
+import threading
+import time
+from typing import Dict, List, Optional
+
+import numpy as np
+import uvicorn
+
+from src import backend
+from src.stats import ClusterStats, RollingStats
+from src.watchdog import SharedIPCounters
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_WORKERS = int(os.environ.get('ASTRA_WORKERS', 0)) or os.cpu_count() or 1
+
+# Bytes each worker may use for its published metrics (JSON)
+METRICS_CAPACITY = 1 << 20
+METRICS_PUBLISH_INTERVAL = 1.0
+
+# Counters behind /watchdog/stats and /logging/stats that any worker reports summed over the server
+WORKER_TOTALS = ('watchdog.total_sessions', 'watchdog.bots_detected', 'watchdog.alerts_triggered',
+                 'watchdog.rejected_requests', 'watchdog.evicted_ips', 'logging.enqueued', 'logging.dropped')
+
+# Entries in the watchdog's shared per-IP table (96 bytes per worker each): client IPs counted at once
+WATCHDOG_CAPACITY = int(os.environ.get('ASTRA_WATCHDOG_SHARED_IPS', 1 << 15))
+
+# A worker that exits sooner than this after starting counts as a crash loop
+MIN_HEALTHY_SECONDS = 5.0
+MAX_RESTART_DELAY = 30.0
+
+_ALIGN = 64
+_METRICS_HEADER = 16  # int64 sequence number (odd while being written) + int64 payload length
+
+
+def _align(size: int) -> int:
+    return (size + _ALIGN - 1) // _ALIGN * _ALIGN
+
+
+class SharedArena:
+    """
+    Anonymous shared memory created before forking, one slot per worker:
+    the worker's RollingStats counters followed by its latest metrics dump.
+    After the slots come the published WORKER_TOTALS, one row per worker, and
+    then the watchdog's per-IP table, with a row per worker in each entry.
+    Each slot and row has a single writer (its worker); any process may read it.
+    """
+
+    def __init__(self, slots: int, metrics_capacity: int = METRICS_CAPACITY,
+                 watchdog_capacity: int = WATCHDOG_CAPACITY):
+        self.slots = int(slots)
+        self.metrics_capacity = int(metrics_capacity)
+        self.watchdog_capacity = int(watchdog_capacity)
+        self._stats_bytes = _align(RollingStats.nbytes())
+        self._slot_bytes = _align(self._stats_bytes + _METRICS_HEADER + self.metrics_capacity)
+        totals_offset = self._slot_bytes * self.slots
+        watchdog_offset = totals_offset + _align(self.slots * len(WORKER_TOTALS) * np.dtype(np.int64).itemsize)
+        watchdog_bytes = SharedIPCounters.nbytes(self.slots, self.watchdog_capacity)
+        # fd -1: anonymous MAP_SHARED memory, inherited by every forked child
+        self._mmap = mmap.mmap(-1, watchdog_offset + watchdog_bytes)
+        view = memoryview(self._mmap)
+        self.totals = np.ndarray((self.slots, len(WORKER_TOTALS)), dtype=np.int64, buffer=self._mmap,
+                                 offset=totals_offset)
+        self.watchdog_buffer = view[watchdog_offset:]
+        self.stats = [RollingStats(buffer=view[self._slot_bytes * slot:self._slot_bytes * slot + self._stats_bytes])
+                      for slot in range(self.slots)]
+        self._headers = [np.ndarray(2, dtype=np.int64, buffer=self._mmap,
+                                    offset=self._slot_bytes * slot + self._stats_bytes)
+                         for slot in range(self.slots)]
+
+    def _payload_offset(self, slot: int) -> int:
+        return self._slot_bytes * slot + self._stats_bytes + _METRICS_HEADER
+
+    def publish_metrics(self, slot: int, payload: bytes) -> bool:
+        """Replaces the slot's metrics dump; False if it does not fit."""
+        if len(payload) > self.metrics_capacity:
+            return False
+        header = self._headers[slot]
+        start = self._payload_offset(slot)
+        header[0] += 1  # Odd: readers retry until the write is done
+        self._mmap[start:start + len(payload)] = payload
+        header[1] = len(payload)
+        header[0] += 1
+        return True
+
+    def read_metrics(self, slot: int, attempts: int = 5) -> Optional[dict]:
+        """The slot's latest metrics dump, or None if it has none (or it is being rewritten on every attempt)."""
+        header = self._headers[slot]
+        start = self._payload_offset(slot)
+        for _ in range(attempts):
+            sequence = int(header[0])
+            if sequence % 2:
+                time.sleep(0)
+                continue
+            length = int(header[1])
+            payload = self._mmap[start:start + length]
+            if int(header[0]) == sequence:
+                return json.loads(payload) if length else None
+        return None
+
+
+class ForwardingLogSink:
+    """
+    A worker's prediction log sink: the same interface as PredictionLogSink,
+    but records are handed to the log-writer process. `submit` never blocks;
+    when the queue is full the records are dropped and counted.
+    """
+
+    def __init__(self, log_queue):
+        self._queue = log_queue
+        self.enqueued = 0
+        self.dropped = 0
+
+    def start(self):
+        pass
+
+    def stop(self, timeout: float = 10.0):
+        """Waits for queued records to reach the pipe to the log writer."""
+        self._queue.close()
+        self._queue.join_thread()
+
+    def submit(self, record: dict) -> bool:
+        return self.submit_many([record]) == 1
+
+    def submit_many(self, records: List[dict]) -> int:
+        try:
+            self._queue.put_nowait(records)
+        except queue.Full:
+            self.dropped += len(records)
+            return 0
+        self.enqueued += len(records)
+        return len(records)
+
+    def stats(self) -> dict:
+        try:
+            depth = self._queue.qsize()
+        except NotImplementedError:  # macOS has no sem_getvalue
+            depth = 0
+        return {
+            "mode": "forwarded",
+            "enqueued": self.enqueued,
+            "dropped": self.dropped,
+            "queue_depth": depth,
+            "writer": "log-writer process",
+        }
+
+
+class WorkerContext:
+    """What a forked worker inherits from the parent; the API finds it at `backend.worker`."""
+
+    def __init__(self, server: "PreforkServer", slot: int):
+        self.slot = slot
+        self.workers = server.workers
+        self.scorer = server.scorer
+        self.arena = server.arena
+        self.log_sink = ForwardingLogSink(server.log_queue)
+        self.stats = ClusterStats(self.arena.stats[slot], self.arena.stats, started_at=server.started_at)
+        self.watchdog = SharedIPCounters(self.arena.watchdog_buffer, self.workers, slot, self.arena.watchdog_capacity)
+        # Counters published by this slot's previous worker, if it was restarted: carried forward so
+        # server-wide totals do not go backwards
+        self._inherited = self.arena.read_metrics(slot)
+        self._inherited_totals = self.arena.totals[slot].copy()
+        self._dump = None
+        self._totals = None
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start_publishing(self, dump, totals=None):
+        """
+        Publishes `dump(merge)` (a MetricsRegistry.dump) to this worker's slot
+        every second, and with it `totals()`, this worker's own counters by
+        WORKER_TOTALS name.
+        """
+        self._dump, self._totals = dump, totals
+        self._thread = threading.Thread(target=self._run, name="astra-metrics-publisher", daemon=True)
+        self._thread.start()
+
+    def stop_publishing(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5.0)
+        self.publish()
+
+    def publish(self):
+        if self._totals is not None:
+            own = self._totals()
+            self.arena.totals[self.slot] = self._inherited_totals + [own.get(name, 0) for name in WORKER_TOTALS]
+        if self._dump is None:
+            return
+        payload = json.dumps(self._dump([self._inherited])).encode()
+        if not self.arena.publish_metrics(self.slot, payload):
+            logger.warning(f"Worker {self.slot}: metrics ({len(payload)} bytes) exceed the shared slot; not published.")
+
+    def peer_metrics(self) -> List[dict]:
+        """The other workers' latest dumps, plus this slot's inherited one, to merge into a /metrics scrape."""
+        peers = [self.arena.read_metrics(slot) for slot in range(self.workers) if slot != self.slot]
+        return [dumped for dumped in peers + [self._inherited] if dumped]
+
+    def server_totals(self, own: Dict[str, int]) -> Dict[str, int]:
+        """
+        `own` (this worker's live counters by WORKER_TOTALS name) plus the
+        other workers' as of their last publish, and those of this slot's
+        previous worker if it was restarted.
+        """
+        others = self.arena.totals.sum(axis=0) - self.arena.totals[self.slot] + self._inherited_totals
+        return {name: int(others[i]) + own.get(name, 0) for i, name in enumerate(WORKER_TOTALS)}
+
+    def _run(self):
+        while not self._stop.wait(METRICS_PUBLISH_INTERVAL):
+            try:
+                self.publish()
+            except Exception as e:
+                logger.error(f"Worker {self.slot}: publishing metrics failed: {e}")
+
+
+class PreforkServer:
+    """Binds, preloads, forks `workers` API processes plus a log writer, and keeps them running."""
+
+    def __init__(self, host: str = '127.0.0.1', port: int = 3000, workers: int = DEFAULT_WORKERS,
+                 backlog: int = 2048, graceful_timeout: float = 30.0, log_level: str = 'info'):
+        self.host = host
+        self.port = int(port)
+        self.workers = max(1, int(workers))
+        self.backlog = backlog
+        self.graceful_timeout = graceful_timeout
+        self.log_level = log_level
+
+        self.socket: Optional[socket.socket] = None
+        self.scorer = None
+        self.arena: Optional[SharedArena] = None
+        self.log_queue = None
+        self.started_at = time.time()
+
+        self._pids: Dict[int, int] = {}          # pid -> slot (-1 is the log writer)
+        self._started: Dict[int, float] = {}     # slot -> monotonic start time
+        self._failures: Dict[int, int] = {}      # slot -> consecutive quick exits
+        self._restart_at: Dict[int, float] = {}  # slot -> when to fork it again
+        self._stopping = False
+        self.restarts = 0
+
+    # --- Parent ---
+    def run(self) -> int:
+        self.socket = self._bind()
+        boot_start = time.perf_counter()
+        try:
+            self.scorer = backend._load_scorer()
+        except FileNotFoundError as e:
+            logger.error(f"No model to preload ({e}); each worker will try to load one itself.")
+        self.arena = SharedArena(self.workers)
+        self.log_queue = multiprocessing.get_context('fork').Queue(maxsize=backend.LOG_QUEUE_SIZE)
+        # Everything allocated so far is shared with the workers; keep the collector off those pages
+        gc.collect()
+        gc.freeze()
+        logger.info(f"Pre-fork parent {os.getpid()} ready in {(time.perf_counter() - boot_start) * 1000:.0f} ms "
+                    f"(RSS {backend._rss_mb():.1f} MB); forking {self.workers} workers on {self.host}:{self.port}.")
+
+        signal.signal(signal.SIGTERM, self._on_stop_signal)
+        signal.signal(signal.SIGINT, self._on_stop_signal)
+        self._spawn(-1)
+        for slot in range(self.workers):
+            self._spawn(slot)
+
+        while not self._stopping:
+            self._reap()
+            now = time.monotonic()
+            for slot, when in list(self._restart_at.items()):
+                if when <= now:
+                    del self._restart_at[slot]
+                    self.restarts += 1
+                    self._spawn(slot)
+            time.sleep(0.2)
+        self._shutdown()
+        return 0
+
+    def _bind(self) -> socket.socket:
+        family = socket.AF_INET6 if ':' in self.host else socket.AF_INET
+        sock = socket.socket(family, socket.SOCK_STREAM)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        sock.bind((self.host, self.port))
+        sock.listen(self.backlog)
+        sock.set_inheritable(True)
+        return sock
+
+    def _on_stop_signal(self, signum, frame):
+        self._stopping = True
+
+    def _spawn(self, slot: int):
+        pid = os.fork()
+        if pid == 0:
+            code = 1
+            try:
+                signal.signal(signal.SIGTERM, signal.SIG_DFL)
+                signal.signal(signal.SIGINT, signal.SIG_DFL)
+                if slot < 0:
+                    self._run_log_writer()
+                else:
+                    self._run_worker(slot)
+                code = 0
+            except Exception:
+                logger.exception(f"{'Log writer' if slot < 0 else f'Worker {slot}'} failed.")
+            finally:
+                os._exit(code)
+        self._pids[pid] = slot
+        self._started[slot] = time.monotonic()
+
+    def _reap(self):
+        while True:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                return
+            if pid == 0:
+                return
+            slot = self._pids.pop(pid, None)
+            if slot is None:
+                continue
+            name = 'Log writer' if slot < 0 else f'Worker {slot}'
+            code = os.waitstatus_to_exitcode(status)
+            if self._stopping:
+                continue
+            lived = time.monotonic() - self._started.get(slot, 0.0)
+            self._failures[slot] = self._failures.get(slot, 0) + 1 if lived < MIN_HEALTHY_SECONDS else 0
+            delay = min(MAX_RESTART_DELAY, 0.5 * 2 ** (self._failures[slot] - 1)) if self._failures[slot] else 0.0
+            logger.warning(f"{name} (pid {pid}) exited with {code} after {lived:.1f}s; restarting in {delay:.1f}s.")
+            self._restart_at[slot] = time.monotonic() + delay
+
+    def _shutdown(self):
+        """Stops the workers gracefully (SIGKILL after `graceful_timeout`), then drains and stops the log writer."""
+        logger.info("Shutting down pre-fork server...")
+        writer = [pid for pid, slot in self._pids.items() if slot < 0]
+        self._signal_and_wait([pid for pid, slot in self._pids.items() if slot >= 0], self.graceful_timeout)
+        # Workers have exited, so every record they logged is in the queue: the writer drains it, then stops
+        self._signal_and_wait(writer, self.graceful_timeout)
+        self.socket.close()
+
+    def _signal_and_wait(self, pids: List[int], timeout: float):
+        for pid in pids:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+        deadline = time.monotonic() + timeout
+        remaining = set(pids)
+        while remaining and time.monotonic() < deadline:
+            for pid in list(remaining):
+                try:
+                    done, _ = os.waitpid(pid, os.WNOHANG)
+                except ChildProcessError:
+                    done = pid
+                if done:
+                    remaining.discard(pid)
+                    self._pids.pop(pid, None)
+            time.sleep(0.05)
+        for pid in remaining:
+            logger.warning(f"Process {pid} did not stop within {timeout:.0f}s; killing it.")
+            try:
+                os.kill(pid, signal.SIGKILL)
+                os.waitpid(pid, 0)
+            except (ProcessLookupError, ChildProcessError):
+                pass
+
+    # --- Children ---
+    def _run_worker(self, slot: int):
+        backend.worker = WorkerContext(self, slot)
+        config = uvicorn.Config(backend.app, log_level=self.log_level, access_log=False,
+                                timeout_graceful_shutdown=self.graceful_timeout)
+        uvicorn.Server(config).run(sockets=[self.socket])
+
+    def _run_log_writer(self):
+        """Writes every worker's prediction records through one PredictionLogSink until SIGTERM."""
+        self.socket.close()
+        # Ctrl-C reaches the whole process group; the writer only stops once the workers are gone
+        signal.signal(signal.SIGINT, signal.SIG_IGN)
+        stopping = threading.Event()
+        signal.signal(signal.SIGTERM, lambda signum, frame: stopping.set())
+        if self.scorer is None:
+            # Without a model the workers score (and log) nothing; idle rather than crash-loop
+            logger.error("Log writer: no model loaded, so there are no feature columns to log.")
+            stopping.wait()
+            return
+        sink = backend.create_log_sink(self.scorer.feature_columns)
+        sink.start()
+        if backend.LOG_RETENTION_DAYS or backend.LOG_COMPACT_AFTER_DAYS:
+            backend.log_store.maintain_async()
+        while True:
+            try:
+                sink.submit_many(self.log_queue.get(timeout=0.5))
+            except queue.Empty:
+                if stopping.is_set():
+                    break
+        sink.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve the Astra API from several pre-forked worker processes.")
+    parser.add_argument('--host', default='127.0.0.1', help="Interface to listen on.")
+    parser.add_argument('--port', type=int, default=3000, help="Port to listen on.")
+    parser.add_argument('--workers', type=int, default=DEFAULT_WORKERS,
+                        help="API worker processes (default: ASTRA_WORKERS, else one per CPU).")
+    parser.add_argument('--graceful-timeout', type=float, default=30.0,
+                        help="Seconds workers get to finish in-flight requests on shutdown.")
+    parser.add_argument('--log-level', default='info', help="uvicorn log level.")
+    args = parser.parse_args()
+    server = PreforkServer(host=args.host, port=args.port, workers=args.workers,
+                           graceful_timeout=args.graceful_timeout, log_level=args.log_level)
+    raise SystemExit(server.run())
+
+
+if __name__ == "__main__":
+    main()
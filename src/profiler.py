@@ -0,0 +1,91 @@
+# Sampling Profiler for Astra
+# A background thread that periodically snapshots every thread's Python stack
+# (sys._current_frames) and counts identical stacks. Off by default; when it
+# runs, the request path itself does no extra work, only the sampler thread
+# does. The result is in "folded" format (one `frame;frame;frame count` line
+# per stack), ready for flamegraph.pl or speedscope.
+
+import sys
+import threading
+import time
+from collections import Counter
+from typing import Optional
+
+
+class SamplingProfiler:
+    def __init__(self, max_stacks: int = 10_000, max_depth: int = 64):
+        self.max_stacks = max_stacks
+        self.max_depth = max_depth
+        self.interval = 0.005
+        self._stacks: Counter = Counter()
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+        self.samples = 0
+        self.dropped = 0
+        self.started_at: Optional[float] = None
+        self.stops_at: Optional[float] = None
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self, interval_ms: float = 5.0, duration: Optional[float] = None):
+        """Starts sampling every `interval_ms`, optionally stopping by itself after `duration` seconds."""
+        if self.running:
+            raise RuntimeError("The profiler is already running.")
+        self.interval = max(interval_ms, 0.5) / 1000
+        with self._lock:
+            self._stacks.clear()
+            self.samples = self.dropped = 0
+        self.started_at = time.time()
+        self.stops_at = self.started_at + duration if duration else None
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="astra-profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout=5.0)
+
+    def folded(self, limit: Optional[int] = None) -> str:
+        with self._lock:
+            stacks = self._stacks.most_common(limit)
+        return ''.join(f"{stack} {count}\n" for stack, count in stacks)
+
+    def stats(self) -> dict:
+        return {
+            'running': self.running,
+            'interval_ms': round(self.interval * 1000, 3),
+            'samples': self.samples,
+            'distinct_stacks': len(self._stacks),
+            'dropped_stacks': self.dropped,
+            'started_at': self.started_at,
+            'stops_at': self.stops_at,
+        }
+
+    def _run(self):
+        own_id = threading.get_ident()
+        names = {}
+        while not self._stop.wait(self.interval):
+            if self.stops_at is not None and time.time() >= self.stops_at:
+                break
+            frames = sys._current_frames()
+            with self._lock:
+                for thread_id, frame in frames.items():
+                    if thread_id == own_id:
+                        continue
+                    parts = []
+                    while frame is not None and len(parts) < self.max_depth:
+                        code = frame.f_code
+                        parts.append(f"{code.co_name} ({code.co_filename.rsplit('/', 1)[-1]})")
+                        frame = frame.f_back
+                    if thread_id not in names:
+                        names = {t.ident: t.name for t in threading.enumerate()}
+                    stack = ';'.join([names.get(thread_id, str(thread_id))] + parts[::-1])
+                    if stack in self._stacks or len(self._stacks) < self.max_stacks:
+                        self._stacks[stack] += 1
+                    else:
+                        self.dropped += 1
+                self.samples += 1
@@ -0,0 +1,211 @@
+# Progressive Scoring for Astra
+# Scores a session stage by stage while the booking flow is still running,
+# so a bot can be blocked at login or journey planning instead of after the
+# captcha. Each stage has its own compiled forest, trained by train_model.py
+# on the features known once that stage has finished (a prefix of the flow),
+# and its own block threshold, chosen on validation data for high precision:
+# an early BLOCK has to be as trustworthy as the full model's.
+#
+# Per-session partial state (features seen so far and the latest verdict)
+# lives in a bounded TTL + LRU store (the shared TTLCache) keyed by a digest of
+# the client's session id; an expired session is treated as never seen. A BLOCK is sticky: later updates for that session are answered from the
+# store without scoring again.
+
+import hashlib
+import logging
+import os
+import time
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from src.engine import MODELS_DIR, CompiledForest
+from src.ttl_cache import TTLCache
+
+logger = logging.getLogger(__name__)
+
+STAGE_DIR = os.path.join(MODELS_DIR, 'stages')
+
+# Booking-flow stages in order, with the features each one adds. The session-wide counters
+# (mouse movements, scrolls, idle time, session duration) only exist once the flow is complete,
+# so they are left to the full model behind /predict.
+STAGES = [
+    ('login', ['login_duration', 'account_age_days']),
+    ('journey_planner', ['journey_planner_duration']),
+    ('train_selection', ['train_selection_duration']),
+    ('form_fill', ['form_fill_duration', 'form_corrections', 'avg_keystroke_interval_ms', 'backspace_count']),
+]
+STAGE_NAMES = [name for name, _ in STAGES]
+STAGE_FEATURES = frozenset(column for _, added in STAGES for column in added)
+
+# Early blocks must be at least this precise on validation data
+DEFAULT_TARGET_PRECISION = 0.99
+
+_DIGEST_SIZE = 16
+
+# Entry slots
+_FEATURES, _VERDICT = range(2)
+
+
+def stage_columns(stage: str) -> List[str]:
+    """Every feature known once `stage` has finished, in flow order."""
+    columns = []
+    for name, added in STAGES:
+        columns.extend(added)
+        if name == stage:
+            return columns
+    raise ValueError(f"Unknown stage '{stage}'. Stages: {', '.join(STAGE_NAMES)}.")
+
+
+def stage_bundle_path(stage: str, directory: str = STAGE_DIR) -> str:
+    return os.path.join(directory, f'stage_{stage}.bundle')
+
+
+def block_threshold(bot_proba: np.ndarray, y: np.ndarray, target_precision: float = DEFAULT_TARGET_PRECISION,
+                    floor: float = 0.5) -> Optional[float]:
+    """
+    The lowest bot probability (not below `floor`) at which blocking every
+    session scoring at or above it keeps precision >= `target_precision`,
+    or None if no threshold is that precise.
+    """
+    order = np.argsort(-bot_proba, kind='stable')
+    scores = bot_proba[order]
+    true_positives = np.cumsum(np.asarray(y)[order] == 1)
+    precision = true_positives / np.arange(1, len(scores) + 1)
+    # Only cut at the end of a run of tied scores: a threshold blocks all of them or none
+    cut = np.append(scores[1:] != scores[:-1], True)
+    candidates = np.flatnonzero(cut & (precision >= target_precision) & (scores >= floor))
+    if not len(candidates):
+        return None
+    return float(scores[candidates[-1]])
+
+
+def load_stage_models(directory: str = STAGE_DIR) -> Dict[str, CompiledForest]:
+    """Maps whichever stage bundles exist in `directory`; stages without one are scored by nobody."""
+    models = {}
+    for stage in STAGE_NAMES:
+        path = stage_bundle_path(stage, directory)
+        if not os.path.exists(path):
+            continue
+        engine = CompiledForest.load(path)
+        if engine.feature_columns != stage_columns(stage):
+            logger.warning(f"Stage bundle '{path}' was trained on other features; ignoring it.")
+            continue
+        models[stage] = engine
+    return models
+
+
+def _session_key(session_id: str) -> bytes:
+    return hashlib.blake2b(session_id.encode('utf-8'), digest_size=_DIGEST_SIZE, person=b'astra-stage').digest()
+
+
+class PartialSessionStore(TTLCache):
+    """
+    Bounded TTL + LRU map from session id to the session's partial state,
+    a (features, verdict) pair. Used from the event loop only, so it takes
+    no locks.
+    """
+
+    def __init__(self, max_entries: int = 100_000, ttl: float = 900.0):
+        super().__init__(max(1, int(max_entries)), ttl)
+
+    def get(self, session_id: str, now: Optional[float] = None) -> Optional[tuple]:
+        return super().get(_session_key(session_id), now)
+
+    def put(self, session_id: str, features: Dict[str, float], verdict: dict, now: Optional[float] = None):
+        """Stores the session's state and restarts its TTL."""
+        super().put(_session_key(session_id), (features, verdict), now)
+
+    def pop(self, session_id: str, now: Optional[float] = None) -> Optional[tuple]:
+        return super().pop(_session_key(session_id), now)
+
+    def discard(self, session_id: str):
+        super().discard(_session_key(session_id))
+
+
+class ProgressiveScorer:
+    """Updates a session's verdict as each stage's timings arrive."""
+
+    def __init__(self, models: Dict[str, CompiledForest], store: PartialSessionStore):
+        self.models = models
+        self.store = store
+        self._bot_index = {stage: list(engine.classes_).index(1) for stage, engine in models.items()}
+        self.updates = 0
+        self.sticky = 0
+        self.blocks = {stage: 0 for stage in STAGE_NAMES}
+        self.score_seconds = 0.0
+
+    @property
+    def stages(self) -> List[str]:
+        return [stage for stage in STAGE_NAMES if stage in self.models]
+
+    def update(self, session_id: str, stage: str, features: Dict[str, float], now: Optional[float] = None) -> dict:
+        """
+        Merges `features` into the session's state and scores it with the
+        `stage` model. Raises ValueError for an unknown or unmodelled stage,
+        for features no stage uses, and when features of the stage (or an
+        earlier one) are still missing.
+        """
+        if stage not in self.models:
+            raise ValueError(f"No model for stage '{stage}'. Available stages: {', '.join(self.stages) or 'none'}.")
+        unknown = sorted(set(features) - STAGE_FEATURES)
+        if unknown:
+            raise ValueError(f"Features not used by any stage: {', '.join(unknown)}.")
+
+        entry = self.store.get(session_id, now)
+        if entry is not None and entry[_VERDICT]['decision'] == 'BLOCK':
+            self.updates += 1
+            self.sticky += 1
+            return {**entry[_VERDICT], "sticky": True}
+
+        merged = {**entry[_FEATURES], **features} if entry is not None else dict(features)
+        columns = stage_columns(stage)
+        missing = [c for c in columns if c not in merged]
+        if missing:
+            raise ValueError(f"Missing features for stage '{stage}': {', '.join(missing)}.")
+
+        self.updates += 1
+        engine = self.models[stage]
+        start = time.perf_counter()
+        bot_probability = float(engine.predict_rows([merged])[0, self._bot_index[stage]])
+        self.score_seconds += time.perf_counter() - start
+
+        threshold = engine.metadata.get('block_threshold')
+        blocked = threshold is not None and bot_probability >= threshold
+        verdict = {
+            "stage": stage,
+            "decision": "BLOCK" if blocked else "CONTINUE",
+            "is_bot": int(blocked),
+            "bot_probability": bot_probability,
+            "block_threshold": threshold,
+            "sticky": False,
+        }
+        if blocked:
+            self.blocks[stage] += 1
+        self.store.put(session_id, merged, verdict, now)
+        return verdict
+
+    def finish(self, session_id: str, now: Optional[float] = None) -> Optional[dict]:
+        """
+        Drops the session's partial state (its flow is complete) and returns
+        its last verdict, or None if the session is unknown or has expired.
+        """
+        entry = self.store.pop(session_id, now)
+        return entry[_VERDICT] if entry is not None else None
+
+    def stats(self) -> dict:
+        scored = self.updates - self.sticky
+        return {
+            'stages': {stage: {'model_version': self.models[stage].metadata.get('model_version'),
+                               'block_threshold': self.models[stage].metadata.get('block_threshold'),
+                               'blocks': self.blocks[stage]}
+                       for stage in self.stages},
+            'sessions': len(self.store),
+            'max_sessions': self.store.max_entries,
+            'ttl_seconds': self.store.ttl,
+            'updates': self.updates,
+            'sticky_blocks': self.sticky,
+            'expired': self.store.expired,
+            'evictions': self.store.evictions,
+            'avg_score_us': round(self.score_seconds / scored * 1e6, 2) if scored else None,
+        }
@@ -1,15 +1,22 @@
 # Standalone Traffic Simulation Script for Astra API
 # This script generates continuous human and bot data and sends it to the
 # backend API to simulate real-world traffic for testing and demonstration.
+# With --load-test it becomes an open-loop load generator that reports
+# latency percentiles, throughput and error rates as JSON.
 
 import requests
 import json
 import random
 import time
 import logging
+import argparse
+import asyncio
+import math
+from collections import Counter
 
 # --- Configuration ---
 API_URL = "http://127.0.0.1:3000/predict"
+BATCH_API_URL = "http://127.0.0.1:3000/predict/batch"
 SIMULATION_SPEED = 1.0  # requests per second
 BOT_RATIO = 0.3  # 30% of traffic will be bots
 
@@ -19,55 +26,217 @@ logger = logging.getLogger(__name__)
 
 
 # --- Data Generation Functions ---
-def generate_human_data():
-    """Generates a dictionary of realistic, human-like behavioral data."""
+# Per-feature distributions of each class: ('uniform', low, high) rounded to two decimals, or
+# ('int', low, high) inclusive. scripts/generate_sessions.py draws vectorized from the same tables.
+HUMAN_PROFILE = {
+    "login_duration": ('uniform', 7.0, 12.0),
+    "journey_planner_duration": ('uniform', 10.0, 20.0),
+    "train_selection_duration": ('uniform', 8.0, 15.0),
+    "form_fill_duration": ('uniform', 25.0, 50.0),
+    "captcha_duration": ('uniform', 5.0, 12.0),
+    "session_duration": ('uniform', 60.0, 120.0),
+    "mouse_movements": ('int', 3000, 9000),
+    "page_scrolls": ('int', 5, 20),
+    "form_corrections": ('int', 1, 5),
+    "avg_keystroke_interval_ms": ('uniform', 100, 250),
+    "mouse_idle_time_sec": ('uniform', 2.0, 10.0),
+    "backspace_count": ('int', 1, 8),
+    "account_age_days": ('int', 50, 1000),
+}
+BOT_PROFILE = {
+    "login_duration": ('uniform', 0.1, 0.5),
+    "journey_planner_duration": ('uniform', 0.2, 0.8),
+    "train_selection_duration": ('uniform', 0.1, 0.5),
+    "form_fill_duration": ('uniform', 0.5, 1.5),
+    "captcha_duration": ('uniform', 1.0, 2.5),
+    "session_duration": ('uniform', 2.0, 5.0),
+    "mouse_movements": ('int', 10, 100),
+    "page_scrolls": ('int', 0, 2),
+    "form_corrections": ('int', 0, 0),
+    "avg_keystroke_interval_ms": ('uniform', 5, 20),
+    "mouse_idle_time_sec": ('uniform', 0.0, 0.5),
+    "backspace_count": ('int', 0, 0),
+    "account_age_days": ('int', 0, 5),
+}
+
+def _draw(profile):
     return {
-      "login_duration": round(random.uniform(7.0, 12.0), 2),
-      "journey_planner_duration": round(random.uniform(10.0, 20.0), 2),
-      "train_selection_duration": round(random.uniform(8.0, 15.0), 2),
-      "form_fill_duration": round(random.uniform(25.0, 50.0), 2),
-      "captcha_duration": round(random.uniform(5.0, 12.0), 2),
-      "session_duration": round(random.uniform(60.0, 120.0), 2),
-      "mouse_movements": random.randint(3000, 9000),
-      "page_scrolls": random.randint(5, 20),
-      "form_corrections": random.randint(1, 5),
-      "avg_keystroke_interval_ms": round(random.uniform(100, 250), 2),
-      "mouse_idle_time_sec": round(random.uniform(2.0, 10.0), 2),
-      "backspace_count": random.randint(1, 8),
-      "account_age_days": random.randint(50, 1000)
+        feature: round(random.uniform(low, high), 2) if kind == 'uniform' else random.randint(low, high)
+        for feature, (kind, low, high) in profile.items()
     }
 
+def generate_human_data():
+    """Generates a dictionary of realistic, human-like behavioral data."""
+    return _draw(HUMAN_PROFILE)
+
 def generate_bot_data():
     """Generates a dictionary of efficient, bot-like behavioral data."""
+    return _draw(BOT_PROFILE)
+
+def generate_session(bot_ratio=BOT_RATIO):
+    """Returns (session_data, session_type) with `bot_ratio` of sessions being bots."""
+    if random.random() < bot_ratio:
+        return generate_bot_data(), "Bot"
+    return generate_human_data(), "Human"
+
+
+# --- Load Test Mode ---
+class LatencyHistogram:
+    """
+    HDR-style latency histogram: log-linear buckets (SUB_BUCKETS per power of
+    two, in microseconds) give ~1% relative precision from 1us to hours with
+    constant memory and O(1) recording.
+    """
+
+    SUB_BUCKETS = 128
+
+    def __init__(self):
+        self.counts = Counter()
+        self.total = 0
+        self.max_us = 0
+        self.sum_us = 0
+
+    def _index(self, value_us):
+        if value_us < self.SUB_BUCKETS:
+            return value_us
+        shift = value_us.bit_length() - self.SUB_BUCKETS.bit_length()
+        return (shift + 1) * self.SUB_BUCKETS + (value_us >> shift) - self.SUB_BUCKETS
+
+    def _upper_bound(self, index):
+        if index < self.SUB_BUCKETS:
+            return index
+        shift = index // self.SUB_BUCKETS - 1
+        return ((index % self.SUB_BUCKETS + self.SUB_BUCKETS + 1) << shift) - 1
+
+    def record(self, seconds):
+        value_us = max(0, int(seconds * 1_000_000))
+        self.counts[self._index(value_us)] += 1
+        self.total += 1
+        self.sum_us += value_us
+        self.max_us = max(self.max_us, value_us)
+
+    def percentile(self, q):
+        """Latency in ms at quantile q (0..1), reported as the bucket's upper bound."""
+        if self.total == 0:
+            return None
+        target = max(1, math.ceil(q * self.total))
+        seen = 0
+        for index in sorted(self.counts):
+            seen += self.counts[index]
+            if seen >= target:
+                return round(min(self._upper_bound(index), self.max_us) / 1000, 3)
+        return round(self.max_us / 1000, 3)
+
+    def summary(self):
+        return {
+            "p50": self.percentile(0.50),
+            "p90": self.percentile(0.90),
+            "p95": self.percentile(0.95),
+            "p99": self.percentile(0.99),
+            "p999": self.percentile(0.999),
+            "max": round(self.max_us / 1000, 3) if self.total else None,
+            "mean": round(self.sum_us / self.total / 1000, 3) if self.total else None,
+        }
+
+
+def offered_rate(profile, elapsed, duration, rps, spike_multiplier):
+    """
+    Target requests/second at `elapsed` seconds into the run.
+    'steady' is flat; 'tatkal' idles at `rps`, jumps to `rps * spike_multiplier`
+    at the 20% mark (booking window opens) and decays back over the next 30%.
+    """
+    if profile == 'steady':
+        return rps
+    opening, decay = 0.2 * duration, 0.3 * duration
+    if elapsed < opening:
+        return rps
+    since_opening = elapsed - opening
+    if since_opening < decay:
+        return rps + rps * (spike_multiplier - 1) * math.exp(-3.0 * since_opening / decay)
+    return rps
+
+
+async def run_load_test(url, rps, duration, profile='steady', spike_multiplier=10.0, batch_size=1,
+                        max_in_flight=1000, bot_ratio=BOT_RATIO, timeout=10.0):
+    """
+    Open-loop load generator: requests are sent on schedule whether or not
+    earlier ones have returned, and latency is measured from the scheduled
+    send time so a slow server cannot hide its own queueing (no coordinated
+    omission). One pooled keep-alive client is shared by all requests.
+    """
+    import httpx
+
+    # httpx logs every request at INFO; that would swamp the console and the generator
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+    histogram = LatencyHistogram()
+    status_codes = Counter()
+    errors = Counter()
+    in_flight = set()
+    sent = skipped = 0
+
+    async def send(client, scheduled, payload):
+        try:
+            response = await client.post(url, json=payload)
+            status_codes[response.status_code] += 1
+            if response.status_code == 200:
+                histogram.record(loop.time() - scheduled)
+        except httpx.HTTPError as e:
+            errors[type(e).__name__] += 1
+
+    loop = asyncio.get_running_loop()
+    limits = httpx.Limits(max_connections=max_in_flight, max_keepalive_connections=max_in_flight)
+    async with httpx.AsyncClient(limits=limits, timeout=timeout) as client:
+        start = loop.time()
+        next_send = start
+        while next_send - start < duration:
+            now = loop.time()
+            if next_send > now:
+                await asyncio.sleep(next_send - now)
+            # Fire every request that is due; at high rates several share one wakeup
+            while next_send <= loop.time() and next_send - start < duration:
+                if len(in_flight) >= max_in_flight:
+                    skipped += 1  # Generator saturated; counted as an error, never silently delayed
+                else:
+                    if batch_size > 1:
+                        payload = [generate_session(bot_ratio)[0] for _ in range(batch_size)]
+                    else:
+                        payload = generate_session(bot_ratio)[0]
+                    task = asyncio.create_task(send(client, next_send, payload))
+                    in_flight.add(task)
+                    task.add_done_callback(in_flight.discard)
+                    sent += 1
+                next_send += 1.0 / offered_rate(profile, next_send - start, duration, rps, spike_multiplier)
+        if in_flight:
+            await asyncio.gather(*in_flight)
+        elapsed = loop.time() - start
+
+    ok = status_codes.get(200, 0)
+    failed = sent - ok + skipped
     return {
-      "login_duration": round(random.uniform(0.1, 0.5), 2),
-      "journey_planner_duration": round(random.uniform(0.2, 0.8), 2),
-      "train_selection_duration": round(random.uniform(0.1, 0.5), 2),
-      "form_fill_duration": round(random.uniform(0.5, 1.5), 2),
-      "captcha_duration": round(random.uniform(1.0, 2.5), 2),
-      "session_duration": round(random.uniform(2.0, 5.0), 2),
-      "mouse_movements": random.randint(10, 100),
-      "page_scrolls": random.randint(0, 2),
-      "form_corrections": 0,
-      "avg_keystroke_interval_ms": round(random.uniform(5, 20), 2),
-      "mouse_idle_time_sec": round(random.uniform(0.0, 0.5), 2),
-      "backspace_count": 0,
-      "account_age_days": random.randint(0, 5)
+        "config": {
+            "url": url, "target_rps": rps, "duration_s": duration, "profile": profile,
+            "spike_multiplier": spike_multiplier if profile == 'tatkal' else None,
+            "batch_size": batch_size, "max_in_flight": max_in_flight, "bot_ratio": bot_ratio,
+        },
+        "requests": {"sent": sent, "ok": ok, "skipped_generator_saturated": skipped},
+        "status_codes": {str(code): count for code, count in sorted(status_codes.items())},
+        "errors": dict(errors),
+        "error_rate": round(failed / (sent + skipped), 4) if sent + skipped else 0.0,
+        "elapsed_s": round(elapsed, 3),
+        "throughput_rps": round(ok / elapsed, 2) if elapsed else 0.0,
+        "sessions_per_second": round(ok * batch_size / elapsed, 2) if elapsed else 0.0,
+        "latency_ms": histogram.summary(),
     }
 
-# --- Main Execution Loop ---
-if __name__ == "__main__":
+
+def run_simulation():
+    """Original demo mode: one session per second, logged as it goes."""
     logger.info("Starting Astra Traffic Simulation. Press Ctrl+C to stop.")
     
     while True:
         try:
             # Decide whether to generate a bot or human session
-            if random.random() < BOT_RATIO:
-                session_data = generate_bot_data()
-                session_type = "Bot"
-            else:
-                session_data = generate_human_data()
-                session_type = "Human"
+            session_data, session_type = generate_session()
 
             # Send the request to the API
             response = requests.post(API_URL, json=session_data)
@@ -89,3 +258,40 @@ if __name__ == "__main__":
         except Exception as e:
             logger.error(f"An unexpected error occurred: {e}")
             break
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Astra traffic simulation and load generator.")
+    parser.add_argument('--load-test', action='store_true', help="Run the open-loop load generator instead of the demo loop.")
+    parser.add_argument('--url', default=None, help="Target URL (defaults to /predict, or /predict/batch with --batch-size > 1).")
+    parser.add_argument('--rps', type=float, default=100.0, help="Baseline requests per second.")
+    parser.add_argument('--duration', type=float, default=30.0, help="Test length in seconds.")
+    parser.add_argument('--profile', choices=['steady', 'tatkal'], default='steady', help="Offered-load shape.")
+    parser.add_argument('--spike-multiplier', type=float, default=10.0, help="Peak/baseline ratio for the tatkal profile.")
+    parser.add_argument('--batch-size', type=int, default=1, help="Sessions per request; >1 posts arrays to /predict/batch.")
+    parser.add_argument('--max-in-flight', type=int, default=1000, help="Cap on concurrent requests (and pooled connections).")
+    parser.add_argument('--bot-ratio', type=float, default=BOT_RATIO, help="Share of generated sessions that are bots.")
+    parser.add_argument('--timeout', type=float, default=10.0, help="Per-request timeout in seconds.")
+    parser.add_argument('--output', default=None, help="Write the JSON report to this file as well as stdout.")
+    args = parser.parse_args()
+
+    if not args.load_test:
+        run_simulation()
+        return
+
+    url = args.url or (BATCH_API_URL if args.batch_size > 1 else API_URL)
+    logger.info(f"Load test: {args.profile} profile, {args.rps} rps baseline for {args.duration}s against {url}")
+    report = asyncio.run(run_load_test(
+        url, args.rps, args.duration, profile=args.profile, spike_multiplier=args.spike_multiplier,
+        batch_size=args.batch_size, max_in_flight=args.max_in_flight, bot_ratio=args.bot_ratio,
+        timeout=args.timeout,
+    ))
+    print(json.dumps(report, indent=2))
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+
+
+# --- Main Execution ---
+if __name__ == "__main__":
+    main()
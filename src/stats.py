@@ -0,0 +1,275 @@
+# Rolling-window Traffic Statistics for Astra
+# Keeps request/decision counters, a confidence histogram and a latency
+# histogram in fixed-size, one-second time buckets, so recording is O(1) and
+# windows up to an hour are answered from memory without touching the log.
+# The counters can live in a caller-provided buffer (shared memory in the
+# pre-fork server), and `ClusterStats` sums several workers' buffers.
+
+import time
+from collections import deque
+from typing import Dict, List, Optional
+
+import numpy as np
+
+# Windows reported by `snapshot_all`, in seconds
+WINDOWS = {"1m": 60, "5m": 300, "1h": 3600}
+
+# Confidence histogram: ten equal-width bins over [0, 1]
+CONFIDENCE_BINS = 10
+
+# Latency histogram: geometric bucket upper bounds from 10us to ~10s
+LATENCY_BOUNDS = np.geomspace(1e-5, 10.0, 61)
+
+RECENT_PREDICTIONS = 20
+RECENT_FIELDS = ['form_fill_duration', 'mouse_movements', 'account_age_days']
+
+
+def _layout(horizon: int) -> List[tuple]:
+    """(name, shape) of every int64 array a RollingStats keeps, in buffer order."""
+    return [
+        ('_second', (horizon,)),
+        ('_requests', (horizon,)),
+        ('_blocked', (horizon,)),
+        ('_errors', (horizon,)),
+        ('_confidence', (horizon, CONFIDENCE_BINS)),
+        ('_latency', (horizon, len(LATENCY_BOUNDS) + 1)),
+        ('_totals', (3,)),
+    ]
+
+
+class RollingStats:
+    """
+    Ring of `horizon` one-second buckets. Each bucket remembers which second
+    it holds; a stale bucket is cleared lazily the first time it is reused.
+
+    With `buffer` (at least `RollingStats.nbytes(horizon)` writable bytes)
+    the counters live in it instead of private memory, so another process
+    mapping the same buffer can read them; `init_buffer` marks it empty.
+    """
+
+    def __init__(self, horizon: int = max(WINDOWS.values()), snapshot_ttl: float = 0.5, buffer=None,
+                 init_buffer: bool = True):
+        self.horizon = int(horizon)
+        self.snapshot_ttl = snapshot_ttl
+        offset = 0
+        for name, shape in _layout(self.horizon):
+            if buffer is None:
+                array = np.zeros(shape, dtype=np.int64)
+            else:
+                array = np.ndarray(shape, dtype=np.int64, buffer=buffer, offset=offset)
+                offset += array.nbytes
+            setattr(self, name, array)
+        if buffer is None or init_buffer:
+            self._second[:] = -1
+            self._requests[:] = 0
+            self._blocked[:] = 0
+            self._errors[:] = 0
+            self._confidence[:] = 0
+            self._latency[:] = 0
+            self._totals[:] = 0
+
+        self.started_at = time.time()
+        self.recent = deque(maxlen=RECENT_PREDICTIONS)
+
+        self._cached_snapshot: Optional[dict] = None
+        self._cached_at = 0.0
+
+    @staticmethod
+    def nbytes(horizon: int = max(WINDOWS.values())) -> int:
+        """Buffer size needed for a RollingStats of `horizon` buckets."""
+        return sum(int(np.prod(shape)) for _, shape in _layout(int(horizon))) * np.dtype(np.int64).itemsize
+
+    @property
+    def total_requests(self) -> int:
+        return int(self._totals[0])
+
+    @property
+    def total_blocked(self) -> int:
+        return int(self._totals[1])
+
+    @property
+    def total_errors(self) -> int:
+        return int(self._totals[2])
+
+    # --- Recording ---
+    def _bucket(self, now: float) -> int:
+        second = int(now)
+        idx = second % self.horizon
+        if self._second[idx] != second:
+            self._second[idx] = second
+            self._requests[idx] = 0
+            self._blocked[idx] = 0
+            self._errors[idx] = 0
+            self._confidence[idx] = 0
+            self._latency[idx] = 0
+        return idx
+
+    def record(self, prediction: dict, latency: float, features: Optional[dict] = None,
+               now: Optional[float] = None):
+        """Counts one scored session."""
+        now = time.time() if now is None else now
+        idx = self._bucket(now)
+        blocked = prediction['decision'] == 'BLOCK'
+        self._requests[idx] += 1
+        self._blocked[idx] += blocked
+        self._confidence[idx, min(int(prediction['confidence_score'] * CONFIDENCE_BINS), CONFIDENCE_BINS - 1)] += 1
+        self._latency[idx, int(np.searchsorted(LATENCY_BOUNDS, latency))] += 1
+        self._totals[0] += 1
+        self._totals[1] += blocked
+
+        entry = {'Timestamp': now, **prediction}
+        if features:
+            entry.update({field: features.get(field) for field in RECENT_FIELDS})
+        self.recent.append(entry)
+
+    def record_batch(self, blocked: np.ndarray, confidence: np.ndarray, latency: float, recent=(),
+                     now: Optional[float] = None):
+        """
+        Counts sessions scored together, from arrays of block flags and
+        confidences, all with the batch's `latency`; `recent` holds
+        (prediction, features) pairs for the latest-predictions list.
+        """
+        now = time.time() if now is None else now
+        idx = self._bucket(now)
+        n, n_blocked = len(blocked), int(np.count_nonzero(blocked))
+        bins = np.minimum((np.asarray(confidence) * CONFIDENCE_BINS).astype(np.int64), CONFIDENCE_BINS - 1)
+        self._requests[idx] += n
+        self._blocked[idx] += n_blocked
+        self._confidence[idx] += np.bincount(bins, minlength=CONFIDENCE_BINS)
+        self._latency[idx, int(np.searchsorted(LATENCY_BOUNDS, latency))] += n
+        self._totals[0] += n
+        self._totals[1] += n_blocked
+
+        for prediction, features in recent:
+            entry = {'Timestamp': now, **prediction}
+            if features:
+                entry.update({field: features.get(field) for field in RECENT_FIELDS})
+            self.recent.append(entry)
+
+    def record_error(self, now: Optional[float] = None):
+        idx = self._bucket(time.time() if now is None else now)
+        self._errors[idx] += 1
+        self._totals[2] += 1
+
+    # --- Queries ---
+    def window_counts(self, window: int, now: float) -> tuple:
+        """Raw (requests, blocked, errors, confidence counts, latency counts) of the last `window` seconds."""
+        current = int(now)
+        live = (self._second > current - window) & (self._second <= current)
+        return (int(self._requests[live].sum()), int(self._blocked[live].sum()), int(self._errors[live].sum()),
+                self._confidence[live].sum(axis=0), self._latency[live].sum(axis=0))
+
+    def snapshot(self, window: int, now: Optional[float] = None) -> dict:
+        """Aggregates the last `window` seconds (including the current one)."""
+        now = time.time() if now is None else now
+        return _format_window(window, *self.window_counts(window, now))
+
+    def snapshot_all(self) -> dict:
+        """All configured windows plus lifetime totals; cached briefly so many viewers share one computation."""
+        now = time.time()
+        if self._cached_snapshot is not None and now - self._cached_at < self.snapshot_ttl:
+            return self._cached_snapshot
+        self._cached_snapshot = _format_all(now, self.started_at, self.total_requests, self.total_blocked,
+                                            self.total_errors, {name: self.snapshot(seconds, now)
+                                                                for name, seconds in WINDOWS.items()}, self.recent)
+        self._cached_at = now
+        return self._cached_snapshot
+
+
+class ClusterStats:
+    """
+    The same interface as RollingStats over several workers' counters:
+    recording goes to this worker's `local` stats, queries sum `members`
+    (every worker's stats, this one included). Buckets are read without
+    locking, so a snapshot taken mid-write may be off by the request in flight.
+    """
+
+    def __init__(self, local: RollingStats, members: List[RollingStats], started_at: Optional[float] = None,
+                 snapshot_ttl: float = 0.5):
+        self.local = local
+        self.members = members
+        self.started_at = time.time() if started_at is None else started_at
+        self.snapshot_ttl = snapshot_ttl
+        self._cached_snapshot: Optional[dict] = None
+        self._cached_at = 0.0
+
+    @property
+    def recent(self):
+        return self.local.recent
+
+    def record(self, prediction: dict, latency: float, features: Optional[dict] = None,
+               now: Optional[float] = None):
+        self.local.record(prediction, latency, features, now)
+
+    def record_batch(self, blocked: np.ndarray, confidence: np.ndarray, latency: float, recent=(),
+                     now: Optional[float] = None):
+        self.local.record_batch(blocked, confidence, latency, recent, now)
+
+    def record_error(self, now: Optional[float] = None):
+        self.local.record_error(now)
+
+    def snapshot(self, window: int, now: Optional[float] = None) -> dict:
+        now = time.time() if now is None else now
+        parts = [member.window_counts(window, now) for member in self.members]
+        return _format_window(window, *(sum(values) for values in zip(*parts)))
+
+    def snapshot_all(self) -> dict:
+        """Every worker's windows and totals summed; `recent` holds this worker's latest predictions."""
+        now = time.time()
+        if self._cached_snapshot is not None and now - self._cached_at < self.snapshot_ttl:
+            return self._cached_snapshot
+        totals = np.sum([member._totals for member in self.members], axis=0)
+        self._cached_snapshot = _format_all(now, self.started_at, int(totals[0]), int(totals[1]), int(totals[2]),
+                                            {name: self.snapshot(seconds, now) for name, seconds in WINDOWS.items()},
+                                            self.local.recent)
+        self._cached_snapshot['workers'] = len(self.members)
+        self._cached_at = now
+        return self._cached_snapshot
+
+
+def _format_window(window: int, requests: int, blocked: int, errors: int, confidence: np.ndarray,
+                   latency_counts: np.ndarray) -> dict:
+    return {
+        "window_seconds": window,
+        "requests": requests,
+        "blocked": blocked,
+        "allowed": requests - blocked,
+        "errors": errors,
+        "block_rate": round(blocked / requests, 4) if requests else 0.0,
+        "requests_per_second": round(requests / window, 3),
+        "confidence_histogram": confidence.tolist(),
+        "latency_ms": {
+            "p50": _percentile_ms(latency_counts, 0.50),
+            "p95": _percentile_ms(latency_counts, 0.95),
+            "p99": _percentile_ms(latency_counts, 0.99),
+        },
+    }
+
+
+def _format_all(now: float, started_at: float, requests: int, blocked: int, errors: int, windows: Dict[str, dict],
+                recent) -> dict:
+    return {
+        "timestamp": now,
+        "uptime_seconds": round(now - started_at, 1),
+        "totals": {
+            "requests": requests,
+            "blocked": blocked,
+            "allowed": requests - blocked,
+            "errors": errors,
+        },
+        "windows": windows,
+        "recent": list(recent),
+    }
+
+
+def _percentile_ms(counts: np.ndarray, q: float) -> Optional[float]:
+    """
+    Upper bound of the histogram bucket holding the q-th quantile, in
+    milliseconds. Latencies past the top bucket report the top bound (a floor,
+    but finite, so the stats stay valid JSON).
+    """
+    total = counts.sum()
+    if total == 0:
+        return None
+    idx = int(np.searchsorted(np.cumsum(counts), q * total))
+    return round(float(LATENCY_BOUNDS[min(idx, len(LATENCY_BOUNDS) - 1)]) * 1000, 3)
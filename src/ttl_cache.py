@@ -0,0 +1,87 @@
+# Bounded TTL + LRU Map for Astra
+# The in-memory stores keyed by request or session (the /predict verdict cache,
+# progressive scoring's partial sessions) share this map. Entries expire `ttl`
+# seconds after they were last stored; the map is capped at `max_entries` by
+# dropping the least recently used entry, and expired entries are dropped a
+# few at a time on every insert rather than in a sweep. Every read treats an
+# expired entry as absent.
+
+import time
+from collections import OrderedDict
+from typing import Any, Hashable, Optional
+
+# Entry slots
+_EXPIRES, _VALUE = range(2)
+
+
+class TTLCache:
+    """
+    Bounded TTL + LRU map. Used from the event loop only, so it takes no
+    locks. `now` arguments are `time.monotonic()` seconds (injectable for tests).
+    """
+
+    def __init__(self, max_entries: int, ttl: float):
+        self.max_entries = max(0, int(max_entries))
+        self.ttl = ttl
+        self._entries: "OrderedDict[Hashable, list]" = OrderedDict()
+
+        # Statistics
+        self.expired = 0
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key: Hashable, now: Optional[float] = None) -> Optional[Any]:
+        """The live value for `key` (marked most recently used), or None."""
+        entry = self._live(key, now)
+        if entry is None:
+            return None
+        self._entries.move_to_end(key)
+        return entry[_VALUE]
+
+    def put(self, key: Hashable, value: Any, now: Optional[float] = None):
+        """Stores `value` under `key` and restarts its TTL."""
+        now = time.monotonic() if now is None else now
+        self._entries[key] = [now + self.ttl, value]
+        self._entries.move_to_end(key)
+        self._evict(now)
+
+    def pop(self, key: Hashable, now: Optional[float] = None) -> Optional[Any]:
+        """Removes `key` and returns its value, or None if it is absent or expired."""
+        entry = self._live(key, now)
+        if entry is None:
+            return None
+        del self._entries[key]
+        return entry[_VALUE]
+
+    def discard(self, key: Hashable):
+        self._entries.pop(key, None)
+
+    def clear(self):
+        self._entries.clear()
+
+    def _live(self, key: Hashable, now: Optional[float]) -> Optional[list]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        now = time.monotonic() if now is None else now
+        if entry[_EXPIRES] <= now:
+            del self._entries[key]
+            self.expired += 1
+            return None
+        return entry
+
+    def _evict(self, now: float, budget: int = 2):
+        """Drops anything over capacity from the cold end, plus at most `budget` expired entries."""
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+        for _ in range(budget):
+            if not self._entries:
+                break
+            oldest_key = next(iter(self._entries))
+            if self._entries[oldest_key][_EXPIRES] > now:
+                break
+            del self._entries[oldest_key]
+            self.expired += 1
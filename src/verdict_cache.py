@@ -0,0 +1,108 @@
+# Verdict Cache for Astra
+# Remembers recent /predict verdicts so retried and repeated submissions are
+# answered without touching the scaler or the forest.
+#
+# Entries are keyed by a client-supplied session/idempotency id when there is
+# one, otherwise by a digest of the canonicalized feature vector. Every entry
+# also stores the feature digest and the model generation it was scored with:
+# an id reused with different features, or a verdict from a model that has
+# since been swapped out, is treated as a miss. Keys are fixed-size digests, so
+# memory per entry is constant however long or varied the client's ids are.
+# Expiry and the LRU bound come from the shared TTLCache (src/ttl_cache.py).
+
+import hashlib
+import struct
+from typing import Dict, List, Optional, Tuple
+
+from src.ttl_cache import TTLCache
+
+_DIGEST_SIZE = 16
+
+# Entry slots
+_FINGERPRINT, _GENERATION, _VERDICT = range(3)
+
+
+def feature_fingerprint(features: Dict[str, float], feature_columns: List[str]) -> bytes:
+    """Digest of the feature values in model column order (ints and equal floats hash alike)."""
+    packed = struct.pack(f'<{len(feature_columns)}d', *(float(features[c]) for c in feature_columns))
+    return hashlib.blake2b(packed, digest_size=_DIGEST_SIZE).digest()
+
+
+def _id_key(session_id: str) -> bytes:
+    return hashlib.blake2b(session_id.encode('utf-8'), digest_size=_DIGEST_SIZE, person=b'astra-id').digest()
+
+
+class VerdictCache:
+    """
+    Map from request key to verdict, checked against the request's feature
+    fingerprint and the current model generation. Used from the event loop
+    only, so it takes no locks.
+    """
+
+    def __init__(self, max_entries: int = 100_000, ttl: float = 30.0):
+        self._entries = TTLCache(max_entries, ttl)
+
+        # Statistics
+        self.hits = 0
+        self.misses = 0
+        self.conflicts = 0
+        self.stale = 0
+
+    @property
+    def max_entries(self) -> int:
+        return self._entries.max_entries
+
+    @property
+    def ttl(self) -> float:
+        return self._entries.ttl
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_entries > 0
+
+    def key_for(self, features: Dict[str, float], feature_columns: List[str],
+                session_id: Optional[str] = None) -> Tuple[bytes, bytes]:
+        """Returns (cache key, feature fingerprint) for a request."""
+        fingerprint = feature_fingerprint(features, feature_columns)
+        return (_id_key(session_id) if session_id else fingerprint), fingerprint
+
+    def get(self, key: bytes, fingerprint: bytes, generation: int, now: Optional[float] = None) -> Optional[dict]:
+        """The stored verdict, or None on a miss."""
+        entry = self._entries.get(key, now)
+        if entry is None:
+            self.misses += 1
+            return None
+        if entry[_FINGERPRINT] != fingerprint:
+            self.conflicts += 1  # Same id, different session data: never reuse the verdict
+        elif entry[_GENERATION] != generation:
+            self.stale += 1
+        else:
+            self.hits += 1
+            return entry[_VERDICT]
+        self._entries.discard(key)
+        self.misses += 1
+        return None
+
+    def put(self, key: bytes, fingerprint: bytes, generation: int, verdict: dict, now: Optional[float] = None):
+        if not self.enabled:
+            return
+        self._entries.put(key, (fingerprint, generation, verdict), now)
+
+    def clear(self):
+        self._entries.clear()
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            'entries': len(self._entries),
+            'max_entries': self.max_entries,
+            'ttl_seconds': self.ttl,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0,
+            'expired': self._entries.expired,
+            'conflicts': self.conflicts,
+            'stale': self.stale,
+            'evictions': self._entries.evictions,
+        }
+
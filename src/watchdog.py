@@ -0,0 +1,414 @@
+# Astra Watchdog Monitor
+# Per-IP rate limiting, burst detection, IP blocking and alerting for the
+# prediction API. See WATCHDOG_README.md for the alert types and thresholds.
+#
+# Request counting uses the two-bucket sliding-window estimate: a fixed-window
+# count for the current window plus the previous window's count weighted by how
+# much of it still overlaps the sliding window. That is O(1) time and a handful
+# of integers per IP. Tracked IPs live in an LRU bounded by `max_tracked_ips`;
+# idle entries are evicted a few at a time on every request, never in a sweep.
+#
+# Under the pre-fork server a client's requests land on any worker, so a
+# worker counting alone would let an IP through at N times the thresholds.
+# There the counters, violations and blocks live in `SharedIPCounters`, a
+# table in the server's shared-memory arena with one region per worker: a
+# worker writes only its own region and adds up every worker's row for the IP.
+
+import threading
+import time
+import logging
+from array import array
+from collections import OrderedDict, deque
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger('watchdog')
+
+DEFAULT_THRESHOLDS = {
+    'high_confidence_bot': 0.95,    # Bot confidence threshold
+    'rapid_requests': 10,           # Requests per minute
+    'suspicious_pattern': 0.8,      # Share of bot-like behavioral signals
+    'burst_threshold': 5,           # Requests in 10 seconds
+    'block_requests': 20,           # Requests per minute that block outright
+    'block_violations': 3,          # Violations before an IP is blocked
+}
+
+# Never rate limited unless ASTRA_WATCHDOG_TRUSTED_IPS says otherwise: the demo traffic generator
+# (src/simulation.py, one session per second) and local tools run from here
+LOOPBACK_IPS = ('127.0.0.1', '::1')
+
+RATE_WINDOW = 60.0
+BURST_WINDOW = 10.0
+
+# Per-IP state slots (a plain list is the cheapest mutable record in CPython)
+_MIN_ID, _MIN_CUR, _MIN_PREV, _BURST_ID, _BURST_CUR, _BURST_PREV, _VIOLATIONS, _LAST_SEEN, \
+    _RAPID_FLAGGED, _BURST_FLAGGED = range(10)
+
+
+def _slide(state: list, id_slot: int, window: float, now: float) -> float:
+    """Advances one two-bucket window counter by a request and returns the sliding estimate."""
+    bucket = int(now // window)
+    cur, prev = id_slot + 1, id_slot + 2
+    if bucket != state[id_slot]:
+        state[prev] = state[cur] if bucket == state[id_slot] + 1 else 0
+        state[cur] = 0
+        state[id_slot] = bucket
+    state[cur] += 1
+    overlap = 1.0 - (now - bucket * window) / window
+    return state[prev] * overlap + state[cur]
+
+
+# Fields of a SharedIPCounters row (int64; times in microseconds of the system-wide monotonic clock)
+_S_TAG, _S_SEEN, _S_MIN_ID, _S_MIN_CUR, _S_MIN_PREV, _S_BURST_ID, _S_BURST_CUR, _S_BURST_PREV, _S_VIOLATIONS, \
+    _S_RAPID_FLAGGED, _S_BURST_FLAGGED, _S_BLOCKED_UNTIL = range(12)
+_S_FIELDS = 12
+_US = 1_000_000
+
+
+def _shared_row(tag: int) -> list:
+    return [tag, 0, -1, 0, 0, -1, 0, 0, 0, -1, -1, 0]
+
+
+def _combined(rows: List[list], id_slot: int, window: float, now: float) -> float:
+    """The two-bucket sliding estimate over the summed counters of several rows."""
+    bucket = int(now // window)
+    cur = prev = 0
+    for row in rows:
+        if row[id_slot] == bucket:
+            cur += row[id_slot + 1]
+            prev += row[id_slot + 2]
+        elif row[id_slot] == bucket - 1:
+            prev += row[id_slot + 1]
+    return prev * (1.0 - (now - bucket * window) / window) + cur
+
+
+class SharedIPCounters:
+    """
+    Per-IP request counters summed over the workers of a pre-fork server.
+    `buffer` is a direct-mapped table of `capacity` entries, each holding
+    one row per worker (adjacent, so one read fetches them all). Worker
+    `slot` writes only its own rows, so every row has a single writer and no
+    lock is shared between processes. Reads of other workers' rows are
+    unsynchronized and may miss a request in flight. An IP whose row is
+    taken over by another IP hashing to the same index starts counting
+    afresh there. IPs are hashed with the interpreter's seeded str hash,
+    which forked workers share and clients cannot predict.
+    """
+
+    def __init__(self, buffer, slots: int, slot: int, capacity: int):
+        self.slots = int(slots)
+        self.slot = slot
+        self.capacity = int(capacity)
+        # Rows are copied in and out as lists: scalar access to a few cells is far cheaper than numpy's
+        self._cells = memoryview(buffer).cast('B').cast('q')
+        self.table = np.ndarray((self.capacity, self.slots, _S_FIELDS), dtype=np.int64, buffer=buffer)
+
+    @staticmethod
+    def nbytes(slots: int, capacity: int) -> int:
+        """Buffer size for `slots` workers with `capacity` rows each."""
+        return int(slots) * int(capacity) * _S_FIELDS * np.dtype(np.int64).itemsize
+
+    def read(self, client_ip: str) -> Tuple[int, int, List[list]]:
+        """(tag, index, every worker's row at the IP's index); rows may hold other IPs (see `_S_TAG`)."""
+        tag = hash(client_ip) or 1
+        index = tag % self.capacity
+        start = index * self.slots * _S_FIELDS
+        cells = self._cells[start:start + self.slots * _S_FIELDS].tolist()
+        return tag, index, [cells[i:i + _S_FIELDS] for i in range(0, len(cells), _S_FIELDS)]
+
+    def write(self, index: int, row: list):
+        """Stores this worker's row at `index`."""
+        start = (index * self.slots + self.slot) * _S_FIELDS
+        self._cells[start:start + _S_FIELDS] = array('q', row)
+
+    def blocked_ips(self, now: float) -> int:
+        """Distinct IPs blocked by any worker."""
+        table = self.table.reshape(-1, _S_FIELDS)
+        return len(np.unique(table[table[:, _S_BLOCKED_UNTIL] > now * _US, _S_TAG]))
+
+    def tracked_ips(self) -> int:
+        """Distinct IPs with a row in any worker's table."""
+        tags = self.table[:, :, _S_TAG].ravel()
+        return len(np.unique(tags[tags != 0]))
+
+
+class Watchdog:
+    """Bounded-memory session monitor shared by all requests of one process."""
+
+    def __init__(self, thresholds: Optional[Dict[str, float]] = None, max_tracked_ips: int = 100_000,
+                 idle_ttl: float = 300.0, block_duration: float = 300.0, max_alerts: int = 100,
+                 max_sessions: int = 1000, max_suspicious_ips: int = 10_000, trusted_ips=()):
+        self.thresholds = {**DEFAULT_THRESHOLDS, **(thresholds or {})}
+        # Gateways and load generators that are never rate limited
+        self.trusted_ips = set(trusted_ips)
+        self.max_tracked_ips = max_tracked_ips
+        self.idle_ttl = idle_ttl
+        self.block_duration = block_duration
+        self.max_suspicious_ips = max_suspicious_ips
+
+        self._lock = threading.Lock()
+        self._ips: "OrderedDict[str, list]" = OrderedDict()
+        self._blocked: "OrderedDict[str, float]" = OrderedDict()
+        self._suspicious: "OrderedDict[str, dict]" = OrderedDict()
+        self.alerts = deque(maxlen=max_alerts)
+        self.sessions = deque(maxlen=max_sessions)
+
+        self.started_at = time.time()
+        self.total_sessions = 0
+        self.bots_detected = 0
+        self.alerts_triggered = 0
+        self.rejected_requests = 0
+        self.evicted_ips = 0
+        # Set in a pre-fork worker: request counting and blocks are then server-wide
+        self.shared: Optional[SharedIPCounters] = None
+
+    # --- Request admission (runs before any model work) ---
+    def check_request(self, client_ip: str, now: Optional[float] = None) -> Tuple[bool, List[dict]]:
+        """
+        Counts a request from `client_ip`. Returns (allowed, alerts); allowed is
+        False while the IP is blocked.
+        """
+        alerts: List[dict] = []
+        if client_ip in self.trusted_ips:
+            return True, alerts
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            blocked_until = self._blocked.get(client_ip)
+            if blocked_until is not None:
+                if blocked_until > now:
+                    self.rejected_requests += 1
+                    return False, alerts
+                del self._blocked[client_ip]
+            if self.shared is not None:
+                return self._check_shared(client_ip, now, alerts)
+
+            state = self._ips.get(client_ip)
+            if state is None:
+                state = [-1, 0, 0, -1, 0, 0, 0, now, -1, -1]
+                self._ips[client_ip] = state
+            else:
+                self._ips.move_to_end(client_ip)
+            state[_LAST_SEEN] = now
+
+            per_minute = _slide(state, _MIN_ID, RATE_WINDOW, now)
+            per_burst = _slide(state, _BURST_ID, BURST_WINDOW, now)
+
+            # Each rule counts at most one violation per window
+            if per_minute > self.thresholds['rapid_requests'] and state[_RAPID_FLAGGED] != state[_MIN_ID]:
+                state[_RAPID_FLAGGED] = state[_MIN_ID]
+                state[_VIOLATIONS] += 1
+                alerts.append(self._alert('RAPID_REQUESTS', 'WARNING', client_ip,
+                                          f"{per_minute:.0f} requests/min from {client_ip}"))
+            if per_burst > self.thresholds['burst_threshold'] and state[_BURST_FLAGGED] != state[_BURST_ID]:
+                state[_BURST_FLAGGED] = state[_BURST_ID]
+                state[_VIOLATIONS] += 1
+                alerts.append(self._alert('BURST_ATTACK', 'HIGH', client_ip,
+                                          f"{per_burst:.0f} requests in {BURST_WINDOW:.0f}s from {client_ip}"))
+            if alerts:
+                self._mark_suspicious(client_ip, state[_VIOLATIONS])
+
+            if per_minute > self.thresholds['block_requests'] or \
+                    state[_VIOLATIONS] >= self.thresholds['block_violations']:
+                self._block(client_ip, now)
+
+            self._evict(now)
+        return True, alerts
+
+    def is_blocked(self, client_ip: str, now: Optional[float] = None) -> bool:
+        now = time.monotonic() if now is None else now
+        blocked_until = self._blocked.get(client_ip)
+        return blocked_until is not None and blocked_until > now
+
+    def retry_after(self, client_ip: str, now: Optional[float] = None) -> int:
+        """Seconds until `client_ip` is unblocked (0 if it is not blocked)."""
+        now = time.monotonic() if now is None else now
+        return max(0, int(self._blocked.get(client_ip, now) - now + 0.999))
+
+    # --- Post-prediction analysis ---
+    def record_prediction(self, session_data: Dict[str, Any], prediction: dict, client_ip: str) -> List[dict]:
+        """Checks a scored session for high-confidence bots and bot-like behavior."""
+        alerts: List[dict] = []
+        is_bot = prediction.get('is_bot') == 1
+        confidence = prediction.get('confidence_score', 0.0)
+        with self._lock:
+            self.total_sessions += 1
+            self.bots_detected += is_bot
+            if is_bot and confidence > self.thresholds['high_confidence_bot']:
+                alerts.append(self._alert('HIGH_CONFIDENCE_BOT', 'CRITICAL', client_ip,
+                                          f"Bot detected with {confidence:.1%} confidence from {client_ip}"))
+            elif not is_bot:
+                score = _suspicion_score(session_data)
+                if score >= self.thresholds['suspicious_pattern']:
+                    alerts.append(self._alert('SUSPICIOUS_BEHAVIOR', 'MEDIUM', client_ip,
+                                              f"Allowed session from {client_ip} matches {score:.0%} of bot signals"))
+            self.sessions.append({
+                'timestamp': datetime.now().isoformat(),
+                'client_ip': client_ip,
+                'decision': prediction.get('decision'),
+                'confidence_score': confidence,
+                'alerts': [alert['type'] for alert in alerts],
+            })
+        return alerts
+
+    def process_session(self, session_data: Dict[str, Any], client_ip: str,
+                        prediction: Optional[dict] = None) -> dict:
+        """Rate-checks a session and, when a prediction is given, analyses it too."""
+        allowed, alerts = self.check_request(client_ip)
+        if allowed and prediction is not None:
+            alerts += self.record_prediction(session_data, prediction, client_ip)
+        return {'blocked': not allowed, 'alerts': alerts}
+
+    # --- Reporting ---
+    def get_stats(self) -> dict:
+        with self._lock:
+            return {
+                'total_sessions': self.total_sessions,
+                'bots_detected': self.bots_detected,
+                'detection_rate': round(self.bots_detected / self.total_sessions, 4) if self.total_sessions else 0.0,
+                'alerts_triggered': self.alerts_triggered,
+                'suspicious_ips': len(self._suspicious),
+                'blocked_ips': sum(1 for until in self._blocked.values() if until > time.monotonic())
+                if self.shared is None else self.shared.blocked_ips(time.monotonic()),
+                'rejected_requests': self.rejected_requests,
+                'tracked_ips': len(self._ips) if self.shared is None else self.shared.tracked_ips(),
+                'evicted_ips': self.evicted_ips,
+                'uptime_seconds': round(time.time() - self.started_at, 1),
+                'thresholds': dict(self.thresholds),
+            }
+
+    def get_alerts(self, limit: int = 50) -> List[dict]:
+        with self._lock:
+            return list(self.alerts)[-limit:][::-1]
+
+    def get_suspicious_ips(self) -> List[dict]:
+        now = time.monotonic()
+        with self._lock:
+            return [
+                {**info, 'ip': ip, 'status': 'BLOCKED' if self._blocked.get(ip, 0) > now else 'WATCHING'}
+                for ip, info in reversed(self._suspicious.items())
+            ]
+
+    def export(self) -> dict:
+        return {
+            'exported_at': datetime.now().isoformat(),
+            'stats': self.get_stats(),
+            'alerts': self.get_alerts(limit=len(self.alerts) or 1),
+            'suspicious_ips': self.get_suspicious_ips(),
+        }
+
+    # --- Internals (called with the lock held) ---
+    def _check_shared(self, client_ip: str, now: float, alerts: List[dict]) -> Tuple[bool, List[dict]]:
+        """check_request's counting and rules, against every worker's counters for the IP."""
+        tag, index, rows = self.shared.read(client_ip)
+        row = rows[self.shared.slot]
+        if row[_S_TAG] != tag:
+            self.evicted_ips += row[_S_TAG] != 0
+            row = rows[self.shared.slot] = _shared_row(tag)
+        same_ip = [other for other in rows if other[_S_TAG] == tag]
+        now_us = int(now * _US)
+        blocked_until = max(other[_S_BLOCKED_UNTIL] for other in same_ip)
+        if blocked_until > now_us:
+            # Blocked by another worker: remember it here too, for retry_after()
+            self._blocked[client_ip] = blocked_until / _US
+            self.rejected_requests += 1
+            return False, alerts
+        # Counting restarts once a block expires: rows last counted before it ended no longer count
+        if row[_S_SEEN] < blocked_until:
+            row[:] = _shared_row(tag)
+        row[_S_SEEN] = now_us
+        _slide(row, _S_MIN_ID, RATE_WINDOW, now)
+        _slide(row, _S_BURST_ID, BURST_WINDOW, now)
+        live = [other for other in same_ip if other[_S_SEEN] >= blocked_until]
+        per_minute = _combined(live, _S_MIN_ID, RATE_WINDOW, now)
+        per_burst = _combined(live, _S_BURST_ID, BURST_WINDOW, now)
+
+        # Each rule counts at most one violation per window, whichever worker sees it first
+        if per_minute > self.thresholds['rapid_requests'] and \
+                all(other[_S_RAPID_FLAGGED] != row[_S_MIN_ID] for other in live):
+            row[_S_RAPID_FLAGGED] = row[_S_MIN_ID]
+            row[_S_VIOLATIONS] += 1
+            alerts.append(self._alert('RAPID_REQUESTS', 'WARNING', client_ip,
+                                      f"{per_minute:.0f} requests/min from {client_ip}"))
+        if per_burst > self.thresholds['burst_threshold'] and \
+                all(other[_S_BURST_FLAGGED] != row[_S_BURST_ID] for other in live):
+            row[_S_BURST_FLAGGED] = row[_S_BURST_ID]
+            row[_S_VIOLATIONS] += 1
+            alerts.append(self._alert('BURST_ATTACK', 'HIGH', client_ip,
+                                      f"{per_burst:.0f} requests in {BURST_WINDOW:.0f}s from {client_ip}"))
+        violations = sum(other[_S_VIOLATIONS] for other in live)
+        if alerts:
+            self._mark_suspicious(client_ip, violations)
+
+        if per_minute > self.thresholds['block_requests'] or violations >= self.thresholds['block_violations']:
+            row[_S_BLOCKED_UNTIL] = int((now + self.block_duration) * _US)
+            self._block(client_ip, now)
+        self.shared.write(index, row)
+        return True, alerts
+
+    def _alert(self, alert_type: str, severity: str, client_ip: str, message: str) -> dict:
+        alert = {
+            'type': alert_type,
+            'severity': severity,
+            'client_ip': client_ip,
+            'message': message,
+            'timestamp': datetime.now().isoformat(),
+        }
+        self.alerts.append(alert)
+        self.alerts_triggered += 1
+        logger.warning(f"{alert_type} ({severity}): {message}")
+        return alert
+
+    def _mark_suspicious(self, client_ip: str, violations: int):
+        self._suspicious[client_ip] = {'violations': violations, 'last_violation': datetime.now().isoformat()}
+        self._suspicious.move_to_end(client_ip)
+        if len(self._suspicious) > self.max_suspicious_ips:
+            self._suspicious.popitem(last=False)
+
+    def _block(self, client_ip: str, now: float):
+        if client_ip not in self._blocked:
+            logger.warning(f"Blocking {client_ip} for {self.block_duration:.0f}s.")
+        self._blocked[client_ip] = now + self.block_duration
+        self._blocked.move_to_end(client_ip)
+        if len(self._blocked) > self.max_suspicious_ips:
+            self._blocked.popitem(last=False)
+        # Counting restarts once the block expires
+        self._ips.pop(client_ip, None)
+
+    def _evict(self, now: float, budget: int = 2):
+        """Drops at most `budget` idle entries from the cold end, plus anything over capacity."""
+        while len(self._ips) > self.max_tracked_ips:
+            self._ips.popitem(last=False)
+            self.evicted_ips += 1
+        for _ in range(budget):
+            if not self._ips:
+                break
+            oldest_ip = next(iter(self._ips))
+            if now - self._ips[oldest_ip][_LAST_SEEN] < self.idle_ttl:
+                break
+            del self._ips[oldest_ip]
+            self.evicted_ips += 1
+
+
+def _suspicion_score(session_data: Dict[str, Any]) -> float:
+    """Share of simple bot-like behavioral signals present in a session."""
+    signals = [
+        session_data.get('avg_keystroke_interval_ms', 1e9) < 30,
+        session_data.get('mouse_idle_time_sec', 1e9) < 0.5,
+        session_data.get('backspace_count', 1) == 0 and session_data.get('form_corrections', 1) == 0,
+        session_data.get('account_age_days', 1e9) < 5,
+        session_data.get('session_duration', 1e9) < 10,
+    ]
+    return sum(signals) / len(signals)
+
+
+_watchdog: Optional[Watchdog] = None
+
+
+def get_watchdog() -> Watchdog:
+    """Returns the process-wide watchdog instance, creating it on first use."""
+    global _watchdog
+    if _watchdog is None:
+        _watchdog = Watchdog()
+    return _watchdog
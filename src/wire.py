@@ -0,0 +1,106 @@
+# Packed Binary Wire Format for Astra
+# A fixed-layout alternative to JSON for trusted gateway clients: sessions are
+# sent as little-endian float64 rows in the model's feature column order and
+# decoded with a single np.frombuffer view (no JSON parsing, no pydantic, no
+# per-field Python objects); verdicts come back as packed 5- or 6-byte records.
+#
+# Request:   MAGIC | uint16 version | uint16 n_features | uint32 layout | uint32 n_records
+#            n_records x n_features float64, row-major
+# Response:  MAGIC | uint16 version | uint16 flags      | uint32 layout | uint32 n_records
+#            n_records x (uint8 is_bot, float32 confidence_score[, uint8 tier])
+#            With FLAG_TIER set, each record ends with the cascade tier that decided it
+#            (0 = full forest, 1 = pre-filter).
+#
+# `layout` is the CRC-32 of the '\n'-joined feature column names, so a client
+# built against another model's column order is refused instead of mis-scored.
+
+import struct
+import zlib
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+MAGIC = b'ASTW'
+VERSION = 1
+MEDIA_TYPE = 'application/x-astra-packed'
+
+_HEADER = struct.Struct('<4sHHII')
+HEADER_SIZE = _HEADER.size
+
+FEATURE_DTYPE = np.dtype('<f8')
+VERDICT_DTYPE = np.dtype([('is_bot', 'u1'), ('confidence_score', '<f4')])
+TIERED_VERDICT_DTYPE = np.dtype([('is_bot', 'u1'), ('confidence_score', '<f4'), ('tier', 'u1')])
+FLAG_TIER = 0x1
+
+
+class WireFormatError(ValueError):
+    """The body is not a packed request this server can decode."""
+
+
+def layout_id(feature_columns: List[str]) -> int:
+    return zlib.crc32('\n'.join(feature_columns).encode('utf-8'))
+
+
+def encode_request(X, feature_columns: List[str]) -> bytes:
+    """Packs a (n_records, n_features) matrix whose columns are in `feature_columns` order."""
+    X = np.ascontiguousarray(X, dtype=FEATURE_DTYPE)
+    if X.ndim == 1:
+        X = X.reshape(1, -1)
+    if X.shape[1] != len(feature_columns):
+        raise ValueError(f"Expected {len(feature_columns)} feature columns, got {X.shape[1]}.")
+    return _HEADER.pack(MAGIC, VERSION, X.shape[1], layout_id(feature_columns), X.shape[0]) + X.tobytes()
+
+
+def decode_request(body: bytes, feature_columns: List[str], max_records: int = 0) -> np.ndarray:
+    """
+    A read-only (n_records, n_features) float64 view over `body`. Raises
+    WireFormatError for a bad header, a column layout other than
+    `feature_columns`, a body of the wrong length, more than `max_records`
+    records (0 = no limit) or non-finite values.
+    """
+    if len(body) < HEADER_SIZE:
+        raise WireFormatError("Body is shorter than the packed header.")
+    magic, version, n_features, layout, n_records = _HEADER.unpack_from(body)
+    if magic != MAGIC:
+        raise WireFormatError("Not an Astra packed request.")
+    if version != VERSION:
+        raise WireFormatError(f"Unsupported packed format version {version} (expected {VERSION}).")
+    if n_features != len(feature_columns) or layout != layout_id(feature_columns):
+        raise WireFormatError(f"Feature layout mismatch: the model expects {len(feature_columns)} features "
+                              f"(layout {layout_id(feature_columns):#010x}) in the order {feature_columns}.")
+    if max_records and n_records > max_records:
+        raise WireFormatError(f"Too many records: {n_records} (limit {max_records}).")
+    expected = HEADER_SIZE + n_records * n_features * FEATURE_DTYPE.itemsize
+    if len(body) != expected:
+        raise WireFormatError(f"Body is {len(body)} bytes; {n_records} records need {expected}.")
+    X = np.frombuffer(body, dtype=FEATURE_DTYPE, count=n_records * n_features, offset=HEADER_SIZE)
+    X = X.reshape(n_records, n_features)
+    if not np.isfinite(X).all():
+        bad = np.flatnonzero(~np.isfinite(X).all(axis=1))
+        raise WireFormatError(f"Non-finite feature values in records {bad[:10].tolist()}.")
+    return X
+
+
+def encode_response(is_bot: np.ndarray, confidence: np.ndarray, feature_columns: List[str],
+                    prefiltered: Optional[np.ndarray] = None) -> bytes:
+    """Packs verdicts; with `prefiltered` (the rows the cascade's pre-filter decided) each record carries its tier."""
+    dtype = VERDICT_DTYPE if prefiltered is None else TIERED_VERDICT_DTYPE
+    records = np.empty(len(is_bot), dtype=dtype)
+    records['is_bot'] = is_bot
+    records['confidence_score'] = confidence
+    if prefiltered is not None:
+        records['tier'] = prefiltered
+    flags = 0 if prefiltered is None else FLAG_TIER
+    return _HEADER.pack(MAGIC, VERSION, flags, layout_id(feature_columns), len(records)) + records.tobytes()
+
+
+def decode_response(body: bytes) -> Tuple[np.ndarray, np.ndarray, Optional[np.ndarray]]:
+    """(is_bot, confidence_score, tier) arrays from a packed response; tier is None if the server sent none."""
+    if len(body) < HEADER_SIZE:
+        raise WireFormatError("Body is shorter than the packed header.")
+    magic, version, flags, _, n_records = _HEADER.unpack_from(body)
+    if magic != MAGIC or version != VERSION:
+        raise WireFormatError("Not an Astra packed response of a supported version.")
+    dtype = TIERED_VERDICT_DTYPE if flags & FLAG_TIER else VERDICT_DTYPE
+    records = np.frombuffer(body, dtype=dtype, count=n_records, offset=HEADER_SIZE)
+    return records['is_bot'], records['confidence_score'], records['tier'] if flags & FLAG_TIER else None
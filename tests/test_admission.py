@@ -0,0 +1,104 @@
+import asyncio
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+
+from src import backend
+from src.admission import (BUDGET, CONCURRENCY, DEADLINE, EDGE_LAG_SHARE, EDGE_LAG_WINDOW, AdmissionController)
+
+
+def test_admits_within_the_limits():
+    controller = AdmissionController(max_in_flight=2, latency_budget=0.25)
+    controller.observe_batch(10, 0.01)  # 1 ms per session
+    assert controller.check(received_at=100.0, queue_depth=50, now=100.02) is None
+    assert controller.admitted == 1
+
+
+def test_rejects_over_the_concurrency_limit():
+    controller = AdmissionController(max_in_flight=2, latency_budget=0.25)
+    controller.enter()
+    controller.enter()
+    assert controller.check(received_at=100.0, queue_depth=0, now=100.0) == CONCURRENCY
+    controller.leave()
+    assert controller.check(received_at=100.0, queue_depth=0, now=100.0) is None
+    assert controller.rejected[CONCURRENCY] == 1
+
+
+def test_rejects_when_the_queue_ahead_would_overrun_the_budget():
+    controller = AdmissionController(latency_budget=0.25)
+    controller.observe_batch(10, 0.01)
+    # 0.1 s already spent + 200 queued sessions at 1 ms each > 250 ms
+    assert controller.check(received_at=100.0, queue_depth=199, now=100.1) == BUDGET
+    assert controller.check(received_at=100.0, queue_depth=99, now=100.1) is None
+    assert controller.rejected[BUDGET] == 1
+
+
+def test_loop_lag_counts_against_the_budget():
+    controller = AdmissionController(latency_budget=0.25)
+    for _ in range(50):
+        controller.observe_lag(0.3)
+    assert controller.check(received_at=100.0, queue_depth=0, now=100.0) == BUDGET
+
+
+def test_deadline_is_the_end_of_the_budget():
+    controller = AdmissionController(latency_budget=0.25)
+    assert controller.deadline(100.0) == pytest.approx(100.25)
+    controller.missed_deadline()
+    assert controller.rejected[DEADLINE] == 1
+    assert AdmissionController(max_in_flight=10).deadline(100.0) is None
+
+
+def test_unknown_overload_action_is_refused():
+    with pytest.raises(ValueError, match='overload action'):
+        AdmissionController(action='drop')
+
+
+def test_one_long_stall_does_not_shed_at_the_edge():
+    controller = AdmissionController(latency_budget=0.25)
+    for _ in range(EDGE_LAG_WINDOW):
+        controller.observe_lag(0.0002)
+    # A large /predict/batch holds the loop for 80 ms: the EWMA jumps past the edge threshold, one probe is late
+    controller.observe_lag(0.08)
+    assert controller.loop_lag > 0.25 * EDGE_LAG_SHARE
+    assert not controller.overloaded()
+    for _ in range(EDGE_LAG_WINDOW - 1):
+        controller.observe_lag(0.0002)
+        assert not controller.overloaded()
+
+
+def test_sustained_lag_sheds_at_the_edge():
+    controller = AdmissionController(latency_budget=0.25)
+    for _ in range(EDGE_LAG_WINDOW - 1):
+        controller.observe_lag(0.02)
+        assert not controller.overloaded()
+    controller.observe_lag(0.02)
+    assert controller.overloaded()
+    controller.observe_lag(0.0002)
+    assert not controller.overloaded()
+    assert not AdmissionController(max_in_flight=10).overloaded()
+
+
+def test_probe_ignores_a_single_blocking_call():
+    async def run():
+        controller = AdmissionController(latency_budget=0.25)
+        await controller.start()
+        await asyncio.sleep(0.15)
+        time.sleep(0.08)  # One handler holding the loop
+        await asyncio.sleep(0.002)  # Lets the overdue probe record the stall
+        overloaded = controller.overloaded()
+        await controller.stop()
+        return overloaded, controller.loop_lag
+
+    overloaded, loop_lag = asyncio.run(run())
+    assert loop_lag > 0.25 * EDGE_LAG_SHARE
+    assert not overloaded
+
+
+def test_requests_shed_at_the_edge_carry_cors_headers(monkeypatch):
+    monkeypatch.setattr(backend.admission, 'overloaded', lambda: True)
+    client = TestClient(backend.app)  # No lifespan: the request never reaches the handler
+    response = client.post('/predict', json={}, headers={'Origin': 'http://localhost:8501'})
+    assert response.status_code == 503
+    assert response.headers['retry-after']
+    assert response.headers['access-control-allow-origin']
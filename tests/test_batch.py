@@ -0,0 +1,45 @@
+import pytest
+from fastapi.testclient import TestClient
+
+from src import backend
+from src.watchdog import Watchdog
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    (tmp_path / 'w').mkdir()
+    monkeypatch.chdir(tmp_path / 'w')  # The API logs to ../logs
+    monkeypatch.setattr(backend, 'get_watchdog', lambda: Watchdog(trusted_ips=['testclient']))
+    with TestClient(backend.app) as client:
+        yield client
+
+
+def _session(**overrides):
+    session = {name: (1.0 if field.annotation is float else 2) for name, field in backend.SessionData.model_fields.items()}
+    return {**session, **overrides}
+
+
+def test_mixed_batch_scores_valid_items_and_reports_the_rest_in_order(client):
+    missing = _session()
+    del missing['account_age_days']
+    items = [_session(), missing, 'not a session', _session(mouse_movements='many'), _session(session_duration=200.0)]
+
+    response = client.post('/predict/batch', json=items)
+    assert response.status_code == 200
+    body = response.json()
+    assert (body['count'], body['scored'], body['errors']) == (5, 2, 3)
+    results = body['results']
+    assert [('error' in result) for result in results] == [False, True, True, True, False]
+    assert 'account_age_days' in results[1]['error']
+    assert results[2]['error'] == "Each session must be a JSON object."
+    assert 'mouse_movements' in results[3]['error']
+    for result in (results[0], results[4]):
+        assert result['decision'] in ('ALLOW', 'BLOCK')
+
+
+def test_batch_over_the_session_limit_is_refused(client, monkeypatch):
+    monkeypatch.setattr(backend, 'BATCH_MAX_SESSIONS', 3)
+    assert client.post('/predict/batch', json=[_session()] * 3).status_code == 200
+    response = client.post('/predict/batch', json=[_session()] * 4)
+    assert response.status_code == 413
+    assert 'limit 3' in response.json()['detail']
@@ -0,0 +1,64 @@
+import numpy as np
+import pytest
+from sklearn.preprocessing import StandardScaler
+from sklearn.tree import DecisionTreeClassifier
+
+from src.cascade import FOREST, PREFILTER, Cascade, fit_leaves
+from src.engine import CompiledForest
+
+COLUMNS = ['session_duration', 'account_age_days', 'mouse_movements']
+
+
+@pytest.fixture(scope='module')
+def cascade():
+    rng = np.random.default_rng(3)
+    X = np.column_stack([rng.uniform(1.0, 300.0, 2000), rng.integers(0, 900, 2000), rng.integers(0, 5000, 2000)])
+    y = ((X[:, 0] < 40) & (X[:, 1] < 300)).astype(int)
+    scaler = StandardScaler().fit(X[:1000])
+    tree = DecisionTreeClassifier(max_depth=3, min_samples_leaf=20, random_state=0).fit(scaler.transform(X[:1000]), y[:1000])
+    prefilter = CompiledForest.from_sklearn(tree, scaler, COLUMNS)
+    return Cascade(prefilter, fit_leaves(prefilter, X[1000:], y[1000:], X[:1000], y[:1000]), min_support=10)
+
+
+def _rows(cascade):
+    """Random sessions, plus rows on and one ulp either side of every split and every leaf's range bounds."""
+    rng = np.random.default_rng(11)
+    X = np.column_stack([rng.uniform(0.0, 320.0, 300), rng.integers(0, 1000, 300), rng.integers(0, 6000, 300)])
+    prefilter = cascade.prefilter
+    edges = [(f, t) for f, t in zip(prefilter.feature, prefilter.threshold) if np.isfinite(t)]
+    edges += [(f, v) for bounds in (cascade._low, cascade._high) for row in bounds
+              for f, v in enumerate(row) if np.isfinite(v)]
+    extra = np.repeat(X[:1], len(edges) * 3, axis=0)
+    for i, (feature, value) in enumerate(edges):
+        for j, v in enumerate((value, np.nextafter(value, -np.inf), np.nextafter(value, np.inf))):
+            extra[i * 3 + j, feature] = v
+    return np.vstack([X, extra])
+
+
+def test_single_row_path_matches_the_matrix_path(cascade):
+    X = _rows(cascade)
+    decided, is_bot, confidence = cascade.decide(X, COLUMNS)
+    assert decided.any() and not decided.all()
+    for i in range(len(X)):
+        row = cascade.decide(X[i:i + 1], COLUMNS)
+        assert (row[0][0], row[1][0], row[2][0]) == (decided[i], is_bot[i], confidence[i])
+        assert tuple(a[0] for a in cascade.classify(X[i:i + 1], COLUMNS)) == (is_bot[i], confidence[i])
+
+
+def test_single_row_path_reorders_columns_and_counts_decisions(cascade):
+    X = _rows(cascade)[:50]
+    expected = cascade.decide(X, COLUMNS)[0]
+    before = dict(cascade.decided)
+    reordered = COLUMNS[::-1]
+    for i in range(len(X)):
+        assert cascade.decide(X[i:i + 1, ::-1], reordered)[0][0] == expected[i]
+    assert cascade.decided[PREFILTER] - before[PREFILTER] == int(expected.sum())
+    assert cascade.decided[FOREST] - before[FOREST] == int((~expected).sum())
+
+
+def test_returned_arrays_do_not_alias_the_leaf_tables(cascade):
+    X = _rows(cascade)[:1]
+    _, is_bot, confidence = cascade.decide(X, COLUMNS)
+    is_bot[0], confidence[0] = 7, -1.0
+    _, again_bot, again_confidence = cascade.decide(X, COLUMNS)
+    assert again_bot[0] != 7 and again_confidence[0] != -1.0
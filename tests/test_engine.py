@@ -0,0 +1,88 @@
+import numpy as np
+import pytest
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.preprocessing import StandardScaler
+
+from src.engine import CompiledForest
+
+COLUMNS = ['session_duration', 'mouse_movements', 'account_age_days', 'avg_keystroke_interval_ms']
+
+
+@pytest.fixture(scope='module')
+def fitted():
+    rng = np.random.default_rng(7)
+    X = np.column_stack([
+        rng.uniform(0.5, 120.0, 600).round(2),
+        rng.integers(0, 9000, 600),
+        rng.integers(0, 1000, 600),
+        rng.normal(120.0, 60.0, 600),
+    ])
+    y = ((X[:, 0] < 30) ^ (rng.random(600) < 0.1)).astype(int)
+    scaler = StandardScaler().fit(X)
+    model = RandomForestClassifier(n_estimators=15, max_depth=8, random_state=0).fit(scaler.transform(X), y)
+    return scaler, model, X
+
+
+def _boundary_rows(compiled, X):
+    """Rows whose split feature sits on, one ulp below, and one ulp above every split threshold."""
+    internal = np.flatnonzero(np.isfinite(compiled.threshold))
+    rows = np.repeat(X[:1], len(internal) * 3, axis=0)
+    for i, node in enumerate(internal):
+        feature, raw = compiled.feature[node], compiled.threshold[node]
+        for j, value in enumerate((raw, np.nextafter(raw, -np.inf), np.nextafter(raw, np.inf))):
+            rows[i * 3 + j, feature] = value
+    return rows
+
+
+def _is_mapped(array):
+    while array is not None:
+        if isinstance(array, np.memmap):
+            return True
+        array = array.base
+    return False
+
+
+def _sklearn_proba(scaler, model, X):
+    return model.predict_proba(scaler.transform(X))
+
+
+def test_predict_proba_matches_sklearn_exactly(fitted):
+    scaler, model, X = fitted
+    compiled = CompiledForest.from_sklearn(model, scaler, COLUMNS)
+    assert np.array_equal(compiled.predict_proba(X), _sklearn_proba(scaler, model, X))
+
+
+def test_thresholds_on_float_boundaries_route_like_sklearn(fitted):
+    scaler, model, X = fitted
+    compiled = CompiledForest.from_sklearn(model, scaler, COLUMNS)
+    rows = _boundary_rows(compiled, X)
+    # Scaled-space thresholds mapped back algebraically, which float32 rounding can put on the wrong side
+    for tree in model.estimators_:
+        internal = tree.tree_.children_left != -1
+        features = tree.tree_.feature[internal]
+        naive = tree.tree_.threshold[internal] * scaler.scale_[features] + scaler.mean_[features]
+        extra = np.repeat(X[:1], len(naive), axis=0)
+        extra[np.arange(len(naive)), features] = naive
+        rows = np.vstack([rows, extra])
+    assert np.array_equal(compiled.predict_proba(rows), _sklearn_proba(scaler, model, rows))
+
+
+def test_bundle_round_trip_is_mapped_and_checksummed(fitted, tmp_path):
+    scaler, model, X = fitted
+    compiled = CompiledForest.from_sklearn(model, scaler, COLUMNS)
+    path = str(tmp_path / 'model.bundle')
+    header = compiled.save(path)
+
+    loaded = CompiledForest.load(path)
+    assert _is_mapped(loaded.threshold) and _is_mapped(loaded.value)
+    assert loaded.metadata['model_version'] == header['model_version']
+    assert loaded.feature_columns == COLUMNS
+    assert np.array_equal(loaded.predict_proba(X), _sklearn_proba(scaler, model, X))
+
+    with open(path, 'r+b') as f:
+        f.seek(-1, 2)
+        last = f.read(1)
+        f.seek(-1, 2)
+        f.write(bytes([last[0] ^ 0xFF]))
+    with pytest.raises(ValueError, match='checksum'):
+        CompiledForest.load(path)
@@ -0,0 +1,37 @@
+import numpy as np
+import pandas as pd
+
+from scripts.feature_enhincement import RNG_BLOCK_ROWS, enhance_file
+
+
+def _sessions(path, n_rows):
+    rng = np.random.default_rng(5)
+    pd.DataFrame({
+        'session_duration': rng.uniform(1.0, 300.0, n_rows).round(3),
+        'is_bot': rng.integers(0, 2, n_rows),
+    }).to_csv(path, index=False)
+
+
+def test_output_does_not_depend_on_chunk_size_or_workers(tmp_path):
+    source = tmp_path / 'sessions.csv'
+    n_rows = 2 * RNG_BLOCK_ROWS + 1234  # Spans three RNG blocks
+    _sessions(source, n_rows)
+
+    outputs = []
+    # Chunks smaller than, not aligned with, and larger than an RNG block
+    for chunk_size, workers in ((1000, 1), (RNG_BLOCK_ROWS + 17, 1), (n_rows, 1), (3333, 2)):
+        output = tmp_path / f'enhanced_{chunk_size}_{workers}.csv'
+        rows, _, _ = enhance_file(str(source), str(output), seed=7, chunk_size=chunk_size, workers=workers)
+        assert rows == n_rows
+        outputs.append(output.read_bytes())
+    assert all(output == outputs[0] for output in outputs[1:])
+
+
+def test_seed_changes_the_draws(tmp_path):
+    source = tmp_path / 'sessions.csv'
+    _sessions(source, 500)
+    enhance_file(str(source), str(tmp_path / 'a.csv'), seed=1, chunk_size=100)
+    enhance_file(str(source), str(tmp_path / 'b.csv'), seed=2, chunk_size=100)
+    a, b = pd.read_csv(tmp_path / 'a.csv'), pd.read_csv(tmp_path / 'b.csv')
+    assert a['is_bot'].equals(b['is_bot'])
+    assert not a['avg_keystroke_interval_ms'].equals(b['avg_keystroke_interval_ms'])
@@ -0,0 +1,75 @@
+from datetime import datetime
+
+from src.log_sink import PredictionLogSink, _columnar_dtypes, encode_columnar_block
+from src.log_tail import LogTailer
+
+FEATURES = ['session_duration']
+START = 1_700_000_040.0
+
+
+def _log(log_file, *records, log_format='columnar'):
+    sink = PredictionLogSink(log_file, FEATURES, log_format=log_format, segment_seconds=60)
+    sink.start()
+    sink.submit_many([{'Timestamp': datetime.fromtimestamp(t).isoformat(), 'is_bot': bot,
+                       'decision': 'BLOCK' if bot else 'ALLOW', 'confidence_score': 0.9, 'session_duration': t - START}
+                      for t, bot in records])
+    sink.stop()
+
+
+def test_columnar_segments_are_tailed_block_by_block(tmp_path):
+    log_file = str(tmp_path / 'api_log.csv')
+    tailer = LogTailer(log_file, max_rows=10, log_format='columnar')
+    assert tailer.poll() == 0
+
+    _log(log_file, (START, 1), (START + 1, 0), (START + 2, 1))
+    assert tailer.poll() == 3
+    assert (tailer.total_requests, tailer.bots_detected, tailer.humans_allowed) == (3, 2, 1)
+    newest = tailer.latest(1)[0]
+    assert newest['Timestamp'] == datetime.fromtimestamp(START + 2)
+    assert (newest['decision'], newest['session_duration']) == ('BLOCK', 2.0)
+
+    # A second run in the same partition appends to the same segment
+    _log(log_file, (START + 3, 0))
+    assert tailer.poll() == 1
+    assert tailer.poll() == 0
+    assert tailer.humans_allowed == 2
+
+
+def test_a_torn_block_waits_for_the_rest_of_its_bytes(tmp_path):
+    log_file = str(tmp_path / 'api_log.csv')
+    _log(log_file, (START, 0))
+    tailer = LogTailer(log_file, log_format='columnar')
+    assert tailer.poll() == 1
+
+    columns = ['Timestamp', 'is_bot', 'confidence_score'] + FEATURES
+    block = encode_columnar_block(columns, _columnar_dtypes(FEATURES),
+                                  {'Timestamp': [START + 1] * 2, 'is_bot': [1, 1], 'confidence_score': [0.8] * 2,
+                                   'session_duration': [1.0] * 2})
+    segment = str(tmp_path / ('api_log.' + datetime.fromtimestamp(START).strftime('%Y%m%d-%H%M%S') + '.alog'))
+    with open(segment, 'ab') as f:
+        f.write(block[:7])
+    assert tailer.poll() == 0
+    with open(segment, 'ab') as f:
+        f.write(block[7:])
+    assert tailer.poll() == 2
+    assert tailer.bots_detected == 2
+
+
+def test_a_newer_segment_is_followed(tmp_path):
+    log_file = str(tmp_path / 'api_log.csv')
+    _log(log_file, (START, 0))
+    tailer = LogTailer(log_file, log_format='columnar')
+    assert tailer.poll() == 1
+
+    # Rows finishing the old segment and the first rows of the next are both counted
+    _log(log_file, (START + 1, 1), (START + 120, 1))
+    assert tailer.poll() == 2
+    assert (tailer.total_requests, tailer.rotations) == (3, 1)
+
+
+def test_csv_log_is_still_tailed(tmp_path):
+    log_file = str(tmp_path / 'api_log.csv')
+    _log(log_file, (START, 1), (START + 1, 0), log_format='csv')
+    tailer = LogTailer(log_file)
+    assert tailer.poll() == 2
+    assert (tailer.bots_detected, tailer.humans_allowed) == (1, 1)
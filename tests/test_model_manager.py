@@ -0,0 +1,82 @@
+import asyncio
+import os
+
+import numpy as np
+
+from src.model_manager import ModelManager
+
+
+class _Scorer:
+    feature_columns = ['session_duration']
+    classes_ = np.array([0, 1])
+
+    def __init__(self, version):
+        self.metadata = {'model_version': version}
+
+    def predict_rows(self, rows):
+        return np.tile([0.5, 0.5], (len(rows), 1))
+
+
+def _rewriting_loader(path):
+    """Loads like load_or_compile with a stale bundle: it writes the watched file while loading."""
+    loads = []
+
+    def load(override=None):
+        loads.append(override)
+        with open(path, 'wb') as f:
+            f.write(b'bundle %d' % len(loads))
+        os.utime(path, ns=(len(loads) * 10**9, len(loads) * 10**9))
+        return _Scorer(str(len(loads)))
+    return load, loads
+
+
+def _watch(manager, seconds):
+    async def run():
+        await manager.start()
+        await asyncio.sleep(seconds)
+        await manager.stop()
+    asyncio.run(run())
+
+
+def test_bundle_written_by_the_startup_load_is_not_reloaded(tmp_path):
+    path = str(tmp_path / 'model.bundle')
+    load, loads = _rewriting_loader(path)
+    manager = ModelManager(load, watch_path=path, poll_interval=0.01)
+    manager.load()
+
+    _watch(manager, 0.1)
+    assert len(loads) == 1
+    assert (manager.generation, manager.reloads) == (1, 0)
+
+
+def test_bundle_written_by_a_manual_reload_is_not_reloaded_again(tmp_path):
+    path = str(tmp_path / 'model.bundle')
+    load, loads = _rewriting_loader(path)
+    manager = ModelManager(load, watch_path=path, poll_interval=0.01)
+    manager.load()
+
+    async def run():
+        await manager.start()
+        await manager.reload()
+        await asyncio.sleep(0.1)
+        await manager.stop()
+    asyncio.run(run())
+    assert len(loads) == 2
+    assert (manager.generation, manager.reloads) == (2, 1)
+
+
+def test_a_new_model_file_is_still_picked_up(tmp_path):
+    path = str(tmp_path / 'model.bundle')
+    load, loads = _rewriting_loader(path)
+    manager = ModelManager(load, watch_path=path, poll_interval=0.01)
+    manager.load()
+
+    async def run():
+        await manager.start()
+        with open(path, 'wb') as f:
+            f.write(b'retrained')
+        await asyncio.sleep(0.15)
+        await manager.stop()
+    asyncio.run(run())
+    assert len(loads) == 2
+    assert manager.active.metadata['model_version'] == '2'
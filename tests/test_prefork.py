@@ -0,0 +1,37 @@
+import queue
+from types import SimpleNamespace
+
+from src.prefork import SharedArena, WorkerContext
+
+
+def _server(arena):
+    return SimpleNamespace(workers=arena.slots, scorer=None, arena=arena, log_queue=queue.Queue(), started_at=0.0)
+
+
+def _publishing(server, slot, counts):
+    context = WorkerContext(server, slot)
+    context._totals = lambda: counts  # What start_publishing() would install, without the publisher thread
+    context.publish()
+    return context
+
+
+def test_watchdog_and_logging_counters_are_summed_over_workers():
+    server = _server(SharedArena(3, metrics_capacity=1024, watchdog_capacity=16))
+    _publishing(server, 1, {'watchdog.total_sessions': 5, 'logging.enqueued': 5})
+    _publishing(server, 2, {'watchdog.total_sessions': 7, 'logging.enqueued': 6, 'logging.dropped': 1})
+    answering = WorkerContext(server, 0)
+
+    totals = answering.server_totals({'watchdog.total_sessions': 2, 'logging.enqueued': 2})
+    assert totals['watchdog.total_sessions'] == 14
+    assert totals['logging.enqueued'] == 13
+    assert totals['logging.dropped'] == 1
+
+
+def test_a_restarted_worker_carries_its_slot_forward():
+    server = _server(SharedArena(2, metrics_capacity=1024, watchdog_capacity=16))
+    _publishing(server, 1, {'watchdog.total_sessions': 5})
+    # Slot 1's worker dies; its replacement starts counting from zero
+    _publishing(server, 1, {'watchdog.total_sessions': 1})
+
+    totals = WorkerContext(server, 0).server_totals({})
+    assert totals['watchdog.total_sessions'] == 6
@@ -0,0 +1,46 @@
+from src.progressive import PartialSessionStore, ProgressiveScorer
+
+FEATURES = {'login_duration': 4.2, 'account_age_days': 310}
+CONTINUE = {'stage': 'login', 'decision': 'CONTINUE', 'is_bot': 0, 'sticky': False}
+
+
+def test_partial_session_expires_after_ttl():
+    store = PartialSessionStore(max_entries=10, ttl=900.0)
+    store.put('s1', FEATURES, CONTINUE, now=0.0)
+
+    assert store.get('s1', now=899.9) == (FEATURES, CONTINUE)
+    assert store.get('s1', now=900.0) is None
+    assert store.expired == 1
+    assert len(store) == 0
+
+
+def test_partial_sessions_are_capped_least_recently_used_first():
+    store = PartialSessionStore(max_entries=2, ttl=900.0)
+    store.put('s1', FEATURES, CONTINUE, now=0.0)
+    store.put('s2', FEATURES, CONTINUE, now=1.0)
+    assert store.get('s1', now=2.0) is not None
+    store.put('s3', FEATURES, CONTINUE, now=3.0)
+
+    assert store.evictions == 1
+    assert store.get('s2', now=4.0) is None
+    assert store.get('s1', now=4.0) is not None and store.get('s3', now=4.0) is not None
+
+
+def test_finish_returns_the_last_verdict_once():
+    store = PartialSessionStore(max_entries=10, ttl=900.0)
+    scorer = ProgressiveScorer({}, store)
+    store.put('s1', FEATURES, CONTINUE, now=0.0)
+
+    assert scorer.finish('s1', now=10.0) == CONTINUE
+    assert scorer.finish('s1', now=11.0) is None
+    assert len(store) == 0
+
+
+def test_finish_ignores_an_expired_session():
+    store = PartialSessionStore(max_entries=10, ttl=900.0)
+    scorer = ProgressiveScorer({}, store)
+    store.put('s1', FEATURES, {**CONTINUE, 'decision': 'BLOCK', 'is_bot': 1}, now=0.0)
+
+    assert scorer.finish('s1', now=900.0) is None
+    assert store.expired == 1
+    assert len(store) == 0
@@ -0,0 +1,13 @@
+import json
+
+from src.stats import LATENCY_BOUNDS, RollingStats
+
+
+def test_latency_past_top_bucket_is_clamped_and_json_safe():
+    stats = RollingStats(horizon=60)
+    now = 1_000_000.0
+    stats.record({'decision': 'BLOCK', 'confidence_score': 0.9}, 11.0, now=now)
+
+    latency = stats.snapshot(60, now=now)['latency_ms']
+    assert latency['p99'] == round(float(LATENCY_BOUNDS[-1]) * 1000, 3)
+    json.dumps(stats.snapshot_all(), allow_nan=False)
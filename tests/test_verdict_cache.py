@@ -0,0 +1,78 @@
+from src.verdict_cache import VerdictCache
+
+COLUMNS = ['session_duration', 'mouse_movements']
+SESSION = {'session_duration': 3.0, 'mouse_movements': 12}
+VERDICT = {'is_bot': 1, 'decision': 'BLOCK', 'confidence_score': 0.97}
+
+
+def _key(cache, features=SESSION, session_id=None):
+    return cache.key_for(features, COLUMNS, session_id)
+
+
+def test_entry_expires_after_ttl():
+    cache = VerdictCache(max_entries=10, ttl=30.0)
+    key, fingerprint = _key(cache)
+    cache.put(key, fingerprint, 1, VERDICT, now=100.0)
+
+    assert cache.get(key, fingerprint, 1, now=129.9) == VERDICT
+    assert cache.get(key, fingerprint, 1, now=130.0) is None
+    assert cache.stats()['expired'] == 1
+    # Expired entries are removed, not just skipped
+    assert cache.get(key, fingerprint, 1, now=100.0) is None
+    assert cache.stats()['entries'] == 0
+
+
+def test_expired_entries_are_dropped_on_insert():
+    cache = VerdictCache(max_entries=10, ttl=5.0)
+    for i in range(2):
+        key, fingerprint = _key(cache, {**SESSION, 'mouse_movements': i})
+        cache.put(key, fingerprint, 1, VERDICT, now=0.0)
+    key, fingerprint = _key(cache, {**SESSION, 'mouse_movements': 99})
+    cache.put(key, fingerprint, 1, VERDICT, now=10.0)
+    assert cache.stats()['entries'] == 1
+
+
+def test_capacity_evicts_least_recently_used():
+    cache = VerdictCache(max_entries=3, ttl=60.0)
+    keys = [_key(cache, {**SESSION, 'mouse_movements': i}) for i in range(4)]
+    for key, fingerprint in keys[:3]:
+        cache.put(key, fingerprint, 1, VERDICT, now=0.0)
+    # A hit makes the first entry most recently used, so the second is the one evicted
+    assert cache.get(*keys[0], 1, now=1.0) == VERDICT
+    cache.put(*keys[3], 1, VERDICT, now=2.0)
+
+    assert cache.stats()['entries'] == 3
+    assert cache.stats()['evictions'] == 1
+    assert cache.get(*keys[1], 1, now=3.0) is None
+    for key, fingerprint in (keys[0], keys[2], keys[3]):
+        assert cache.get(key, fingerprint, 1, now=3.0) == VERDICT
+
+
+def test_generation_change_invalidates_verdicts():
+    cache = VerdictCache(max_entries=10, ttl=60.0)
+    key, fingerprint = _key(cache)
+    cache.put(key, fingerprint, 1, VERDICT, now=0.0)
+
+    assert cache.get(key, fingerprint, 2, now=1.0) is None
+    assert cache.stats()['stale'] == 1
+    # The stale entry is gone even for the generation that stored it
+    assert cache.get(key, fingerprint, 1, now=1.0) is None
+
+
+def test_session_id_reused_with_other_features_is_a_miss():
+    cache = VerdictCache(max_entries=10, ttl=60.0)
+    key, fingerprint = _key(cache, session_id='abc')
+    cache.put(key, fingerprint, 1, VERDICT, now=0.0)
+
+    other_key, other_fingerprint = _key(cache, {**SESSION, 'session_duration': 90.0}, session_id='abc')
+    assert other_key == key
+    assert cache.get(other_key, other_fingerprint, 1, now=1.0) is None
+    assert cache.stats()['conflicts'] == 1
+
+
+def test_size_zero_disables_the_cache():
+    cache = VerdictCache(max_entries=0)
+    key, fingerprint = _key(cache)
+    cache.put(key, fingerprint, 1, VERDICT, now=0.0)
+    assert not cache.enabled
+    assert cache.get(key, fingerprint, 1, now=0.0) is None
@@ -0,0 +1,89 @@
+import mmap
+import multiprocessing
+
+from fastapi.testclient import TestClient
+
+from src import backend, simulation
+from src.watchdog import SharedIPCounters, Watchdog
+
+
+def _demo_loop(watchdog, client_ip, seconds=600):
+    """Replays run_simulation()'s cadence (one session every 1 / SIMULATION_SPEED s); returns the refusals."""
+    interval = 1 / simulation.SIMULATION_SPEED
+    return [i for i in range(int(seconds / interval))
+            if not watchdog.check_request(client_ip, now=1000.0 + i * interval)[0]]
+
+
+def test_stock_demo_loop_from_loopback_is_not_blocked():
+    watchdog = Watchdog(trusted_ips=backend.WATCHDOG_TRUSTED_IPS)
+    assert _demo_loop(watchdog, '127.0.0.1') == []
+    assert _demo_loop(watchdog, '::1') == []
+    assert watchdog.get_stats()['blocked_ips'] == 0
+
+
+def test_demo_rate_from_another_host_is_still_limited():
+    watchdog = Watchdog(trusted_ips=backend.WATCHDOG_TRUSTED_IPS)
+    assert _demo_loop(watchdog, '203.0.113.7', seconds=60)
+
+
+def _scoring_requests():
+    """A well-formed request for every scoring endpoint, so only the watchdog can refuse it."""
+    session = {name: (1.0 if field.annotation is float else 2) for name, field in backend.SessionData.model_fields.items()}
+    stage = {'session_id': 's1', 'stage': 'login', 'features': {'login_duration': 4.0, 'account_age_days': 30}}
+    return [('/predict', {'json': session}), ('/predict/stage', {'json': stage}),
+            ('/predict/batch', {'json': [session]}), ('/predict/stream', {'content': b'{}\n'}),
+            ('/predict/packed', {'content': b''})]
+
+
+def test_blocked_ip_gets_429_from_every_scoring_endpoint(tmp_path, monkeypatch):
+    (tmp_path / 'w').mkdir()
+    monkeypatch.chdir(tmp_path / 'w')  # The API logs to ../logs
+    watchdog = Watchdog()
+    monkeypatch.setattr(backend, 'get_watchdog', lambda: watchdog)
+    while watchdog.check_request('testclient')[0]:
+        pass
+
+    with TestClient(backend.app) as client:
+        for path, body in _scoring_requests():
+            response = client.post(path, **body)
+            assert response.status_code == 429, path
+            assert int(response.headers['retry-after']) > 0
+
+
+def _shared_watchdog(buffer, slot, slots=2, capacity=64):
+    watchdog = Watchdog()
+    watchdog.shared = SharedIPCounters(buffer, slots, slot, capacity)
+    return watchdog
+
+
+def _count_requests(buffer, times, results):
+    """Runs in a forked worker: slot 1's share of the traffic."""
+    watchdog = _shared_watchdog(buffer, slot=1)
+    results.put([watchdog.check_request('203.0.113.9', now=t)[0] for t in times])
+
+
+def test_shared_counters_enforce_one_limit_across_two_processes():
+    times = [1000.0 + i * 0.5 for i in range(30)]  # 2 requests/s from one IP
+    single = Watchdog()
+    expected = [single.check_request('203.0.113.9', now=t)[0] for t in times]
+    assert not all(expected)
+
+    buffer = mmap.mmap(-1, SharedIPCounters.nbytes(2, 64))
+    context = multiprocessing.get_context('fork')  # Workers share the parent's str hash seed
+    results = context.Queue()
+    child = context.Process(target=_count_requests, args=(buffer, times[:16], results))
+    child.start()
+    child_allowed = results.get(timeout=10)
+    child.join(timeout=10)
+    assert child.exitcode == 0
+
+    parent = _shared_watchdog(buffer, slot=0)
+    parent_allowed = [parent.check_request('203.0.113.9', now=t)[0] for t in times[16:]]
+    # Split over two processes, the IP is refused exactly where one process would refuse it
+    assert child_allowed + parent_allowed == expected
+    assert parent.shared.blocked_ips(times[-1]) == 1
+    assert parent.shared.tracked_ips() == 1
+
+    # A worker counting only its own requests would have let all of them through
+    unshared = Watchdog()
+    assert all(unshared.check_request('203.0.113.9', now=t)[0] for t in times[16:])